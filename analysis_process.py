@@ -0,0 +1,301 @@
+"""
+独立进程的频谱分析
+采集 + get_audio_frame 放到子进程里运行，主进程 (Tk 界面、显示写入线程) 的 GIL 不再被 FFT 占用，
+界面卡顿也不会拖慢分析。两个进程之间只通过 multiprocessing.shared_memory 交换数据，每帧没有任何 pickle：
+    SharedAudioRing  原始采样的环形缓冲区 (与 audio_capture.AudioRing 相同的单生产者单消费者协议)，
+                     采集在子进程里时由子进程写入，也可以由主进程的采集源写入 (capture=None)
+    SharedLevels     分析结果的环形槽位，子进程写完一个槽位再发布序号，主进程只取最新的一帧
+
+    analysis = AnalysisProcess.for_device(audio, device_index)   # 子进程自己打开 WASAPI 设备
+    analysis.start()
+    seq, levels, t = analysis.latest()                            # 显示线程每帧调用，不阻塞
+    analysis.stop()
+"""
+import multiprocessing
+import threading
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from audio_capture import AudioRing
+from audio_monitor import RING_CHUNKS, AudioProcessor
+from spectrum import DEFAULT_BANDS
+
+# 头部按缓存行对齐，和数据区分开
+HEADER_BYTES = 64
+
+
+class SharedAudioRing(AudioRing):
+    """数据和写位置 (write_pos / write_end) 都放在共享内存里的 AudioRing，data_ready 换成跨进程的 Event"""
+
+    def __init__(self, capacity, channels, data_ready, name=None):
+        """name 为 None 时新建共享内存，否则连接到已有的"""
+        self.capacity = int(capacity)
+        self.channels = int(channels)
+        size = HEADER_BYTES + self.capacity * self.channels * 2
+        self.owner = name is None
+        self.shm = shared_memory.SharedMemory(name=name, create=self.owner, size=size)
+        self._pos = np.ndarray((2,), dtype=np.int64, buffer=self.shm.buf)
+        self.buf = np.ndarray((self.capacity, self.channels), dtype=np.int16, buffer=self.shm.buf,
+                              offset=HEADER_BYTES)
+        if self.owner:
+            self._pos[:] = 0
+        self.data_ready = data_ready
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    @property
+    def write_pos(self):
+        return int(self._pos[0])
+
+    @write_pos.setter
+    def write_pos(self, value):
+        self._pos[0] = value
+
+    @property
+    def write_end(self):
+        return int(self._pos[1])
+
+    @write_end.setter
+    def write_end(self, value):
+        self._pos[1] = value
+
+    def close(self):
+        # 先释放指向共享内存的 ndarray，否则 close 会因为仍有导出的缓冲区而失败
+        self._pos = self.buf = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+class SharedLevels:
+    """
+    分析结果的发布槽位：头部 [序号, 保留, gain, threshold]，之后每个槽位 [时间戳, 各频段等级...]
+    写端写完槽位 (seq % slots) 后把序号加一；读端取最新槽位，复制后若序号前进太多 (槽位被重写) 就重读
+    """
+
+    def __init__(self, bands, slots=8, name=None):
+        self.bands = int(bands)
+        self.slots = int(slots)
+        size = HEADER_BYTES + self.slots * (1 + self.bands) * 8
+        self.owner = name is None
+        self.shm = shared_memory.SharedMemory(name=name, create=self.owner, size=size)
+        self._seq = np.ndarray((2,), dtype=np.int64, buffer=self.shm.buf)
+        self._params = np.ndarray((2,), dtype=np.float64, buffer=self.shm.buf, offset=16)
+        self._slots = np.ndarray((self.slots, 1 + self.bands), dtype=np.float64, buffer=self.shm.buf,
+                                 offset=HEADER_BYTES)
+        if self.owner:
+            self._seq[:] = 0
+        self._out = np.zeros(1 + self.bands, dtype=np.float64)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    @property
+    def seq(self):
+        return int(self._seq[0])
+
+    # gain / threshold 由主进程 (界面滑块) 写，子进程每帧读一次
+    @property
+    def gain(self):
+        return float(self._params[0])
+
+    @property
+    def threshold(self):
+        return float(self._params[1])
+
+    def set_params(self, gain, threshold):
+        self._params[:] = (gain, threshold)
+
+    def publish(self, levels, t=None):
+        seq = int(self._seq[0])
+        row = self._slots[seq % self.slots]
+        row[1:] = levels
+        row[0] = time.perf_counter() if t is None else t
+        self._seq[0] = seq + 1
+
+    def latest(self):
+        """(序号, 等级 list, 发布时间)；还没有结果时序号为 0"""
+        while True:
+            seq = int(self._seq[0])
+            if seq == 0:
+                return 0, [0.0] * self.bands, 0.0
+            self._out[:] = self._slots[(seq - 1) % self.slots]
+            # 复制期间写端最多可以再写 slots - 1 个槽位而不碰到这一个
+            if int(self._seq[0]) - seq < self.slots - 1:
+                return seq, self._out[1:].tolist(), float(self._out[0])
+
+    def close(self):
+        self._seq = self._params = self._slots = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+class _ExternalSource:
+    """采集在主进程：子进程只消费共享缓冲区，不需要启动任何采集"""
+
+    def __init__(self, channels, rate):
+        self.channels = channels
+        self.rate = rate
+
+    def start(self, ring):
+        pass
+
+    def stop(self):
+        pass
+
+
+def _make_source(capture, audio, config):
+    from audio_capture import SyntheticSource, WaveFileSource
+    from audio_monitor import PortAudioSource
+
+    if capture is None:
+        return _ExternalSource(config["channels"], config["rate"])
+    kind, arg = capture
+    if kind == "device":
+        return PortAudioSource(audio.p, arg, audio.CHUNK)
+    if kind == "synthetic":
+        return SyntheticSource(**arg)
+    if kind == "wav":
+        return WaveFileSource(arg)
+    raise ValueError(f"未知的采集方式: {kind}")
+
+
+def _worker_main(config, ring_name, levels_name, data_ready, stop_event):
+    """子进程入口：采集 (可选) + 逐窗口分析，结果写进 SharedLevels"""
+    ring = SharedAudioRing(config["capacity"], config["channels"], data_ready, name=ring_name)
+    levels = SharedLevels(len(config["bands"]), config["slots"], name=levels_name)
+    audio = AudioProcessor(levels.gain, levels.threshold, config["bands"], config["band_gains"])
+    audio.CHUNK = config["chunk"]
+    try:
+        audio.open_source(_make_source(config["capture"], audio, config), config["hop"], ring=ring)
+        windows = 0
+        while not stop_event.is_set():
+            audio.global_gain, audio.base_threshold = levels.gain, levels.threshold
+            values = audio.get_audio_frame(timeout=0.1, quantize=False)
+            if audio.reader.windows_read != windows:
+                windows = audio.reader.windows_read
+                levels.publish(values)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        audio.terminate()
+        levels.close()
+        ring.close()
+
+
+class AnalysisProcess:
+    def __init__(self, channels, rate, capture=None, bands=DEFAULT_BANDS, band_gains=None, chunk=1024,
+                 hop=None, gain=3.0, threshold=4.0, slots=8):
+        """
+        :param channels / rate: 采集数据的格式，决定共享缓冲区的大小
+        :param capture: 子进程里的采集方式 ("device", 设备号) / ("synthetic", 参数 dict) / ("wav", 路径)；
+                        None 表示由主进程写入 self.ring (如 source.start(analysis.ring))
+        """
+        self._ctx = multiprocessing.get_context("spawn")  # 各平台一致，不 fork 带线程的进程
+        self.data_ready = self._ctx.Event()
+        self.stop_event = self._ctx.Event()
+        self.ring = SharedAudioRing(chunk * RING_CHUNKS, channels, self.data_ready)
+        self.levels = SharedLevels(len(bands), slots)
+        self.levels.set_params(gain, threshold)
+        # set_params / latest 可能来自界面线程、显示线程，和 close 释放共享内存互斥
+        self._lock = threading.Lock()
+        self.config = {
+            "channels": channels, "rate": rate, "capture": capture, "bands": tuple(bands),
+            "band_gains": band_gains, "chunk": chunk, "hop": hop, "capacity": chunk * RING_CHUNKS, "slots": slots,
+        }
+        self.process = None
+
+    @classmethod
+    def for_device(cls, audio, device_index, **kwargs):
+        """按 AudioProcessor 的配置，在子进程里打开同一个设备"""
+        info = audio.p.get_device_info_by_index(device_index)
+        kwargs.setdefault("gain", audio.global_gain)
+        kwargs.setdefault("threshold", audio.base_threshold)
+        return cls(info["maxInputChannels"], int(info["defaultSampleRate"]), ("device", device_index),
+                   audio.bands, audio.band_gains, audio.CHUNK, **kwargs)
+
+    def start(self):
+        self.stop_event.clear()
+        self.process = self._ctx.Process(
+            target=_worker_main, name="vfd-analysis", daemon=True,
+            args=(self.config, self.ring.name, self.levels.name, self.data_ready, self.stop_event))
+        self.process.start()
+
+    def stop(self, timeout=2.0):
+        self.stop_event.set()
+        self.data_ready.set()  # 唤醒正在等数据的子进程
+        if self.process:
+            self.process.join(timeout)
+            if self.process.is_alive():
+                self.process.terminate()
+                self.process.join(timeout)
+            self.process = None
+
+    def close(self):
+        """停止子进程并释放共享内存 (可重复调用)"""
+        self.stop()
+        with self._lock:
+            if self.ring is not None:
+                self.ring.close()
+                self.levels.close()
+                self.ring = self.levels = None
+
+    def set_params(self, gain, threshold):
+        """调整子进程的 gain / threshold；已经 close 时忽略"""
+        with self._lock:
+            if self.levels is not None:
+                self.levels.set_params(gain, threshold)
+
+    def latest(self):
+        """同 SharedLevels.latest；已经 close 时返回全零的空结果 (序号 0)"""
+        with self._lock:
+            if self.levels is None:
+                return 0, [0.0] * len(self.config["bands"]), 0.0
+            return self.levels.latest()
+
+    def wait_ready(self, timeout=10.0):
+        """等到第一帧结果 (子进程要先导入 numpy 并打开设备)"""
+        deadline = time.perf_counter() + timeout
+        while self.levels.seq == 0:
+            if time.perf_counter() > deadline or not (self.process and self.process.is_alive()):
+                return False
+            time.sleep(0.01)
+        return True
+
+    def get_stats(self):
+        return {
+            "alive": bool(self.process and self.process.is_alive()),
+            "frames": self.levels.seq,
+            "samples": self.ring.write_pos,
+        }
+
+
+# ==========================================
+# 👇 测试代码：子进程合成信号 / 主进程写入两种方式 👇
+# ==========================================
+if __name__ == "__main__":
+    from audio_capture import SyntheticSource
+
+    analysis = AnalysisProcess(2, 48000, ("synthetic", {"signal": "sweep"}), gain=6.0)
+    analysis.start()
+    print("子进程启动:", analysis.wait_ready())
+    for _ in range(5):
+        time.sleep(0.2)
+        seq, levels, t = analysis.latest()
+        print(f"#{seq:5d} 延迟 {(time.perf_counter() - t) * 1000:5.1f} ms  {[round(v, 1) for v in levels]}")
+    analysis.close()
+
+    # 主进程采集，子进程只做 FFT
+    analysis = AnalysisProcess(2, 48000, gain=6.0)
+    analysis.start()
+    source = SyntheticSource(signal="noise")
+    source.start(analysis.ring)
+    print("主进程采集:", analysis.wait_ready(), analysis.get_stats())
+    source.stop()
+    analysis.close()
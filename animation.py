@@ -0,0 +1,171 @@
+"""
+动画调度器
+所有定时动作 (亮度渐变、闪烁、轮播切换、滚动) 都预先展开成 (时间点, 命令) 关键帧，
+放进一个按时间排序的堆里；调度线程只在最近的时间点到达时醒来执行，不再轮询 sleep。
+"""
+import heapq
+import itertools
+import threading
+import time
+
+
+class Animation:
+    def __init__(self, keyframes, repeat=None, on_done=None):
+        """
+        :param keyframes: [(相对开始的秒数, 命令)]，命令为无参可调用对象
+        :param repeat: 重复周期 (秒)，None 表示只播放一次
+        :param on_done: 播放结束 (或被取消) 后的回调
+        """
+        self.keyframes = sorted(keyframes, key=lambda k: k[0])
+        self.repeat = repeat
+        self.on_done = on_done
+        if repeat is not None and self.keyframes and self.keyframes[-1][0] >= repeat:
+            raise ValueError("关键帧时间必须小于重复周期")
+
+
+class _Playback:
+    """一次播放的状态：同一时刻只有下一帧在堆里，重复动画不会撑大堆"""
+
+    def __init__(self, animation, start):
+        self.animation = animation
+        self.start = start
+        self.index = 0
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    def next_deadline(self):
+        frames = self.animation.keyframes
+        if self.index >= len(frames):
+            if self.animation.repeat is None or not frames:
+                return None
+            self.start += self.animation.repeat
+            self.index = 0
+        return self.start + frames[self.index][0]
+
+
+class AnimationScheduler:
+    def __init__(self):
+        self._heap = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self.running = False
+        self.thread = None
+        # 统计
+        self.wakeups = 0
+        self.commands_run = 0
+
+    # ---------- 调度接口 ----------
+    def play(self, animation, start=None):
+        """开始播放动画，返回可 cancel() 的句柄"""
+        playback = _Playback(animation, time.monotonic() if start is None else start)
+        deadline = playback.next_deadline()
+        if deadline is not None:
+            self._push(deadline, playback)
+        return playback
+
+    def call_at(self, deadline, func):
+        """在 time.monotonic() 到达 deadline 时执行一次 func"""
+        return self.play(Animation([(0.0, func)]), start=deadline)
+
+    def call_later(self, delay, func):
+        return self.call_at(time.monotonic() + delay, func)
+
+    def _push(self, deadline, playback):
+        with self._cond:
+            heapq.heappush(self._heap, (deadline, next(self._seq), playback))
+            # 新的最早时间点可能比当前等待的更早，唤醒调度线程重新计算
+            if self._heap[0][2] is playback:
+                self._cond.notify()
+
+    # ---------- 运行 ----------
+    def start(self):
+        """在后台线程运行"""
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._loop, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        """在当前线程运行，直到 stop()"""
+        self.running = True
+        self._loop()
+
+    def stop(self):
+        with self._cond:
+            self.running = False
+            self._cond.notify_all()
+        if self.thread and self.thread is not threading.current_thread():
+            self.thread.join(timeout=1.0)
+            self.thread = None
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                while self.running:
+                    if self._heap:
+                        delay = self._heap[0][0] - time.monotonic()
+                        if delay <= 0:
+                            break
+                        self._cond.wait(delay)
+                    else:
+                        self._cond.wait()
+                if not self.running:
+                    return
+                deadline, _, playback = heapq.heappop(self._heap)
+                self.wakeups += 1
+
+            if playback.cancelled:
+                self._finish(playback)
+                continue
+
+            _, command = playback.animation.keyframes[playback.index]
+            playback.index += 1
+            try:
+                command()
+                self.commands_run += 1
+            except Exception as e:
+                print(f"[Animation] 命令执行失败: {e}")
+
+            if playback.cancelled:
+                self._finish(playback)
+                continue
+            next_deadline = playback.next_deadline()
+            if next_deadline is None:
+                self._finish(playback)
+            else:
+                self._push(next_deadline, playback)
+
+    def _finish(self, playback):
+        if playback.animation.on_done:
+            try:
+                playback.animation.on_done()
+            except Exception as e:
+                print(f"[Animation] 结束回调失败: {e}")
+
+
+# ==========================================
+# 常用动画：全部预先展开成关键帧
+# ==========================================
+def fade(set_level, start_level, end_level, step_delay, delay=0.0):
+    """亮度逐级渐变：delay 秒后开始，每 step_delay 秒变化一级"""
+    step = 1 if end_level >= start_level else -1
+    levels = range(start_level + step, end_level + step, step)
+    return Animation([(delay + i * step_delay, (lambda lv=lv: set_level(lv))) for i, lv in enumerate(levels)])
+
+
+def blink(show_off, show_on, duration):
+    """闪烁一次：立即熄灭，duration 秒后恢复"""
+    return Animation([(0.0, show_off), (duration, show_on)])
+
+
+def carousel(show_funcs, interval):
+    """轮播：每 interval 秒切换到下一个画面，无限循环"""
+    return Animation([(i * interval, func) for i, func in enumerate(show_funcs)], repeat=interval * len(show_funcs))
+
+
+def scroll(marquee, write):
+    """跑马灯：按 Marquee 预计算的时间线写出各个窗口"""
+    return Animation([(t, (lambda w=window: write(w))) for t, window in marquee.keyframes()], repeat=marquee.cycle)
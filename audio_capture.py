@@ -0,0 +1,236 @@
+"""
+回调式音频采集
+采集端 (PortAudio 回调 / 合成信号 / WAV 文件) 把 int16 数据写入预分配的环形缓冲区，
+分析端按窗口长度 + 跳步 (hop) 从缓冲区取重叠窗口，频谱更新率不再受 CHUNK 限制。
+
+环形缓冲区为单生产者单消费者：生产者先发布"即将写到哪里"(write_end)，再写数据，最后发布写位置；
+消费者读完后检查 write_end，若期间这段数据被覆盖 (或正在被覆盖) 就重读，不需要加锁。
+"""
+import threading
+import time
+import wave
+
+import numpy as np
+
+
+class AudioRing:
+    def __init__(self, capacity, channels):
+        """
+        :param capacity: 缓冲区容量 (采样帧数)
+        :param channels: 声道数
+        """
+        self.capacity = int(capacity)
+        self.channels = int(channels)
+        self.buf = np.zeros((self.capacity, self.channels), dtype=np.int16)
+        self.write_pos = 0  # 已写入的总帧数，单调递增
+        self.write_end = 0  # 正在进行的写入的结束位置，写数据之前发布，总是 >= write_pos
+        self.data_ready = threading.Event()
+
+    def write(self, data):
+        """写入交错的 int16 数据 (bytes 或 ndarray)，由采集线程/回调调用"""
+        frames = np.frombuffer(data, dtype=np.int16) if not isinstance(data, np.ndarray) else data
+        frames = frames.reshape(-1, self.channels)
+        n = len(frames)
+        pos = self.write_pos
+        if n > self.capacity:
+            # 一次写入超过容量，只保留最新的部分
+            pos += n - self.capacity
+            frames = frames[-self.capacity:]
+            n = self.capacity
+
+        # 先发布写入范围：读者据此判断复制期间是否有数据被改写
+        self.write_end = pos + n
+        start = pos % self.capacity
+        first = min(n, self.capacity - start)
+        self.buf[start:start + first] = frames[:first]
+        if first < n:
+            self.buf[:n - first] = frames[first:]
+
+        # 数据写完后再发布写位置
+        self.write_pos = pos + n
+        self.data_ready.set()
+
+    def read(self, start_frame, out):
+        """把 [start_frame, start_frame + len(out)) 复制到 out，数据已被覆盖时返回 False"""
+        n = len(out)
+        start = start_frame % self.capacity
+        first = min(n, self.capacity - start)
+        out[:first] = self.buf[start:start + first]
+        if first < n:
+            out[first:] = self.buf[:n - first]
+        # 复制期间生产者可能已经绕回覆盖了这段数据；write_pos 要等写完才更新，
+        # 所以检查 write_end，正在写入的范围也算覆盖
+        return self.write_end - start_frame <= self.capacity
+
+
+class WindowReader:
+    def __init__(self, ring, window, hop, drop_late=True):
+        """
+        :param window: 每次分析的窗口长度 (帧)
+        :param hop: 相邻窗口的起点间隔 (帧)，window // 2 即 50% 重叠
+        :param drop_late: 分析落后超过一个 hop 时直接跳到最新窗口 (实时显示用)
+        """
+        if window > ring.capacity:
+            raise ValueError("窗口长度不能超过环形缓冲区容量")
+        self.ring = ring
+        self.window = int(window)
+        self.hop = max(1, int(hop))
+        self.drop_late = drop_late
+        self.next_start = None
+        self._out = np.zeros((self.window, ring.channels), dtype=np.int16)
+        # 统计
+        self.windows_read = 0
+        self.windows_skipped = 0
+
+    def _available(self):
+        return self.ring.write_pos >= self.next_start + self.window
+
+    def next_window(self, timeout=1.0):
+        """
+        取下一个分析窗口，返回复用的 (window, channels) int16 数组；超时返回 None
+        返回的数组在下次调用前有效
+        """
+        ring = self.ring
+        deadline = time.perf_counter() + timeout
+        while True:
+            if self.next_start is None and ring.write_pos >= self.window:
+                # 实时模式从最新窗口开始，否则从缓冲区里最早的数据开始
+                if self.drop_late:
+                    self.next_start = ring.write_pos - self.window
+                else:
+                    self.next_start = max(0, ring.write_pos - ring.capacity)
+
+            if self.next_start is not None:
+                behind = ring.write_pos - (self.next_start + self.window)
+                if behind >= 0:
+                    overwritten = ring.write_pos - self.next_start > ring.capacity
+                    if overwritten or (self.drop_late and behind >= self.hop):
+                        # 落后太多 (或数据已被覆盖)，跳到最新的完整窗口
+                        skipped = (ring.write_pos - self.window - self.next_start) // self.hop
+                        self.windows_skipped += max(0, skipped)
+                        self.next_start = ring.write_pos - self.window
+                    start = self.next_start
+                    if ring.read(start, self._out):
+                        self.next_start = start + self.hop
+                        self.windows_read += 1
+                        return self._out
+                    continue  # 读的过程中被覆盖，重读
+
+            # 先清标志再检查，避免错过生产者的通知
+            ring.data_ready.clear()
+            if self.next_start is not None and self._available():
+                continue
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                return None
+            ring.data_ready.wait(remaining)
+
+
+class _PacedSource:
+    """按块生成数据的采集源基类：start() 后台线程按实时速度写入，pump() 手动同步写入"""
+
+    def __init__(self, rate, channels, chunk, realtime=True):
+        self.rate = rate
+        self.channels = channels
+        self.chunk = chunk
+        self.realtime = realtime
+        self.ring = None
+        self.running = False
+        self.thread = None
+
+    def _next_block(self):
+        """返回下一块 (chunk, channels) int16 数据，None 表示结束"""
+        raise NotImplementedError
+
+    def pump(self, blocks=1):
+        """同步写入若干块 (测试/基准测试用，不需要后台线程)，返回实际写入的块数"""
+        for i in range(blocks):
+            block = self._next_block()
+            if block is None:
+                return i
+            self.ring.write(block)
+        return blocks
+
+    def start(self, ring):
+        self.ring = ring
+        if not self.realtime:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread:
+            self.thread.join(timeout=1.0)
+            self.thread = None
+
+    def _run(self):
+        t0 = time.perf_counter()
+        written = 0
+        while self.running:
+            block = self._next_block()
+            if block is None:
+                break
+            self.ring.write(block)
+            written += len(block)
+            delay = t0 + written / self.rate - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+
+class SyntheticSource(_PacedSource):
+    def __init__(self, rate=48000, channels=2, chunk=256, signal="sine", freq=1000.0, amplitude=8000,
+                 realtime=True, seed=0):
+        """
+        :param signal: sine (正弦) / noise (白噪声) / sweep (20Hz-20kHz 对数扫频，10 秒一周期)
+        """
+        super().__init__(rate, channels, chunk, realtime)
+        self.signal = signal
+        self.freq = freq
+        self.amplitude = amplitude
+        self.rng = np.random.default_rng(seed)
+        self._phase = 0.0
+        self._t = 0.0
+        self._block = np.zeros((chunk, channels), dtype=np.int16)
+        self._steps = np.arange(chunk, dtype=np.float64)
+
+    def _next_block(self):
+        if self.signal == "noise":
+            mono = self.rng.normal(0.0, self.amplitude / 3.0, self.chunk)
+        else:
+            if self.signal == "sweep":
+                freq = 20.0 * 1000.0 ** ((self._t % 10.0) / 10.0)
+            else:
+                freq = self.freq
+            step = 2 * np.pi * freq / self.rate
+            mono = self.amplitude * np.sin(self._phase + step * self._steps)
+            self._phase = (self._phase + step * self.chunk) % (2 * np.pi)
+        self._t += self.chunk / self.rate
+        np.clip(mono, -32768, 32767, out=mono)
+        self._block[:] = mono[:, None]
+        return self._block
+
+
+class WaveFileSource(_PacedSource):
+    def __init__(self, path, chunk=256, loop=True, realtime=True):
+        """读取 16 位 PCM WAV 文件，loop=True 时播完从头开始"""
+        with wave.open(path, "rb") as wf:
+            if wf.getsampwidth() != 2:
+                raise ValueError("只支持 16 位 PCM WAV")
+            channels = wf.getnchannels()
+            rate = wf.getframerate()
+            raw = wf.readframes(wf.getnframes())
+        super().__init__(rate, channels, chunk, realtime)
+        self.data = np.frombuffer(raw, dtype=np.int16).reshape(-1, channels)
+        self.loop = loop
+        self.pos = 0
+
+    def _next_block(self):
+        if self.pos >= len(self.data):
+            if not self.loop or not len(self.data):
+                return None
+            self.pos = 0
+        block = self.data[self.pos:self.pos + self.chunk]
+        self.pos += len(block)
+        return block
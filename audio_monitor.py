@@ -1,22 +1,92 @@
-import math
-import numpy as np
-import pyaudiowpatch as pyaudio
+import time
+
+import latency
+from lazy_import import optional_import
+from spectrum import DEFAULT_BANDS
+
+# 环形缓冲区容量 = CHUNK 的倍数
+RING_CHUNKS = 8
+
+
+def _pyaudio():
+    """pyaudiowpatch 只在 Windows 上可用，第一次打开音频设备时才导入"""
+    return optional_import("pyaudiowpatch", "音频采集")
+
+
+class PortAudioSource:
+    """PortAudio 回调式采集源：回调线程直接把数据写进环形缓冲区，不阻塞分析线程"""
+
+    def __init__(self, p, device_index, chunk):
+        dev_info = p.get_device_info_by_index(device_index)
+        self.p = p
+        self.pyaudio = _pyaudio()
+        self.device_index = device_index
+        self.chunk = chunk
+        self.channels = dev_info["maxInputChannels"]
+        self.rate = int(dev_info["defaultSampleRate"])
+        self.stream = None
+        self.ring = None
+
+    def _callback(self, in_data, frame_count, time_info, status):
+        self.ring.write(in_data)
+        return None, self.pyaudio.paContinue
+
+    def start(self, ring):
+        self.ring = ring
+        self.stream = self.p.open(
+            format=self.pyaudio.paInt16,
+            channels=self.channels,
+            rate=self.rate,
+            frames_per_buffer=self.chunk,
+            input=True,
+            input_device_index=self.device_index,
+            stream_callback=self._callback
+        )
+        self.stream.start_stream()
+
+    def stop(self):
+        if self.stream:
+            try:
+                self.stream.stop_stream()
+                self.stream.close()
+            except:
+                pass
+            self.stream = None
 
 
 class AudioProcessor:
-    def __init__(self, gain=3.0, threshold=4.0):
+    def __init__(self, gain=3.0, threshold=4.0, bands=DEFAULT_BANDS, band_gains=None):
         self.global_gain = gain
         self.base_threshold = threshold
-        self.p = pyaudio.PyAudio()
+        self._p = None  # PyAudio 实例，第一次访问 self.p 时才创建
         self.CHUNK = 1024
         self.stream = None
         self.freq_resolution = 0
+        # 频段配置：上限频率 (Hz) 与各段增益，数量任意
+        self.bands = tuple(bands)
+        self.band_gains = band_gains
+        self.engine = None
+        # 回调/合成采集模式 (见 open_source)
+        self.source = None
+        self.reader = None
+        self.last_levels = [0] * len(self.bands)
+
+    @property
+    def p(self):
+        """PyAudio 实例；pyaudiowpatch 不可用时为 None"""
+        if self._p is None:
+            pyaudio = _pyaudio()
+            if pyaudio is not None:
+                self._p = pyaudio.PyAudio()
+        return self._p
 
     def get_device_list(self):
         """获取所有可用输入设备"""
         devices = []
+        if self.p is None:
+            return devices
         try:
-            wasapi_info = self.p.get_host_api_info_by_type(pyaudio.paWASAPI)
+            wasapi_info = self.p.get_host_api_info_by_type(_pyaudio().paWASAPI)
             for i in range(self.p.get_device_count()):
                 dev = self.p.get_device_info_by_index(i)
                 if dev["hostApi"] == wasapi_info["index"] and dev["maxInputChannels"] > 0:
@@ -29,10 +99,21 @@ class AudioProcessor:
             pass
         return devices
 
-    def open_stream(self, device_index):
+    def open_stream(self, device_index, callback=False, hop=None):
+        """
+        callback=False: 阻塞读取，每次 get_audio_frame 读一个 CHUNK
+        callback=True:  PortAudio 回调写入环形缓冲区，按 hop 取重叠窗口分析
+        """
+        if self.p is None:
+            print("[Audio] 没有可用的音频后端 (需要 pyaudiowpatch)")
+            return False
+        if callback:
+            return self.open_source(PortAudioSource(self.p, device_index, self.CHUNK), hop)
+        from spectrum import SpectrumEngine
+
         dev_info = self.p.get_device_info_by_index(device_index)
         self.stream = self.p.open(
-            format=pyaudio.paInt16,
+            format=_pyaudio().paInt16,
             channels=dev_info["maxInputChannels"],
             rate=int(dev_info["defaultSampleRate"]),
             frames_per_buffer=self.CHUNK,
@@ -40,9 +121,46 @@ class AudioProcessor:
             input_device_index=device_index
         )
         self.freq_resolution = int(dev_info["defaultSampleRate"]) / self.CHUNK
+        # 窗函数/频段边界/缓冲区只在打开流时计算一次
+        self.engine = SpectrumEngine(
+            chunk=self.CHUNK,
+            channels=dev_info["maxInputChannels"],
+            rate=int(dev_info["defaultSampleRate"]),
+            bands=self.bands,
+            gains=self.band_gains
+        )
+        return True
+
+    def open_source(self, source, hop=None, ring=None):
+        """
+        使用任意采集源 (PortAudioSource / SyntheticSource / WaveFileSource)
+        :param hop: 相邻分析窗口的间隔 (帧)，默认 CHUNK // 2 即 50% 重叠
+        :param ring: 使用给定的环形缓冲区 (如 analysis_process 的共享内存缓冲区)，默认新建
+        """
+        from audio_capture import AudioRing, WindowReader
+        from spectrum import SpectrumEngine
+
+        self.close_stream()
+        if ring is None:
+            ring = AudioRing(self.CHUNK * RING_CHUNKS, source.channels)
+        self.reader = WindowReader(ring, self.CHUNK, hop or self.CHUNK // 2)
+        self.freq_resolution = source.rate / self.CHUNK
+        self.engine = SpectrumEngine(
+            chunk=self.CHUNK,
+            channels=source.channels,
+            rate=source.rate,
+            bands=self.bands,
+            gains=self.band_gains
+        )
+        self.source = source
+        source.start(ring)
         return True
 
     def close_stream(self):
+        if self.source:
+            self.source.stop()
+            self.source = None
+            self.reader = None
         if self.stream:
             try:
                 self.stream.stop_stream()
@@ -51,37 +169,36 @@ class AudioProcessor:
                 pass
             self.stream = None
 
-    def get_audio_frame(self):
-        if not self.stream: return [0] * 6
+    def get_audio_frame(self, timeout=0.5, quantize=True):
+        """
+        取一帧频谱等级；quantize=False 时返回连续值 (交给 smoothing.BandSmoother)
+        """
+        timing = latency.enabled
+        if self.reader:
+            if timing: t0 = time.perf_counter()
+            window = self.reader.next_window(timeout)
+            if window is not None:
+                if timing:
+                    t1 = time.perf_counter()
+                    latency.record(latency.CAPTURE_WAIT, t1 - t0)
+                self.last_levels = self.engine.process(window, self.base_threshold, self.global_gain, quantize)
+                if timing: latency.record(latency.SPECTRUM, time.perf_counter() - t1)
+            return self.last_levels
+        if not self.stream: return [0] * len(self.bands)
         try:
+            if timing: t0 = time.perf_counter()
             data = self.stream.read(self.CHUNK, exception_on_overflow=False)
-            data_np = np.frombuffer(data, dtype=np.int16)
-            if len(data_np) % 2 == 0:
-                data_np = np.mean(data_np.reshape(-1, 2), axis=1)
-
-            fft_data = np.abs(np.fft.rfft(data_np * np.hanning(len(data_np))))[1:]
-            levels = []
-            bands = [150, 400, 1000, 2500, 6000, 20000]
-            gains = [1.0, 1.2, 1.5, 2.0, 3.0, 4.0]
-
-            start_idx = 0
-            for i, limit in enumerate(bands):
-                end_idx = min(int(limit / self.freq_resolution), len(fft_data))
-                energy = np.max(fft_data[start_idx:end_idx]) if start_idx < end_idx else 0
-                start_idx = end_idx
-
-                weighted = energy * gains[i]
-                if weighted < 10:
-                    lvl = 0
-                else:
-                    log_val = math.log10(weighted)
-                    lvl = int(
-                        (log_val - self.base_threshold) * self.global_gain) if log_val > self.base_threshold else 0
-                levels.append(max(0, min(10, lvl)))
+            if timing:
+                t1 = time.perf_counter()
+                latency.record(latency.CAPTURE_WAIT, t1 - t0)
+            levels = self.engine.process(data, self.base_threshold, self.global_gain, quantize)
+            if timing: latency.record(latency.SPECTRUM, time.perf_counter() - t1)
             return levels
         except:
-            return [0] * 6
+            return [0] * len(self.bands)
 
     def terminate(self):
         self.close_stream()
-        self.p.terminate()
\ No newline at end of file
+        if self._p is not None:
+            self._p.terminate()
+            self._p = None
\ No newline at end of file
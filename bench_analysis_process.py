@@ -0,0 +1,164 @@
+"""
+界面负载下的频谱抖动：线程内分析 vs 独立进程分析 (软件模拟器 + 合成信号，不需要声卡/CH341)
+与 电脑音频监测.py 相同的结构：分析 -> BandSmoother -> 60fps 显示线程 (FramePacer) -> DisplayWriter，
+另开一个线程模拟 Tk 界面的负载 (长时间持有 GIL 的 C 调用 + 纯 Python 回调)。
+统计分析吞吐 (每秒完成的窗口数，理想值 rate / hop)、显示线程取到的结果有多旧 (分析完成 -> 显示)、
+以及显示帧间隔抖动。
+
+    python bench_analysis_process.py                 # 两种模式各跑 5 秒
+    python bench_analysis_process.py -t 10 --load 0  # 不加界面负载作对照
+"""
+import argparse
+import json
+import random
+import statistics
+import threading
+import time
+
+from analysis_process import AnalysisProcess
+from audio_capture import SyntheticSource
+from audio_monitor import AudioProcessor
+from display_writer import DisplayWriter
+from frame_pacer import FramePacer
+from smoothing import BandSmoother
+from spi_comm import SPIAdapter
+from transport import PT6315Emulator
+from vfd_driver import VFDScreen
+
+RATE = 48000
+CHANNELS = 2
+
+
+def ui_load(stop_event, duty):
+    """
+    模拟界面线程：每 100ms 一个周期，其中 duty 比例的时间在忙
+    一半是 sorted (一次约数十毫秒的 C 调用，期间不释放 GIL，类似 Tk 重排/重绘)，一半是纯 Python 回调
+    """
+    rnd = random.Random(0)
+    data = [rnd.random() for _ in range(200000)]
+    while not stop_event.is_set():
+        start = time.perf_counter()
+        busy = 0.1 * duty
+        while time.perf_counter() - start < busy / 2:
+            sorted(data)
+        while time.perf_counter() - start < busy:
+            sum(i * i for i in range(1000))
+        stop_event.wait(max(0.0, 0.1 - (time.perf_counter() - start)))
+
+
+class ThreadAnalysis:
+    """与 电脑音频监测.spectrum_worker 相同：分析线程在主进程里"""
+
+    def __init__(self):
+        self.audio = AudioProcessor(gain=6.0, threshold=4.0)
+        self.seq = 0
+        self.latest_frame = (0, [0.0] * len(self.audio.bands), 0.0)
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.audio.open_source(SyntheticSource(RATE, CHANNELS, signal="sweep"))
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        windows = 0
+        while not self.stop_event.is_set():
+            levels = self.audio.get_audio_frame(quantize=False)
+            if self.audio.reader.windows_read != windows:
+                windows = self.audio.reader.windows_read
+                self.seq += 1
+                self.latest_frame = (self.seq, levels, time.perf_counter())
+
+    def latest(self):
+        return self.latest_frame
+
+    def wait_ready(self):
+        while self.seq == 0:
+            time.sleep(0.01)
+        return True
+
+    def close(self):
+        self.stop_event.set()
+        self.thread.join(timeout=1.0)
+        self.audio.terminate()
+
+
+def run(mode, seconds, duty):
+    if mode == "process":
+        analysis = AnalysisProcess(CHANNELS, RATE, ("synthetic", {"rate": RATE, "channels": CHANNELS,
+                                                                  "signal": "sweep"}), gain=6.0)
+    else:
+        analysis = ThreadAnalysis()
+    analysis.start()
+    analysis.wait_ready()
+
+    spi = SPIAdapter(transport=PT6315Emulator())
+    spi.open()
+    vfd = VFDScreen(spi)
+    vfd.init_device()
+    writer = DisplayWriter(vfd, fps=60)
+    writer.start()
+    smoother = BandSmoother()
+    pacer = FramePacer(fps=60, writer=writer, window=100000)
+
+    stop_event = threading.Event()
+    load = threading.Thread(target=ui_load, args=(stop_event, duty), daemon=True)
+    if duty > 0:
+        load.start()
+
+    ages = []
+    last_seq = first_seq = analysis.latest()[0]
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pacer.begin()
+        seq, levels, t = analysis.latest()
+        ages.append(time.perf_counter() - t)
+        if seq != last_seq:
+            last_seq = seq
+            smoother.update(levels)
+        bars, peaks = smoother.sample()
+        writer.submit(vfd.encode_spectrum(bars, peaks))
+        pacer.wait()
+
+    stop_event.set()
+    if load.is_alive():
+        load.join()
+    writer.stop()
+    analysis.close()
+    spi.close()
+
+    ages.sort()
+    stats = pacer.get_stats()
+    return {
+        "windows_per_s": (last_seq - first_seq) / seconds,
+        "age_p50_ms": statistics.median(ages) * 1000,
+        "age_p99_ms": ages[int(len(ages) * 0.99)] * 1000,
+        "age_max_ms": ages[-1] * 1000,
+        "display_fps": stats["fps"],
+        "display_jitter_ms": stats["jitter_ms"],
+        "display_max_jitter_ms": stats["max_jitter_ms"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="线程内分析 vs 独立进程分析的抖动对比")
+    parser.add_argument("-t", "--seconds", type=float, default=5.0, help="每种模式运行的秒数")
+    parser.add_argument("--load", type=float, default=0.6, help="界面负载占空比 (0-1)，0 表示无负载")
+    parser.add_argument("-o", "--output", help="结果写入 JSON")
+    args = parser.parse_args()
+
+    print(f"界面负载 {args.load:.0%}，每种模式 {args.seconds:.0f} 秒 (理想分析吞吐 {RATE / 512:.1f} 窗口/秒)")
+    print(f"{'模式':<8}{'窗口/秒':>8}{'结果年龄p50':>12}{'p99':>8}{'max':>8}{'显示fps':>9}{'显示抖动':>9}{'最大抖动':>9}  (ms)")
+    results = {}
+    for mode in ("thread", "process"):
+        r = results[mode] = run(mode, args.seconds, args.load)
+        print(f"{mode:<8}{r['windows_per_s']:8.1f}{r['age_p50_ms']:12.2f}{r['age_p99_ms']:8.2f}{r['age_max_ms']:8.2f}"
+              f"{r['display_fps']:9.1f}{r['display_jitter_ms']:9.2f}{r['display_max_jitter_ms']:9.2f}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+批量发送校验 + USB 传输次数对比 (软件模拟器，不需要 CH341)
+1. 固定指令的编码结果与按 CH341 命令格式手工推出的字节逐一比对 (不经过 CH341StreamDecoder，
+   否则编码和解码出自同一套理解，错了也能互相对上)
+2. 同一串随机 PT6315 指令分别逐条发送和批量发送，模拟器最终的显存/亮度状态必须完全一致。
+   批量发送分两种：默认配置 (raw_batch=False) 和硬件一样仍是每条指令一次传输；
+   raw_batch=True 才会合并 USB 传输，这条路径尚未在真实 CH341 上验证过。
+"""
+import random
+
+from spi_comm import SPIAdapter
+from transport import PT6315Emulator, build_ch341_batch
+from vfd_driver import DISPLAY_RAM_SIZE
+
+
+def _hex(text):
+    return bytes.fromhex(text.replace(" ", ""))
+
+
+# 手工推导 (CH341DLL.H)：命令包 32 字节；0xAB = UIO_STREAM，子命令 0x80|电平 = STM_OUT，0x40|方向 = STM_DIR，
+# 0x20 = STM_END；0xA8 = SPI_STREAM，后跟最多 31 个数据字节。
+# 引脚 D0 = CS，D3 = CLK，D5 = DOUT，D1/D2/D4 保持高：
+#   B7 = 片选高 CLK 低 (0x37)   7F = D0-D5 全部输出   B6 = 片选低、DOUT=1、CLK 低 (0x36)
+#   BE = B6 + CLK 高           96 = 片选低、DOUT=0 (0x16)   9E = 96 + CLK 高
+# 0x8F (显示开、最高亮度) LSB First 依次为 1 1 1 1 0 0 0 1，每位先给数据再拉高 CLK
+BITBANG_8F = _hex("AB B7 7F B6" + " B6 BE" * 4 + " 96 9E" * 3 + " B6 BE" + " B7 20") + bytes(10)
+# 多字节指令：片选拉低的 UIO 包 (补齐 32 字节) + SPI 数据包；数据不翻转 (SPI_STREAM 本身 LSB First)
+SELECT_PACKET = _hex("AB B7 7F B6 20") + bytes(27)
+DESELECT = _hex("AB B7 20")
+
+GOLDEN = [
+    # 单字节指令：一个完整 UIO 包，片选已在包内拉高，没有读回
+    ([b"\x8f"], [(BITBANG_8F, 0)]),
+    # 3 字节写显存：SPI 短包结束本次传输，读回 3 字节；片选在下一次传输里拉高
+    ([b"\xc0\x01\x80"], [(SELECT_PACKET + _hex("A8 C0 01 80"), 3), (DESELECT, 0)]),
+    # 整屏 49 字节：31 + 18 拆成两个 SPI 包，只有第二个是短包
+    ([b"\xc0" + bytes(48)], [(SELECT_PACKET + _hex("A8 C0") + bytes(30) + _hex("A8") + bytes(18), 49),
+                             (DESELECT, 0)]),
+    # 亮度 + 写显存：满 32 字节的 UIO 包不结束传输，两条指令在同一次传输里
+    ([b"\x8f", b"\xc0\x01\x80"], [(BITBANG_8F + SELECT_PACKET + _hex("A8 C0 01 80"), 3), (DESELECT, 0)]),
+]
+
+
+def check_golden():
+    ok = True
+    for commands, expected in GOLDEN:
+        actual = build_ch341_batch(commands)
+        if actual != expected:
+            ok = False
+            print(f"❌ 编码不一致: {[c.hex() for c in commands]}")
+            for data, readback in actual:
+                print(f"   实际 {data.hex(' ')} (读回 {readback})")
+            for data, readback in expected:
+                print(f"   期望 {data.hex(' ')} (读回 {readback})")
+    print(f"固定编码校验: {len(GOLDEN)} 组" + ("通过" if ok else "失败"))
+    return ok
+
+
+def random_commands(rnd, count):
+    """生成随机指令：模式设置、数据设置、亮度、固定/自增地址写入"""
+    commands = [[0x06], [0x40], [0x8F]]
+    for _ in range(count):
+        kind = rnd.random()
+        if kind < 0.25:
+            commands.append([0x88 + rnd.randrange(8)])  # 亮度
+        elif kind < 0.35:
+            commands.append([0x80])  # 关显示
+        elif kind < 0.45:
+            commands.append([rnd.choice((0x40, 0x44))])  # 自增 / 固定地址
+        else:
+            addr = rnd.randrange(DISPLAY_RAM_SIZE)
+            length = rnd.choice((1, 3, 6, 30, 31, 48, 62))
+            commands.append([0xC0 + addr] + [rnd.randrange(256) for _ in range(length)])
+    return commands
+
+
+def run(seed=0, count=2000):
+    rnd = random.Random(seed)
+    commands = random_commands(rnd, count)
+
+    plain = PT6315Emulator()
+    spi_plain = SPIAdapter(transport=plain)
+    for command in commands:
+        spi_plain.send_data(command)
+
+    # 默认配置 (raw_batch=False) 与硬件一样逐条传输；raw_batch=True 才合并成原始命令流
+    chunks = []
+    i = 0
+    while i < len(commands):
+        n = rnd.randint(1, 6)
+        chunks.append(commands[i:i + n])
+        i += n
+    results = []
+    for raw_batch in (False, True):
+        batched = PT6315Emulator(raw_batch=raw_batch)
+        spi_batched = SPIAdapter(transport=batched)
+        for chunk in chunks:
+            with spi_batched.transaction() as tx:
+                for command in chunk:
+                    tx.send_data(command)
+        results.append(batched)
+
+    same = all(plain.snapshot() == e.snapshot() for e in results)
+    a = plain.get_stats()
+    print(f"指令数: {len(commands)}")
+    print(f"逐条发送: USB 传输 {a['usb_transfers']:5d}  片选周期 {a['transactions']}  线上字节 {a['bytes_on_wire']}")
+    for label, e in zip(("批量 (默认)", "批量 (raw)"), results):
+        b = e.get_stats()
+        print(f"{label}: USB 传输 {b['usb_transfers']:5d}  片选周期 {b['transactions']}  线上字节 {b['bytes_on_wire']}")
+    print("状态一致" if same else "❌ 状态不一致")
+    return same
+
+
+if __name__ == "__main__":
+    ok = check_golden()
+    ok = all(run(seed) for seed in range(5)) and ok
+    raise SystemExit(0 if ok else 1)
@@ -0,0 +1,73 @@
+"""
+SPIAdapter.send_data 发送路径微基准
+对比旧实现 (字符串翻转 + 每帧新建 list/ctypes 数组) 与查表翻转 + 复用缓冲区的新实现。
+不需要 CH341 设备：用空操作的假 DLL 对象代替。
+"""
+import threading
+import timeit
+from ctypes import c_ubyte
+
+from spi_comm import SPIAdapter
+
+
+class NullLib:
+    """假 CH341 DLL，所有调用直接返回成功"""
+
+    def CH341OpenDevice(self, index):
+        return 1
+
+    def CH341SetStream(self, index, mode):
+        return 1
+
+    def CH341StreamSPI4(self, index, chip_select, length, buf):
+        return 1
+
+    def CH341CloseDevice(self, index):
+        return 1
+
+
+class LegacySPIAdapter:
+    """改动前的 send_data 实现，仅用于对比"""
+
+    def __init__(self, lib):
+        self.lib = lib
+        self.dev_index = 0
+        self.lock = threading.Lock()
+
+    def _reverse_byte(self, b):
+        return int('{:08b}'.format(b)[::-1], 2)
+
+    def send_data(self, data_list):
+        reversed_data = [self._reverse_byte(b) for b in data_list]
+        c_buf = (c_ubyte * len(reversed_data))(*reversed_data)
+        with self.lock:
+            self.lib.CH341StreamSPI4(self.dev_index, 0x80, len(c_buf), c_buf)
+
+
+def run(number=20000, repeat=5):
+    lib = NullLib()
+    legacy = LegacySPIAdapter(lib)
+    fast = SPIAdapter(lib=lib)
+
+    # 整屏帧：0xC0 + 48 字节显存
+    payload_list = [0xC0] + [(i * 37) & 0xFF for i in range(48)]
+    payload_bytes = bytes(payload_list)
+
+    cases = [
+        ("legacy list", lambda: legacy.send_data(payload_list)),
+        ("new list", lambda: fast.send_data(payload_list)),
+        ("new bytes", lambda: fast.send_data(payload_bytes)),
+    ]
+
+    results = {}
+    for name, func in cases:
+        best = min(timeit.repeat(func, number=number, repeat=repeat)) / number
+        results[name] = best
+        print(f"{name:<12} {best * 1e6:8.2f} us/帧")
+
+    print(f"加速比 (legacy / new bytes): {results['legacy list'] / results['new bytes']:.1f}x")
+    return results
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,149 @@
+"""
+启动耗时基准：每个入口在全新的子进程里测 "导入耗时" 和 "首帧耗时" (到模拟器收到第一帧为止)
+重复若干次取中位数，与预算 (毫秒) 比较，超出则退出码为 1。
+子进程强制 VFD_TRANSPORT=emulator，不需要 CH341 / 声卡 / 传感器。
+
+用法:
+    python bench_startup.py                         # 全部入口，默认预算
+    python bench_startup.py -k spectrum -n 9        # 只测 spectrum，重复 9 次
+    python bench_startup.py --budget spectrum=400   # 覆盖某个入口的总预算
+    python bench_startup.py -o startup.json         # 结果写入 JSON
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# 入口: (导入代码, 首帧代码, 导入+首帧预算 ms)
+# 首帧代码里的 spi 是已打开的模拟器 SPIAdapter
+ENTRIES = {
+    "core": (
+        "import spi_comm, vfd_driver, display_writer, animation",
+        "vfd = vfd_driver.VFDScreen(spi); vfd.init_device(); vfd.display_text('VFD')",
+        150,
+    ),
+    "spectrum": (
+        "import 电脑音频监测",
+        "from audio_capture import SyntheticSource\n"
+        "from vfd_driver import VFDScreen\n"
+        "audio = 电脑音频监测.AudioProcessor()\n"
+        "source = SyntheticSource(realtime=False)\n"
+        "audio.open_source(source)\n"
+        "source.pump(audio.CHUNK // source.chunk + 1)\n"
+        "vfd = VFDScreen(spi); vfd.init_device()\n"
+        "vfd.write_frame(vfd.encode_spectrum(audio.get_audio_frame()))\n"
+        "audio.terminate()",
+        300,
+    ),
+    "carousel": (
+        "import 硬件信息监测",
+        "vfd = 硬件信息监测.CarouselVFDScreen(spi); vfd.init_device()\n"
+        "vfd.display_metrics('CT', 45, 'C')",
+        50,
+    ),
+    "keyboard": (
+        "import 键盘监测",
+        "from key_echo import KeyEchoPipeline\n"
+        "vfd = 键盘监测.VFDScreen(spi); vfd.init_device()\n"
+        "writer = 键盘监测.DisplayWriter(vfd); writer.start()\n"
+        "echo = KeyEchoPipeline(writer, 键盘监测.GRID_TEXT_ORDER, 键盘监测.GRID_CURSOR)\n"
+        "echo.render('A'); writer.flush(); writer.stop()",
+        50,
+    ),
+    "daemon": (
+        "import vfd_daemon",
+        "mode = vfd_daemon.CarouselMode()\n"
+        "vfd = vfd_daemon.VFDScreen(spi); vfd.init_device()\n"
+        "vfd.write_frame(mode.encoder.encode(('C', 'T', '4', '5', ' ', 'C', ' ')))",
+        50,
+    ),
+}
+
+CHILD = """
+import json, sys, time
+t0 = time.perf_counter()
+{imports}
+t1 = time.perf_counter()
+from spi_comm import SPIAdapter
+from transport import PT6315Emulator
+emulator = PT6315Emulator()
+spi = SPIAdapter(transport=emulator)
+spi.open()
+{first_frame}
+t2 = time.perf_counter()
+assert any(emulator.snapshot()['ram']), "首帧没有写到模拟器"
+print(json.dumps({{"import_ms": (t1 - t0) * 1000, "first_frame_ms": (t2 - t1) * 1000,
+                  "numpy": "numpy" in sys.modules}}))
+"""
+
+
+def run_once(name):
+    imports, first_frame, _ = ENTRIES[name]
+    code = CHILD.format(imports=imports, first_frame=first_frame)
+    env = dict(os.environ, VFD_TRANSPORT="emulator", PYTHONDONTWRITEBYTECODE="1")
+    env.pop("VFD_RECORD", None)
+    env.pop("VFD_LATENCY_DUMP", None)
+    proc = subprocess.run([sys.executable, "-c", code], cwd=os.path.dirname(os.path.abspath(__file__)),
+                          env=env, capture_output=True, text=True, encoding="utf-8")
+    if proc.returncode != 0:
+        raise RuntimeError(f"{name} 子进程失败:\n{proc.stderr.strip()}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def measure(name, repeat):
+    runs = [run_once(name) for _ in range(repeat)]
+    import_ms = statistics.median(r["import_ms"] for r in runs)
+    first_ms = statistics.median(r["first_frame_ms"] for r in runs)
+    return {
+        "import_ms": import_ms,
+        "first_frame_ms": first_ms,
+        "total_ms": statistics.median(r["import_ms"] + r["first_frame_ms"] for r in runs),
+        "numpy_loaded": runs[-1]["numpy"],
+    }
+
+
+def parse_budgets(items):
+    budgets = {name: entry[2] for name, entry in ENTRIES.items()}
+    for item in items:
+        name, _, value = item.partition("=")
+        if name not in ENTRIES or not value:
+            raise SystemExit(f"无效的预算 {item!r}，格式为 入口=毫秒，入口: {', '.join(ENTRIES)}")
+        budgets[name] = float(value)
+    return budgets
+
+
+def main():
+    parser = argparse.ArgumentParser(description="入口启动耗时基准")
+    parser.add_argument("-k", "--filter", default="", help="只运行名字包含该字符串的入口")
+    parser.add_argument("-n", "--repeat", type=int, default=5, help="每个入口重复的进程数")
+    parser.add_argument("--budget", action="append", default=[], metavar="入口=毫秒", help="覆盖预算")
+    parser.add_argument("-o", "--output", help="结果写入 JSON")
+    args = parser.parse_args()
+
+    budgets = parse_budgets(args.budget)
+    results = {}
+    failed = []
+    for name in ENTRIES:
+        if args.filter not in name:
+            continue
+        r = results[name] = measure(name, args.repeat)
+        r["budget_ms"] = budgets[name]
+        over = r["total_ms"] > budgets[name]
+        if over:
+            failed.append(name)
+        print(f"{name:<10} 导入 {r['import_ms']:7.1f} ms  首帧 {r['first_frame_ms']:6.1f} ms  "
+              f"合计 {r['total_ms']:7.1f} / {budgets[name]:.0f} ms  "
+              f"numpy {'已加载' if r['numpy_loaded'] else '未加载'}  {'❌ 超出预算' if over else 'OK'}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+    if failed:
+        print(f"超出预算: {', '.join(failed)}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
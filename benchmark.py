@@ -0,0 +1,389 @@
+"""
+显示链路热点基准测试
+无需 CH341 / 声卡 / WMI / NVML，全部使用合成输入，可在 Linux 上无头运行。
+
+用法:
+    python benchmark.py                                 # 运行全部用例并打印
+    python benchmark.py -o result.json                  # 结果写入 JSON
+    python benchmark.py --baseline base.json -t 0.2     # 与基线对比，任一用例变慢超过 20% 则退出码为 1
+    python benchmark.py -k spectrum                     # 只运行名字包含 spectrum 的用例
+"""
+import argparse
+import importlib
+import itertools
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+import timeit
+import types
+
+import numpy as np
+
+from spi_comm import SPIAdapter
+from transport import PT6315Emulator
+from vfd_driver import VFDScreen
+
+
+# ==========================================
+# 1. 替身：假 DLL / 假传感器 / 假音频流
+# ==========================================
+class SkipCase(Exception):
+    """用例在当前平台不可用 (缺少 /proc、未安装可选依赖)，跳过而不算失败"""
+
+
+class NullLib:
+    """假 CH341 DLL，所有调用直接返回成功"""
+
+    def CH341OpenDevice(self, index):
+        return 1
+
+    def CH341SetStream(self, index, mode):
+        return 1
+
+    def CH341StreamSPI4(self, index, chip_select, length, buf):
+        return 1
+
+    def CH341CloseDevice(self, index):
+        return 1
+
+
+class FakeThermalZone:
+    CurrentTemperature = 3231  # 0.1K，读数 49°C
+
+
+class FakeWMI:
+    def __init__(self, namespace=None):
+        pass
+
+    def MSAcpi_ThermalZoneTemperature(self):
+        return [FakeThermalZone()]
+
+
+def _fake_sensor_modules():
+    """wmi / pynvml / psutil 的替身，读数固定，与本机有没有这些库、有什么硬件无关"""
+    return {
+        "wmi": types.SimpleNamespace(WMI=FakeWMI),
+        "pynvml": types.SimpleNamespace(
+            nvmlInit=lambda: None,
+            nvmlShutdown=lambda: None,
+            nvmlDeviceGetHandleByIndex=lambda index: object(),
+            nvmlDeviceGetTemperature=lambda handle, sensor: 55,
+            nvmlDeviceGetUtilizationRates=lambda handle: types.SimpleNamespace(gpu=37),
+        ),
+        "psutil": types.SimpleNamespace(
+            cpu_percent=lambda interval=None: 23.0,
+            virtual_memory=lambda: types.SimpleNamespace(percent=41.0),
+        ),
+    }
+
+
+class FakeStream:
+    """假 PortAudio 流：循环返回预先生成的 int16 数据"""
+
+    def __init__(self, buffers):
+        self.buffers = buffers
+        self.i = 0
+
+    def read(self, n, exception_on_overflow=False):
+        self.i = (self.i + 1) % len(self.buffers)
+        return self.buffers[self.i]
+
+    def stop_stream(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def make_pcm(kind, chunk=1024, channels=2, rate=48000, count=16, seed=0):
+    """生成若干块交错 int16 数据：sine (多个频点正弦) 或 noise (白噪声)"""
+    rng = np.random.default_rng(seed)
+    t = np.arange(chunk) / rate
+    buffers = []
+    for i in range(count):
+        if kind == "sine":
+            freq = 60.0 * (1.6 ** i)
+            mono = 12000 * np.sin(2 * np.pi * freq * t)
+        else:
+            mono = rng.normal(0, 4000, chunk)
+        pcm = np.clip(mono, -32768, 32767).astype(np.int16)
+        buffers.append(np.repeat(pcm[:, None], channels, axis=1).tobytes())
+    return buffers
+
+
+# ==========================================
+# 2. 基准用例：每个用例返回一个无参可调用对象
+# ==========================================
+def case_spi_send_list():
+    spi = SPIAdapter(lib=NullLib())
+    payload = [0xC0] + [(i * 37) & 0xFF for i in range(48)]
+    return lambda: spi.send_data(payload)
+
+
+def case_spi_send_bytes():
+    spi = SPIAdapter(lib=NullLib())
+    payload = bytes([0xC0] + [(i * 37) & 0xFF for i in range(48)])
+    return lambda: spi.send_data(payload)
+
+
+def case_get_char_bytes():
+    vfd = VFDScreen(SPIAdapter(lib=NullLib()))
+    chars = list("CT45C%") + list(range(11))
+
+    def run():
+        for c in chars:
+            vfd.get_char_bytes(c)
+
+    return run
+
+
+def _spectrum_levels(count=4096, seed=1):
+    rnd = random.Random(seed)
+    levels = [0] * 6
+    frames = []
+    for _ in range(count):
+        j = rnd.randrange(6)
+        levels[j] = max(0, min(10, levels[j] + rnd.choice((-2, -1, 1, 2))))
+        frames.append(list(levels))
+    return frames
+
+
+def case_encode_spectrum_cached():
+    vfd = VFDScreen(SPIAdapter(lib=NullLib()))
+    frames = _spectrum_levels(64)
+    it = itertools.cycle(frames)
+    return lambda: vfd.encode_spectrum(next(it))
+
+
+def case_encode_spectrum_uncached():
+    vfd = VFDScreen(SPIAdapter(lib=NullLib()))
+    vfd.get_encoder().cache_size = 0
+    frames = _spectrum_levels()
+    it = itertools.cycle(frames)
+    return lambda: vfd.encode_spectrum(next(it))
+
+
+def case_display_spectrum():
+    spi = SPIAdapter(transport=PT6315Emulator())
+    spi.open()
+    vfd = VFDScreen(spi)
+    vfd.init_device()
+    frames = _spectrum_levels()
+    it = itertools.cycle(frames)
+    return lambda: vfd.display_spectrum(next(it))
+
+
+def case_carousel_display_metrics():
+    module = importlib.import_module("硬件信息监测")
+    spi = SPIAdapter(transport=PT6315Emulator())
+    spi.open()
+    vfd = module.CarouselVFDScreen(spi)
+    vfd.init_device()
+    items = [("CT", 45, "C"), ("GT", 61, "C"), ("MU", 73, "%"), ("GU", 8, "%"), ("CU", 100, "%")]
+    it = itertools.cycle(items)
+    return lambda: vfd.display_metrics(*next(it))
+
+
+def _audio_case(kind):
+    # 平台相关的依赖都是按需导入的，这里只用到假音频流，不会加载 pyaudiowpatch
+    from audio_monitor import AudioProcessor
+    from spectrum import SpectrumEngine
+
+    audio = AudioProcessor(gain=6.0, threshold=4.0)
+    rate, channels = 48000, 2
+    audio.stream = FakeStream(make_pcm(kind, audio.CHUNK, channels, rate))
+    audio.freq_resolution = rate / audio.CHUNK
+    audio.engine = SpectrumEngine(audio.CHUNK, channels, rate, audio.bands, audio.band_gains)
+    return audio.get_audio_frame
+
+
+def case_audio_frame_sine():
+    return _audio_case("sine")
+
+
+def case_audio_frame_noise():
+    return _audio_case("noise")
+
+
+def case_offline_analysis():
+    # 1 秒立体声噪声整段做 STFT (94 个窗口)，与逐帧的 audio.get_audio_frame 对照
+    from spectrum import SpectrumEngine
+
+    rate = 48000
+    samples = np.frombuffer(b''.join(make_pcm("noise", rate // 10, 2, rate, count=10)), dtype=np.int16)
+    engine = SpectrumEngine(1024, 2, rate)
+    return lambda: engine.process_batch(samples, 512, 4.0, 6.0)
+
+
+def case_hardware_metrics():
+    # 应用里 wmi / pynvml / psutil 仍按需导入；这里预先放入替身，无论本机是否有真实传感器都只测代码路径本身
+    # (hardware.sample[psutil] 直接 import psutil，不受影响)
+    from hardware_monitor import HardwareMonitor
+    from lazy_import import inject
+
+    for name, module in _fake_sensor_modules().items():
+        inject(name, module)
+    # 刷新间隔全部为 0：每次调用都完整采样一遍所有传感器，而不是只测缓存命中
+    monitor = HardwareMonitor(intervals={name: 0.0 for name in ("cpu_temp", "gpu", "memory", "cpu")})
+    assert monitor.get_all_metrics() == {"CT": 49, "GT": 55, "M": 41, "G": 37, "C": 23}
+    return monitor.get_all_metrics
+
+
+def case_procfs_sample():
+    # 一次完整采样 (CPU 占用率 + 内存 + 温度)，非 Linux 时跳过
+    if not os.path.exists("/proc/stat"):
+        raise SkipCase("没有 /proc")
+    from procfs_monitor import ProcfsSensors
+
+    sensors = ProcfsSensors()
+
+    def sample():
+        sensors.cpu_percent()
+        sensors.memory_percent()
+        sensors.cpu_temp()
+    return sample
+
+
+def case_psutil_sample():
+    try:
+        import psutil
+    except ImportError:
+        raise SkipCase("未安装 psutil")
+
+    def sample():
+        psutil.cpu_percent(interval=None)
+        psutil.virtual_memory()
+    return sample
+
+
+CASES = {
+    "spi.send_data[list49]": case_spi_send_list,
+    "spi.send_data[bytes49]": case_spi_send_bytes,
+    "vfd.get_char_bytes[x17]": case_get_char_bytes,
+    "vfd.encode_spectrum[cached]": case_encode_spectrum_cached,
+    "vfd.encode_spectrum[uncached]": case_encode_spectrum_uncached,
+    "vfd.display_spectrum[emulator]": case_display_spectrum,
+    "carousel.display_metrics[emulator]": case_carousel_display_metrics,
+    "audio.get_audio_frame[sine]": case_audio_frame_sine,
+    "audio.get_audio_frame[noise]": case_audio_frame_noise,
+    "audio.offline_stft[1s]": case_offline_analysis,
+    "hardware.get_all_metrics[stub]": case_hardware_metrics,
+    "hardware.sample[procfs]": case_procfs_sample,
+    "hardware.sample[psutil]": case_psutil_sample,
+}
+
+
+# ==========================================
+# 3. 运行 / 对比
+# ==========================================
+def measure(func, min_time=0.2, repeat=5):
+    """自动确定循环次数，使每轮至少运行 min_time 秒；返回每次调用的耗时统计 (微秒)"""
+    number = 1
+    while True:
+        elapsed = timeit.timeit(func, number=number)
+        if elapsed >= min_time / 10 or number >= 10 ** 7:
+            break
+        number *= 10
+    # 按校准结果放大到约 min_time 秒一轮
+    number = max(1, int(number * min_time / max(elapsed, 1e-9)))
+    samples = [t / number * 1e6 for t in timeit.repeat(func, number=number, repeat=repeat)]
+    return {
+        "min_us": min(samples),
+        "median_us": statistics.median(samples),
+        "stdev_us": statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        "number": number,
+        "repeat": repeat,
+    }
+
+
+def run_cases(pattern=None, min_time=0.2, repeat=5):
+    """返回 (结果, 失败的用例, 跳过的用例)；构造时抛出 SkipCase 以外的异常算失败"""
+    results, failed, skipped = {}, [], []
+    for name, factory in CASES.items():
+        if pattern and pattern not in name:
+            continue
+        try:
+            func = factory()
+        except SkipCase as e:
+            print(f"{name:<38} 跳过: {e}")
+            skipped.append(name)
+            continue
+        except Exception as e:
+            print(f"{name:<38} 失败: {e!r}")
+            failed.append(name)
+            continue
+        stats = measure(func, min_time, repeat)
+        results[name] = stats
+        print(f"{name:<38} {stats['min_us']:10.2f} us  (median {stats['median_us']:.2f})")
+    return results, failed, skipped
+
+
+def compare(results, baseline, threshold, pattern=None, skipped=()):
+    """
+    与基线对比 min_us，返回变慢超过阈值的用例列表；
+    基线里有、这次却没有结果的用例 (被 -k 过滤或在本平台跳过的除外) 同样算失败
+    """
+    regressions = []
+    print(f"\n--- 与基线对比 (阈值 +{threshold:.0%}) ---")
+    for name, stats in results.items():
+        base = baseline.get("results", {}).get(name)
+        if base is None:
+            print(f"{name:<38} 基线中无此用例")
+            continue
+        ratio = stats["min_us"] / base["min_us"] if base["min_us"] else float("inf")
+        flag = "REGRESSION" if ratio > 1 + threshold else "ok"
+        print(f"{name:<38} {base['min_us']:10.2f} -> {stats['min_us']:10.2f} us  x{ratio:.2f}  {flag}")
+        if ratio > 1 + threshold:
+            regressions.append(name)
+    for name in baseline.get("results", {}):
+        if name in results or name in skipped or (pattern and pattern not in name):
+            continue
+        print(f"{name:<38} MISSING (本次没有结果)")
+        regressions.append(name)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="VFD 显示链路基准测试")
+    parser.add_argument("-o", "--output", help="结果 JSON 输出路径")
+    parser.add_argument("-b", "--baseline", help="基线 JSON，对比后变慢超过阈值则失败")
+    parser.add_argument("-t", "--threshold", type=float, default=0.2, help="允许的变慢比例 (默认 0.2 = 20%%)")
+    parser.add_argument("-k", "--filter", help="只运行名字包含该字符串的用例")
+    parser.add_argument("--min-time", type=float, default=0.2, help="每轮最短运行时间 (秒)")
+    parser.add_argument("--repeat", type=int, default=5, help="重复轮数，取最小值")
+    args = parser.parse_args(argv)
+
+    results, failed, skipped = run_cases(args.filter, args.min_time, args.repeat)
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"\n结果已写入 {os.path.abspath(args.output)}")
+
+    if failed:
+        print(f"\n❌ {len(failed)} 个用例构造失败: {', '.join(failed)}")
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = [name for name in compare(results, baseline, args.threshold, args.filter, skipped)
+                       if name not in failed]
+        if regressions:
+            print(f"\n❌ {len(regressions)} 个热点变慢或缺失: {', '.join(regressions)}")
+            return 1
+        if not failed:
+            print("\n✅ 无性能回退")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,169 @@
+"""
+多设备池
+一台主机同时驱动多块 CH341 + VFD：每块屏有自己的传输后端、SPI 锁和写入线程，
+VirtualFramebuffer 把多块屏拼成一块宽屏，各屏的传输并行进行，而不是一块接一块地发。
+"""
+import ctypes
+import os
+import time
+
+from display_writer import DisplayWriter
+from spi_comm import SPIAdapter
+from transport import DEFAULT_DLL_PATH, CH341Transport, PT6315Emulator
+from vfd_driver import VFDScreen
+
+# CH341 驱动最多支持的设备索引
+MAX_CH341_DEVICES = 16
+
+
+def load_ch341_dll(dll_name=DEFAULT_DLL_PATH):
+    """加载一次 DLL，所有设备共用同一个库句柄"""
+    try:
+        return ctypes.windll.LoadLibrary(os.path.abspath(dll_name))
+    except Exception as e:
+        try:
+            return ctypes.windll.LoadLibrary("CH341DLLA64.DLL")
+        except:
+            raise RuntimeError(f"无法加载 DLL，请检查路径: {e}")
+
+
+def enumerate_ch341(lib, max_devices=MAX_CH341_DEVICES):
+    """逐个尝试打开设备索引，返回能打开的索引列表 (探测完会关闭)"""
+    found = []
+    for index in range(max_devices):
+        if lib.CH341OpenDevice(index) > 0:
+            found.append(index)
+            lib.CH341CloseDevice(index)
+    return found
+
+
+class DisplayUnit:
+    """一块屏：传输后端 + SPIAdapter (自带锁) + VFDScreen + 写入线程"""
+
+    def __init__(self, transport, name, fps=60, screen_class=VFDScreen):
+        self.name = name
+        self.spi = SPIAdapter(transport=transport)
+        self.vfd = screen_class(self.spi)
+        self.writer = DisplayWriter(self.vfd, fps=fps)
+
+    def open(self):
+        if not self.spi.open():
+            return False
+        self.vfd.init_device()
+        self.writer.start()
+        return True
+
+    def close(self):
+        self.writer.stop()
+        self.spi.close()
+
+
+class DevicePool:
+    def __init__(self, transports, fps=60, screen_class=VFDScreen):
+        """
+        :param transports: 每块屏一个传输后端，列表顺序即从左到右的拼接顺序
+        """
+        self.units = [DisplayUnit(t, f"VFD{i}", fps, screen_class) for i, t in enumerate(transports)]
+
+    @classmethod
+    def from_ch341(cls, dll_name=DEFAULT_DLL_PATH, max_devices=MAX_CH341_DEVICES, **kwargs):
+        """枚举所有已连接的 CH341，每个设备索引一块屏"""
+        lib = load_ch341_dll(dll_name)
+        indices = enumerate_ch341(lib, max_devices)
+        return cls([CH341Transport(dev_index=i, lib=lib) for i in indices], **kwargs)
+
+    @classmethod
+    def from_emulators(cls, count, latency=0.0, **kwargs):
+        """用若干个软件模拟器代替真实设备"""
+        return cls([PT6315Emulator(latency=latency) for _ in range(count)], **kwargs)
+
+    def open(self):
+        """打开全部设备，返回成功打开的块数 (打不开的从池中移除)"""
+        self.units = [u for u in self.units if u.open()]
+        return len(self.units)
+
+    def close(self):
+        for unit in self.units:
+            unit.close()
+
+    def flush(self, timeout=1.0):
+        """等待所有屏的写入线程发完"""
+        deadline = time.perf_counter() + timeout
+        return all(u.writer.flush(max(0.0, deadline - time.perf_counter())) for u in self.units)
+
+    def get_stats(self):
+        return {u.name: u.writer.get_stats() for u in self.units}
+
+
+class VirtualFramebuffer:
+    """
+    把池中的多块屏拼成一块宽屏
+    每块屏贡献 len(vfd.grids_text) 个显示位，从左到右依次排列
+    """
+
+    def __init__(self, pool):
+        self.pool = pool
+
+    @property
+    def width(self):
+        return sum(len(u.vfd.grids_text) for u in self.pool.units)
+
+    def submit(self, values):
+        """
+        values: 长度为 width 的显示值序列 (字符 / 频谱等级)，不足的位置留空
+        各屏只编码自己那一段并投递给自己的写入线程，立即返回
+        """
+        pos = 0
+        for unit in self.pool.units:
+            n = len(unit.vfd.grids_text)
+            chunk = tuple(values[pos:pos + n])
+            unit.writer.submit(unit.vfd.get_encoder().encode(chunk))
+            pos += n
+
+    def display_text(self, text):
+        self.submit(str(text).ljust(self.width)[:self.width])
+
+    def display_spectrum(self, levels):
+        self.submit(list(levels))
+
+
+# ==========================================
+# 👇 测试代码 (模拟器，无需设备) 👇
+# ==========================================
+if __name__ == "__main__":
+    UNITS = 4
+    LATENCY = 0.003  # 模拟每次 USB 往返 3ms
+    ROUNDS = 50
+
+    # 串行：一块屏发完再发下一块
+    screens = []
+    for _ in range(UNITS):
+        spi = SPIAdapter(transport=PT6315Emulator(latency=LATENCY))
+        spi.open()
+        vfd = VFDScreen(spi)
+        vfd.init_device()
+        screens.append(vfd)
+    t0 = time.perf_counter()
+    for r in range(ROUNDS):
+        for i, vfd in enumerate(screens):
+            vfd.display_spectrum([(r + i + k) % 11 for k in range(6)])
+    serial = time.perf_counter() - t0
+
+    # 并行：每块屏自己的写入线程
+    pool = DevicePool.from_emulators(UNITS, latency=LATENCY, fps=0)
+    pool.open()
+    fb = VirtualFramebuffer(pool)
+    t0 = time.perf_counter()
+    for r in range(ROUNDS):
+        fb.display_spectrum([(r + k) % 11 for k in range(fb.width)])
+        pool.flush()
+    parallel = time.perf_counter() - t0
+
+    fb.display_text("HELLO MULTI VFD")
+    pool.flush()
+    pool.close()
+
+    print(f"{UNITS} 块屏 x {ROUNDS} 轮, 每次传输 {LATENCY * 1000:.0f}ms")
+    print(f"串行: {serial:.3f}s   并行: {parallel:.3f}s   加速 {serial / parallel:.1f}x")
+    for unit in pool.units:
+        print(unit.name, unit.spi.transport.grid_bytes(0).hex(), unit.writer.get_stats())
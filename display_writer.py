@@ -0,0 +1,140 @@
+"""
+显示写入线程
+独占 VFDScreen / SPIAdapter，生产者通过单槽位邮箱投递帧 (新帧覆盖未发送的旧帧)，
+写入线程按目标帧率发送，生产者永远不需要等待 USB。
+"""
+import threading
+import time
+
+
+class DisplayWriter:
+    def __init__(self, vfd, fps=60):
+        """
+        :param vfd: VFDScreen 实例，之后只应由写入线程访问它的 SPI
+        :param fps: 目标帧率，0 / None 表示不限速
+        """
+        self.vfd = vfd
+        self.fps = fps
+        self.running = False
+        self.thread = None
+
+        self._cond = threading.Condition()
+        self._frame = None  # 待发送的显存帧 (从地址 0x00 开始)
+        self._control = None  # 待发送的控制指令 (如亮度 0x88-0x8F)
+        self._busy = False
+
+        # 统计
+        self.frames_submitted = 0
+        self.frames_sent = 0  # 真正交给传输后端的帧
+        self.frames_unchanged = 0  # 与当前显示相同、write_frame 整帧跳过的帧
+        self.frames_dropped = 0
+        self.controls_dropped = 0  # 未发送就被新指令覆盖的控制指令
+        self.send_errors = 0  # 发送时抛出异常的次数 (这些帧不计入 frames_sent)
+        self.send_time = 0.0  # 单次发送耗时的滑动平均 (秒)，供 frame_pacer 判断传输是否饱和
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout=1.0):
+        """停止线程，已投递但未发送的内容会先发完"""
+        with self._cond:
+            self.running = False
+            self._cond.notify_all()
+        if self.thread:
+            self.thread.join(timeout=timeout)
+            self.thread = None
+
+    def submit(self, frame):
+        """投递一帧显存数据，立即返回；未发送的旧帧会被丢弃"""
+        with self._cond:
+            if self._frame is not None:
+                self.frames_dropped += 1
+            self._frame = frame
+            self.frames_submitted += 1
+            self._cond.notify()
+
+    def submit_control(self, data):
+        """投递控制指令 (亮度/开关)，同样只保留最新的一条，在下一帧之前发送"""
+        with self._cond:
+            if self._control is not None:
+                self.controls_dropped += 1
+            self._control = bytes(data)
+            self._cond.notify()
+
+    def flush(self, timeout=1.0):
+        """等待邮箱中的内容发送完毕，返回是否在超时前完成"""
+        deadline = time.perf_counter() + timeout
+        with self._cond:
+            while self._frame is not None or self._control is not None or self._busy:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0 or not self.running:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def get_stats(self):
+        with self._cond:
+            return {
+                "frames_submitted": self.frames_submitted,
+                "frames_sent": self.frames_sent,
+                "frames_unchanged": self.frames_unchanged,
+                "frames_dropped": self.frames_dropped,
+                "controls_dropped": self.controls_dropped,
+                "send_errors": self.send_errors,
+                "send_ms": self.send_time * 1000,
+            }
+
+    def _run(self):
+        next_time = 0.0
+        while True:
+            with self._cond:
+                while self.running and self._frame is None and self._control is None:
+                    self._cond.wait()
+                if self._frame is None and self._control is None:
+                    break  # 已停止且没有待发送内容
+
+            # 按目标帧率等待下一个发送时刻，期间到达的新帧直接覆盖旧帧
+            delay = next_time - time.perf_counter()
+            if delay > 0 and self.running:
+                time.sleep(delay)
+
+            with self._cond:
+                frame, control = self._frame, self._control
+                self._frame = self._control = None
+                self._busy = True
+
+            send_start = time.perf_counter()
+            try:
+                sent = 0
+                if control is not None and frame is not None:
+                    # 亮度指令和显存写入合并成一批发送
+                    with self.vfd.batch() as tx:
+                        tx.send_data(control)
+                        sent = self.vfd.write_frame(frame, spi=tx)
+                elif control is not None:
+                    self.vfd.spi.send_data(control)
+                elif frame is not None:
+                    sent = self.vfd.write_frame(frame)
+                # 只有真正发出去的帧才计入帧数和发送耗时，与当前显示相同的帧另计
+                elapsed = time.perf_counter() - send_start
+                with self._cond:
+                    if frame is not None and sent:
+                        self.frames_sent += 1
+                        self.send_time += (elapsed - self.send_time) * 0.1
+                    elif frame is not None:
+                        self.frames_unchanged += 1
+            except Exception as e:
+                print(f"[Writer] 发送失败: {e}")
+                with self._cond:
+                    self.send_errors += 1
+            finally:
+                with self._cond:
+                    self._busy = False
+                    self._cond.notify_all()
+
+            if self.fps:
+                next_time = send_start + 1.0 / self.fps
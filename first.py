@@ -1,21 +1,18 @@
 import ctypes
-import os
 import sys
-import time
+
+from transport import CH341Transport
 
 # --- 配置部分 ---
 # DLL 文件名，请确保该文件在当前目录下
 DLL_PATH = r'CH341DLLA64.DLL'
 
 # --- 加载 DLL ---
+# 回环测试依赖 MISO 读回，只对真实 CH341 有意义，不走模拟器
 try:
-    # 加载当前目录下的 DLL
-    ch341_dll = ctypes.windll.LoadLibrary(os.path.abspath(DLL_PATH))
-except FileNotFoundError:
-    print(f"❌ 错误: 找不到 {DLL_PATH}。请确保 DLL 文件与脚本在同一目录下。")
-    sys.exit(1)
-except OSError as e:
-    print(f"❌ 错误: 无法加载 DLL。通常是因为 Python 位数(32/64)与 DLL 位数不匹配。")
+    ch341 = CH341Transport(DLL_PATH)
+except RuntimeError as e:
+    print(f"❌ 错误: 无法加载 {DLL_PATH}。请确保 DLL 文件与脚本在同一目录下，且 Python 位数(32/64)与 DLL 一致。")
     print(f"系统报错信息: {e}")
     sys.exit(1)
 
@@ -23,12 +20,9 @@ except OSError as e:
 def spi_loopback_test():
     print(f"--- CH341A SPI 回环测试 ---")
 
-    # 1. 打开设备 (设备索引 0)
+    # 1. 打开设备 (设备索引 0) 并配置为 SPI 模式 (0x80, 默认 MSB first)
     # CH341OpenDevice 返回句柄，如果失败通常返回 -1 或 0 (视版本而定)
-    dev_index = 0
-    handle = ch341_dll.CH341OpenDevice(dev_index)
-
-    if handle == -1 or handle == 0:
+    if not ch341.open():
         print("❌ 无法打开设备。请检查：")
         print("1. USB 是否插好？")
         print("2. 驱动是否已安装？")
@@ -38,14 +32,7 @@ def spi_loopback_test():
     try:
         print("✅ 设备已打开")
 
-        # 2. 配置 SPI 模式
-        # CH341SetStream(index, mode)
-        # mode=0x80: 设置为 SPI 模式 (默认 MSB first)
-        if not ch341_dll.CH341SetStream(dev_index, 0x80):
-            print("❌ 配置 SPI 模式失败")
-            return
-
-        # 3. 准备数据
+        # 2. 准备数据
         # 这里的 Buffer 是既作为发送，也作为接收 (In-place replace)
         message = b"Hello CH341A"
         buffer_len = len(message)
@@ -56,11 +43,11 @@ def spi_loopback_test():
         print(f"📤 发送数据: {message}")
         print(f"   (Hex: {message.hex()})")
 
-        # 4. 执行 SPI 传输 (4线模式)
-        # CH341StreamSPI4(index, chip_select, length, buffer)
+        # 3. 执行 SPI 传输 (4线模式)
+        # CH341StreamSPI4(index, chip_select=0x80, length, buffer)
         # chip_select: 0x80 通常表示片选 CS0 低电平有效，传输完拉高
         # io_buffer: 发送的数据会被接收到的数据覆盖
-        if ch341_dll.CH341StreamSPI4(dev_index, 0x80, buffer_len, io_buffer):
+        if ch341.stream(io_buffer, buffer_len):
 
             # 读取缓冲区中的新数据
             received_data = io_buffer.raw
@@ -68,7 +55,7 @@ def spi_loopback_test():
             print(f"📥 接收数据: {received_data}")
             print(f"   (Hex: {received_data.hex()})")
 
-            # 5. 验证
+            # 4. 验证
             if received_data == message:
                 print("\n✅ 测试通过！MISO 与 MOSI 连接正常。")
             else:
@@ -82,8 +69,8 @@ def spi_loopback_test():
             print("❌ SPI 传输函数调用失败")
 
     finally:
-        # 6. 关闭设备
-        ch341_dll.CH341CloseDevice(dev_index)
+        # 5. 关闭设备
+        ch341.close()
         print("--- 设备已关闭 ---")
 
 
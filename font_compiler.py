@@ -0,0 +1,270 @@
+"""
+字库编译器与字形包
+把 {字符: 24 位字形} 的定义编译成按码点直接索引的稠密表 (每个码点 3 字节)，
+整串文字用 numpy 一次查表得到全部 Grid 字节；频谱等级按 "样式" 各自一张表 (由段位顺序累加生成)。
+字库大小不影响查表开销：只是一次数组索引。
+稠密部分只覆盖 DENSE_LIMIT 以下的码点；更高的码点 (私用区图标、CJK 等) 排序后接在稠密表后面，
+查表时用 searchsorted 换算成行号，表的大小只随字形个数增长，与码点数值无关。
+
+字形包 (.json) 格式：
+    {
+        "format": "vfd-glyph-pack",
+        "version": 1,
+        "name": "icons",
+        "glyphs": {"A": "8f8f09", "U+E000": "ffffff"},     字符或 U+XXXX 码点 -> 6 位十六进制字形
+        "segments": {"bars": ["000800", "001000", ...]},   频谱样式：逐格点亮的段位，累加成 0..N 级
+        "levels": {"dots": ["000000", "000800", ...]}      频谱样式：直接给出每一级的字形
+    }
+加载时逐项校验，出错抛出 ValueError 并指出是哪一项。
+"""
+# numpy 在第一次编译字库时才导入；只读写、校验字形包时用不到
+np = None
+
+
+def _load_numpy():
+    global np
+    if np is None:
+        import numpy
+        np = numpy
+
+
+PACK_FORMAT = "vfd-glyph-pack"
+PACK_VERSION = 1
+GLYPH_MAX = 0xFFFFFF
+MAX_CODEPOINT = 0x10FFFF
+DEFAULT_STYLE = "bars"
+# 码点低于此值的字形按码点直接索引 (U+0000-U+07FF，最多 6 KB)
+DENSE_LIMIT = 0x800
+
+
+def glyph_to_bytes(code):
+    return int(code).to_bytes(3, 'big')
+
+
+def bar_levels(segments):
+    """逐格点亮：第 i 级 = 前 i 个段位的并集，0 级全灭"""
+    levels = [0]
+    current = 0
+    for code in segments:
+        current |= code
+        levels.append(current)
+    return levels
+
+
+class CompiledFont:
+    def __init__(self, glyphs=None, styles=None, fold_case=True):
+        """
+        :param glyphs: {单个字符: 24 位字形}
+        :param styles: {样式名: [第 0 级字形, 第 1 级字形, ...]}
+        :param fold_case: 小写字母没有单独定义时使用大写字形
+        """
+        _load_numpy()
+        self.fold_case = fold_case
+        self._glyphs = {}
+        self._styles = {}
+        self.table = np.zeros((1, 3), dtype=np.uint8)
+        self.update(glyphs or {}, styles or {})
+
+    def update(self, glyphs=None, styles=None):
+        """加入/覆盖字形后重新编译"""
+        for char, code in (glyphs or {}).items():
+            self._glyphs[char] = int(code)
+        for name, levels in (styles or {}).items():
+            self._styles[name] = [int(code) for code in levels]
+        self._compile()
+
+    def add_pack(self, pack):
+        """pack: load_glyph_pack 的返回值"""
+        self.update(pack["glyphs"], pack["styles"])
+
+    def _compile(self):
+        glyphs = dict(self._glyphs)
+        if self.fold_case:
+            for char, code in self._glyphs.items():
+                lower = char.lower()
+                if lower != char and len(lower) == 1:
+                    glyphs.setdefault(lower, code)
+
+        dense = [ord(c) for c in glyphs if ord(c) < DENSE_LIMIT]
+        sparse = sorted(ord(c) for c in glyphs if ord(c) >= DENSE_LIMIT)
+        size = max(dense, default=-1) + 1
+        # 行布局：[0, size) 按码点索引，之后每个稀疏码点一行，最后多留一行全黑，未定义的码点都指向它
+        table = np.zeros((size + len(sparse) + 1, 3), dtype=np.uint8)
+        rows = {cp: size + i for i, cp in enumerate(sparse)}
+        for char, code in glyphs.items():
+            table[rows.get(ord(char), ord(char))] = (code >> 16 & 0xFF, code >> 8 & 0xFF, code & 0xFF)
+        self.table = table
+        self.dense_size = size
+        self.sparse = np.array(sparse, dtype=np.uint32)
+        self.blank_index = size + len(sparse)
+        self.levels = {name: np.array([[c >> 16 & 0xFF, c >> 8 & 0xFF, c & 0xFF] for c in codes], dtype=np.uint8)
+                       for name, codes in self._styles.items()}
+        # 单个查询用的 bytes 字典 (字符和等级分开存放)
+        self.char_bytes = {char: glyph_to_bytes(code) for char, code in glyphs.items()}
+        self.level_bytes = {name: [glyph_to_bytes(c) for c in codes] for name, codes in self._styles.items()}
+
+    def codes(self, text):
+        """字符串 -> 表索引数组 (未定义的字符指向全黑行)"""
+        idx = np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32)
+        out = np.where(idx < self.dense_size, idx, self.blank_index)
+        if len(self.sparse):
+            high = np.flatnonzero(idx >= self.dense_size)
+            if len(high):
+                cps = idx[high]
+                pos = np.minimum(np.searchsorted(self.sparse, cps), len(self.sparse) - 1)
+                out[high] = np.where(self.sparse[pos] == cps, self.dense_size + pos, self.blank_index)
+        return out
+
+    def encode(self, text):
+        """整串文字一次查表，返回 len(text) * 3 字节"""
+        return self.table[self.codes(text)].tobytes()
+
+    def encode_levels(self, levels, style=DEFAULT_STYLE):
+        table = self.levels[style]
+        idx = np.clip(np.asarray(levels, dtype=np.intp), 0, len(table) - 1)
+        return table[idx].tobytes()
+
+    def render(self, text, grid_order, base):
+        """
+        把文字按 grid_order 写进一帧显存 (base 为整帧模板，不会被修改)
+        第 i 个字符写到 grid_order[i]，字符不足的位置写全黑
+        """
+        frame = np.frombuffer(bytes(base), dtype=np.uint8).reshape(-1, 3).copy()
+        text = text[:len(grid_order)].ljust(len(grid_order))
+        frame[list(grid_order)] = self.table[self.codes(text)]
+        return frame.tobytes()
+
+    def glyph(self, char):
+        return self.char_bytes.get(char)
+
+    def style_names(self):
+        return list(self._styles)
+
+    def to_pack(self, name="font"):
+        """导出成字形包 (dict)，可直接 save_glyph_pack"""
+        return {
+            "format": PACK_FORMAT,
+            "version": PACK_VERSION,
+            "name": name,
+            "glyphs": {_key_name(c): f"{code:06x}" for c, code in sorted(self._glyphs.items())},
+            "levels": {n: [f"{c:06x}" for c in codes] for n, codes in self._styles.items()},
+        }
+
+
+def _key_name(char):
+    return char if char.isprintable() and not char.isspace() or char == ' ' else f"U+{ord(char):04X}"
+
+
+def _parse_key(key, where):
+    if isinstance(key, str) and len(key) == 1:
+        return key
+    if isinstance(key, str) and key[:2] in ("U+", "u+"):
+        try:
+            cp = int(key[2:], 16)
+        except ValueError:
+            cp = -1
+        if 0 <= cp <= MAX_CODEPOINT:
+            return chr(cp)
+    raise ValueError(f"{where}: 无效的字符键 {key!r} (应为单个字符或 U+XXXX)")
+
+
+def _parse_glyph(value, where):
+    if isinstance(value, str) and 1 <= len(value) <= 6:
+        try:
+            value = int(value, 16)
+        except ValueError:
+            pass
+    if isinstance(value, int) and not isinstance(value, bool) and 0 <= value <= GLYPH_MAX:
+        return value
+    raise ValueError(f"{where}: 无效的字形 {value!r} (应为 6 位十六进制)")
+
+
+def parse_glyph_pack(data, source="<pack>"):
+    """校验字形包内容，返回 {"name", "glyphs": {char: int}, "styles": {name: [int]}}"""
+    if not isinstance(data, dict) or data.get("format") != PACK_FORMAT:
+        raise ValueError(f"{source}: 不是字形包 (format 应为 {PACK_FORMAT!r})")
+    version = data.get("version")
+    if version != PACK_VERSION:
+        raise ValueError(f"{source}: 不支持的字形包版本 {version!r} (当前支持 {PACK_VERSION})")
+    unknown = set(data) - {"format", "version", "name", "glyphs", "segments", "levels"}
+    if unknown:
+        raise ValueError(f"{source}: 未知字段 {sorted(unknown)}")
+
+    glyphs = {}
+    for key, value in (data.get("glyphs") or {}).items():
+        where = f"{source} glyphs[{key!r}]"
+        glyphs[_parse_key(key, where)] = _parse_glyph(value, where)
+
+    styles = {}
+    for name, segments in (data.get("segments") or {}).items():
+        where = f"{source} segments[{name!r}]"
+        if not isinstance(segments, list) or not segments:
+            raise ValueError(f"{where}: 应为非空列表")
+        codes = [_parse_glyph(v, f"{where}[{i}]") for i, v in enumerate(segments)]
+        used = 0
+        for i, code in enumerate(codes):
+            if code == 0 or code & used:
+                raise ValueError(f"{where}[{i}]: 段位为空或与前面的段位重叠")
+            used |= code
+        styles[name] = bar_levels(codes)
+    for name, levels in (data.get("levels") or {}).items():
+        where = f"{source} levels[{name!r}]"
+        if name in styles:
+            raise ValueError(f"{where}: 与 segments 中的样式重名")
+        if not isinstance(levels, list) or not levels:
+            raise ValueError(f"{where}: 应为非空列表")
+        styles[name] = [_parse_glyph(v, f"{where}[{i}]") for i, v in enumerate(levels)]
+
+    return {"name": data.get("name", ""), "glyphs": glyphs, "styles": styles}
+
+
+def load_glyph_pack(path):
+    import json
+
+    with open(path, encoding="utf-8") as f:
+        try:
+            data = json.load(f)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"{path}: JSON 格式错误: {e}")
+    return parse_glyph_pack(data, path)
+
+
+def save_glyph_pack(path, pack):
+    import json
+
+    parse_glyph_pack(pack, path)  # 写出前同样校验
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(pack, f, ensure_ascii=False, indent=2)
+
+
+# ==========================================
+# 👇 命令行：校验字形包 / 导出内置字库 👇
+#   python font_compiler.py check glyph_packs/bar_styles.json
+#   python font_compiler.py export builtin.json
+# ==========================================
+if __name__ == "__main__":
+    import sys
+    import time
+
+    if len(sys.argv) == 3 and sys.argv[1] == "check":
+        pack = load_glyph_pack(sys.argv[2])
+        print(f"{sys.argv[2]}: 名称 {pack['name']!r}, 字形 {len(pack['glyphs'])} 个, "
+              f"频谱样式 {', '.join(f'{n}({len(v) - 1} 级)' for n, v in pack['styles'].items()) or '无'}")
+    elif len(sys.argv) == 3 and sys.argv[1] == "export":
+        from vfd_driver import FONT
+        save_glyph_pack(sys.argv[2], FONT.to_pack("builtin"))
+        print(f"已导出到 {sys.argv[2]}")
+    else:
+        from vfd_driver import FONT, glyph_bytes
+        text = "HOSTNAME DESKTOP-VFD01 CPU 45C GPU 60C " * 4
+        n = 20000
+        t0 = time.perf_counter()
+        for _ in range(n):
+            b''.join(glyph_bytes(c) for c in text)
+        t_join = (time.perf_counter() - t0) / n
+        t0 = time.perf_counter()
+        for _ in range(n):
+            FONT.encode(text)
+        t_vec = (time.perf_counter() - t0) / n
+        assert FONT.encode(text) == b''.join(glyph_bytes(c) for c in text)
+        print(f"{len(text)} 字符: 逐字 join {t_join * 1e6:.1f} us, 向量化 {t_vec * 1e6:.1f} us")
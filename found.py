@@ -1,28 +1,23 @@
-import ctypes
-import os
 import sys
 
+from spi_comm import SPIAdapter
+from transport import DEFAULT_DLL_PATH
+
 # ================= 配置区 =================
 # 根据你的测试结果已锁定：
 GRID_SPECIAL = 6  # 物理第1屏 (特殊符号)
 GRID_DIGIT = 0  # 物理第2屏 (标准数字)
 # ==========================================
 
-DLL_PATH = r'C:\Users\xz\Desktop\资料\CH341PAR\CH341PAR\CH341DLLA64.DLL'
+# 传输后端由环境变量 VFD_TRANSPORT 选择 (ch341 / emulator)
 try:
-    ch341 = ctypes.windll.LoadLibrary(os.path.abspath(DLL_PATH))
-except:
+    spi = SPIAdapter(DEFAULT_DLL_PATH)
+except RuntimeError:
     sys.exit("找不到 DLL")
 
 
-def reverse_byte(b):
-    return int('{:08b}'.format(b)[::-1], 2)
-
-
 def send_spi(dev_index, data_list):
-    reversed_data = [reverse_byte(b) for b in data_list]
-    io_buffer = ctypes.create_string_buffer(bytes(reversed_data), len(reversed_data))
-    ch341.CH341StreamSPI4(dev_index, 0x80, len(reversed_data), io_buffer)
+    spi.send_data(data_list)
 
 
 def scan_target(dev_index, grid_id, name):
@@ -62,11 +57,10 @@ def scan_target(dev_index, grid_id, name):
 
 def main():
     dev_index = 0
-    if ch341.CH341OpenDevice(dev_index) <= 0:
+    if not spi.open():
         print("无法打开设备")
         return
 
-    ch341.CH341SetStream(dev_index, 0x80)
     send_spi(dev_index, [0x06])  # Mode 10
     send_spi(dev_index, [0x40])  # Write Data
     send_spi(dev_index, [0x8F])  # Display ON
@@ -94,7 +88,7 @@ def main():
         send_spi(dev_index, [0xC0] + [0x00] * 30)  # 清屏
 
     finally:
-        ch341.CH341CloseDevice(dev_index)
+        spi.close()
 
 
 if __name__ == "__main__":
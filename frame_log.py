@@ -0,0 +1,239 @@
+"""
+帧录制与回放
+在 SPIAdapter.send_data / send_batch 处把发出的每条 PT6315 指令追加写入一个紧凑的二进制日志，
+回放时用 mmap 映射文件，按原速 / 最快速度 / 单步推送给任意传输后端 (CH341 或模拟器)。
+
+文件格式 (小端)：
+    文件头  4s  魔数 b'VFDL'
+            B   版本号
+            3x  保留
+            d   录制开始的 Unix 时间
+    记录    I   距上一条记录的微秒数
+            H   指令长度，最高位为 1 表示与上一条属于同一批 (同一次 send_batch)
+            ... 指令字节 (PT6315 逻辑字节，LSB 翻转之前)
+只追加写入；录制中断时末尾不完整的记录在读取时被忽略。
+"""
+import mmap
+import struct
+import time
+
+MAGIC = b'VFDL'
+VERSION = 1
+HEADER = struct.Struct('<4sB3xd')
+RECORD = struct.Struct('<IH')
+FLAG_CONTINUE = 0x8000
+MAX_COMMAND = 0x7FFF
+MAX_DELTA_US = 0xFFFFFFFF
+
+
+class FrameRecorder:
+    def __init__(self, path, clock=time.perf_counter):
+        """
+        :param clock: 记录时间戳用的时钟 (秒)；离线渲染时传入虚拟时钟，录出的文件按虚拟时间回放
+        """
+        self.path = path
+        self.clock = clock
+        self.file = open(path, 'wb')
+        self.file.write(HEADER.pack(MAGIC, VERSION, time.time()))
+        self._last = clock()
+        self.records = 0
+        self.groups = 0
+
+    def record(self, commands):
+        """记录一批指令 (send_data 为一条)，调用方负责串行化 (SPIAdapter 在锁内调用)"""
+        now = self.clock()
+        delta = min(int((now - self._last) * 1e6), MAX_DELTA_US)
+        self._last = now
+        write = self.file.write
+        flag = 0
+        for command in commands:
+            if len(command) > MAX_COMMAND:
+                raise ValueError(f"指令过长: {len(command)} 字节")
+            write(RECORD.pack(delta, len(command) | flag))
+            write(command)
+            delta, flag = 0, FLAG_CONTINUE
+            self.records += 1
+        self.groups += 1
+
+    def close(self):
+        if self.file:
+            self.file.close()
+            self.file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class FrameLog:
+    """只读打开录制文件：mmap 映射，一次扫描建立每批指令的偏移索引，之后按批直接从映射中切出指令"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._map) < HEADER.size:
+            raise ValueError(f"不是有效的帧录制文件: {path}")
+        magic, version, self.start_time = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise ValueError(f"不是有效的帧录制文件: {path}")
+        if version != VERSION:
+            raise ValueError(f"不支持的录制文件版本: {version}")
+        self._index()
+
+    def _index(self):
+        """groups: [(相对开始的秒数, [(偏移, 长度), ...])]"""
+        data, size = self._map, len(self._map)
+        pos, t_us = HEADER.size, 0
+        groups = []
+        records = 0
+        while pos + RECORD.size <= size:
+            delta, length = RECORD.unpack_from(data, pos)
+            flag, length = length & FLAG_CONTINUE, length & MAX_COMMAND
+            start = pos + RECORD.size
+            if start + length > size:
+                break  # 录制中断留下的半条记录
+            t_us += delta
+            if flag and groups:
+                groups[-1][1].append((start, length))
+            else:
+                groups.append((t_us / 1e6, [(start, length)]))
+            pos = start + length
+            records += 1
+        self.groups = groups
+        self.records = records
+
+    def __len__(self):
+        return len(self.groups)
+
+    @property
+    def duration(self):
+        return self.groups[-1][0] if self.groups else 0.0
+
+    def group(self, i):
+        """第 i 批：(时间, [指令 bytes])"""
+        t, spans = self.groups[i]
+        data = self._map
+        return t, [data[off:off + n] for off, n in spans]
+
+    def __iter__(self):
+        for i in range(len(self.groups)):
+            yield self.group(i)
+
+    def get_stats(self):
+        return {
+            "groups": len(self.groups),
+            "records": self.records,
+            "bytes": len(self._map),
+            "duration": self.duration,
+        }
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class FramePlayer:
+    """
+    把录制的指令推给 SPIAdapter (它决定最终的传输后端)
+    单条的批用 send_data，多条的批用 send_batch，保持录制时的批量结构
+    """
+
+    def __init__(self, log, spi):
+        self.log = log
+        self.spi = spi
+        self.position = 0
+
+    def step(self):
+        """发送下一批，返回是否还有剩余"""
+        if self.position >= len(self.log):
+            return False
+        _, commands = self.log.group(self.position)
+        if len(commands) == 1:
+            self.spi.send_data(commands[0])
+        else:
+            self.spi.send_batch(commands)
+        self.position += 1
+        return self.position < len(self.log)
+
+    def play(self, speed=1.0, stop_event=None):
+        """
+        :param speed: 1.0 原速，2.0 两倍速...；None / 0 为不等待的最快速度
+        返回实际发送的批数
+        """
+        start_pos = self.position
+        t0 = time.perf_counter()
+        base = self.log.groups[self.position][0] if self.position < len(self.log) else 0.0
+        while self.position < len(self.log):
+            if stop_event is not None and stop_event.is_set():
+                break
+            if speed:
+                due = t0 + (self.log.groups[self.position][0] - base) / speed
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            self.step()
+        return self.position - start_pos
+
+
+# ==========================================
+# 👇 命令行：查看 / 回放录制文件 👇
+#   录制：设置环境变量 VFD_RECORD=文件名 后照常运行任意脚本
+#   python frame_log.py info rec.vfdl
+#   python frame_log.py replay rec.vfdl [--speed 2 | --max | --step] [--transport emulator]
+# ==========================================
+if __name__ == "__main__":
+    import argparse
+    import os
+
+    from spi_comm import SPIAdapter
+    from transport import create_transport
+
+    parser = argparse.ArgumentParser(description="VFD 帧录制文件工具")
+    parser.add_argument("command", choices=("info", "replay"))
+    parser.add_argument("path")
+    parser.add_argument("--speed", type=float, default=1.0, help="回放倍速")
+    parser.add_argument("--max", action="store_true", help="不等待，最快速度回放")
+    parser.add_argument("--step", action="store_true", help="每按一次回车发送一批")
+    parser.add_argument("--transport", default=None, help="ch341 / emulator，默认按 VFD_TRANSPORT")
+    args = parser.parse_args()
+
+    with FrameLog(args.path) as log:
+        stats = log.get_stats()
+        print(f"{args.path}: {stats['groups']} 批 / {stats['records']} 条指令, "
+              f"{stats['bytes']} 字节, 时长 {stats['duration']:.2f}s, "
+              f"录制于 {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(log.start_time))}")
+        if args.command == "replay":
+            # 回放本身不再录制，避免覆盖正在读取的文件
+            os.environ.pop("VFD_RECORD", None)
+            transport = create_transport(args.transport)
+            spi = SPIAdapter(transport=transport)
+            if not spi.open():
+                raise SystemExit("无法打开传输后端")
+            player = FramePlayer(log, spi)
+            t0 = time.perf_counter()
+            try:
+                if args.step:
+                    while player.position < len(log):
+                        t, commands = log.group(player.position)
+                        input(f"[{player.position + 1}/{len(log)}] {t:.3f}s "
+                              f"{' '.join(c.hex() for c in commands)}  回车发送...")
+                        player.step()
+                else:
+                    sent = player.play(None if args.max else args.speed)
+                    elapsed = time.perf_counter() - t0
+                    print(f"回放 {sent} 批, 用时 {elapsed:.3f}s ({sent / max(elapsed, 1e-9):.0f} 批/秒)")
+            except KeyboardInterrupt:
+                pass
+            stats = getattr(transport, "get_stats", None)
+            if stats:
+                print(stats())
+            spi.close()
@@ -0,0 +1,158 @@
+"""
+自适应帧节拍
+显示线程每帧: begin() -> 取样 -> mark("sample") -> 编码/投递 -> mark("encode") -> wait()
+wait() 按绝对截止时刻睡眠 (截止时刻每帧推进一个帧间隔)，本帧用掉多少时间就少睡多少，不会累积漂移；
+落后超过一帧时不追帧，直接从当前时刻重新计时。
+
+传输饱和时自动降帧：写入线程 (DisplayWriter.send_time) 或本线程单帧的工作时间
+乘以 headroom 超过帧间隔时，帧间隔放大到刚好容纳它 (不低于 min_fps)；
+负载降下来后每帧缩短 RECOVER_STEP，逐步回到目标帧率。
+get_stats() 给出实际帧率、帧间隔抖动和各阶段耗时，用于按机器调参。
+"""
+import collections
+import math
+import threading
+import time
+
+# 负载低于帧间隔的这个比例时才开始恢复帧率，避免在临界点来回振荡
+RECOVER_BELOW = 0.6
+# 恢复时每帧把帧间隔缩短的比例
+RECOVER_STEP = 0.02
+
+
+class FramePacer:
+    def __init__(self, fps=60, min_fps=15, headroom=1.25, writer=None, window=120):
+        """
+        :param fps: 目标帧率
+        :param min_fps: 传输饱和时最多降到的帧率
+        :param headroom: 负载需要留出的余量倍数
+        :param writer: DisplayWriter，读取它的发送耗时作为 transmit 阶段
+        :param window: 统计实际帧率和抖动的帧数
+        """
+        self.target_interval = 1.0 / fps
+        self.max_interval = 1.0 / min_fps
+        self.headroom = headroom
+        self.writer = writer
+        self.interval = self.target_interval
+
+        self._intervals = collections.deque(maxlen=window)
+        self._stages = {}
+        self._lock = threading.Lock()
+        self.next_time = None
+        self.frame_start = None
+        self.last_start = None
+        self._mark = None
+
+        # 统计
+        self.frames = 0
+        self.late_frames = 0
+        self.backoffs = 0
+
+    def begin(self):
+        """一帧开始"""
+        now = time.perf_counter()
+        if self.last_start is not None:
+            self._intervals.append(now - self.last_start)
+        self.last_start = self.frame_start = self._mark = now
+        if self.next_time is None:
+            self.next_time = now
+
+    def mark(self, stage):
+        """记录从上一个 mark (或 begin) 到现在的耗时，计入 stage"""
+        now = time.perf_counter()
+        self.record(stage, now - self._mark)
+        self._mark = now
+
+    def record(self, stage, seconds):
+        """其它线程 (如分析线程) 也可以直接记录阶段耗时，滑动平均"""
+        with self._lock:
+            avg = self._stages.get(stage)
+            self._stages[stage] = seconds if avg is None else avg + (seconds - avg) * 0.1
+
+    def wait(self, stop_event=None):
+        """
+        根据本帧耗时和传输负载调整帧间隔，睡到下一个截止时刻
+        传入 stop_event 时用它等待，返回 stop_event 是否已被设置
+        """
+        now = time.perf_counter()
+        work = now - self.frame_start
+        load = work
+        if self.writer is not None:
+            transmit = self.writer.send_time
+            self.record("transmit", transmit)
+            load = max(load, transmit)
+        self._adapt(load * self.headroom)
+        self.frames += 1
+
+        self.next_time += self.interval
+        delay = self.next_time - now
+        if delay <= 0:
+            self.late_frames += 1
+            self.next_time = now  # 落后时不追帧
+            return stop_event.is_set() if stop_event else False
+        if stop_event:
+            return stop_event.wait(delay)
+        time.sleep(delay)
+        return False
+
+    def _adapt(self, needed):
+        if needed > self.interval:
+            if self.interval < self.max_interval:
+                self.backoffs += 1
+            self.interval = min(self.max_interval, needed)
+        elif self.interval > self.target_interval and needed < self.interval * RECOVER_BELOW:
+            self.interval = max(self.target_interval, self.interval * (1 - RECOVER_STEP))
+
+    def reset(self):
+        self.interval = self.target_interval
+        self.next_time = self.last_start = None
+        self._intervals.clear()
+
+    def get_stats(self):
+        intervals = list(self._intervals)
+        if intervals:
+            mean = sum(intervals) / len(intervals)
+            jitter = math.sqrt(sum((x - mean) ** 2 for x in intervals) / len(intervals))
+            worst = max(abs(x - mean) for x in intervals)
+        else:
+            mean = jitter = worst = 0.0
+        with self._lock:
+            stages = {name: avg * 1000 for name, avg in self._stages.items()}
+        return {
+            "fps": 1.0 / mean if mean else 0.0,
+            "target_fps": 1.0 / self.target_interval,
+            "paced_fps": 1.0 / self.interval,
+            "jitter_ms": jitter * 1000,
+            "max_jitter_ms": worst * 1000,
+            "stages_ms": stages,
+            "frames": self.frames,
+            "late_frames": self.late_frames,
+            "backoffs": self.backoffs,
+        }
+
+    def summary(self):
+        s = self.get_stats()
+        return (f"{s['fps']:.1f}/{s['paced_fps']:.0f} fps  抖动 {s['jitter_ms']:.2f} ms  "
+                f"发送 {s['stages_ms'].get('transmit', 0.0):.2f} ms")
+
+
+# ==========================================
+# 👇 测试代码：模拟传输变慢再恢复 👇
+# ==========================================
+if __name__ == "__main__":
+    class SlowWriter:
+        """假 DisplayWriter：只提供 send_time"""
+        send_time = 0.002
+
+    writer = SlowWriter()
+    pacer = FramePacer(fps=60, min_fps=15, writer=writer, window=30)
+    for phase, send_time, seconds in (("正常", 0.002, 1.0), ("传输饱和", 0.030, 1.0), ("恢复", 0.002, 2.0)):
+        writer.send_time = send_time
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            pacer.begin()
+            time.sleep(0.001)
+            pacer.mark("encode")
+            pacer.wait()
+        print(f"{phase:<6} 发送 {send_time * 1000:4.0f} ms -> {pacer.summary()}")
+    print(pacer.get_stats())
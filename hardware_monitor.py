@@ -1,13 +1,24 @@
-import psutil
-import wmi
-import pynvml
+import os
+import sys
 import time
 import ctypes
+import threading
+
+from lazy_import import optional_import
+
+# 各传感器的刷新间隔 (秒)：比它们实际变化的速度更频繁地查询没有意义
+SENSOR_INTERVALS = {
+    "cpu_temp": 5.0,  # WMI 温度查询很慢，ACPI 温度本身也变化缓慢
+    "gpu": 1.0,  # NVML 温度 + 占用率
+    "memory": 2.0,
+    "cpu": 1.0,  # cpu_percent 统计的是两次调用之间的平均值
+}
 
 
 class HardwareMonitor:
-    def __init__(self):
+    def __init__(self, intervals=None):
         self.nvml_inited = False
+        self.gpu_handle = None
         self.wmi_obj = None
         # 阻止系统在程序隐藏时进入低功耗状态 (ES_CONTINUOUS | ES_SYSTEM_REQUIRED)
         try:
@@ -18,8 +29,29 @@ class HardwareMonitor:
         self._init_nvml()
         self._init_wmi()
 
+        # 按传感器分别缓存，读取时直接返回缓存
+        self.intervals = dict(SENSOR_INTERVALS, **(intervals or {}))
+        self._sources = {
+            "cpu_temp": self._sample_cpu_temp,
+            "gpu": self._sample_gpu,
+            "memory": self._sample_memory,
+            "cpu": self._sample_cpu,
+        }
+        self._next_due = {name: 0.0 for name in self._sources}
+        self._metrics = {"CT": 0, "GT": 0, "M": 0, "G": 0, "C": 0}
+        self._refresh_lock = threading.Lock()
+
+        # 后台采样线程 (见 start_sampler)
+        self._sampler = None
+        self._stop_event = threading.Event()
+
     def _init_nvml(self):
         """强制重新初始化 NVML"""
+        self.gpu_handle = None
+        pynvml = optional_import("pynvml", "GPU 温度/占用率")
+        if pynvml is None:
+            self.nvml_inited = False
+            return
         try:
             pynvml.nvmlShutdown()  # 先尝试彻底关闭旧连接
         except:
@@ -27,10 +59,16 @@ class HardwareMonitor:
         try:
             pynvml.nvmlInit()
             self.nvml_inited = True
+            # 句柄只在初始化时获取一次，失效时随 NVML 一起重建
+            self.gpu_handle = pynvml.nvmlDeviceGetHandleByIndex(0)
         except Exception as e:
             self.nvml_inited = False
 
     def _init_wmi(self):
+        wmi = optional_import("wmi", "CPU 温度")
+        if wmi is None:
+            self.wmi_obj = None
+            return
         try:
             # 重新建立 WMI 连接
             self.wmi_obj = wmi.WMI(namespace="root/wmi")
@@ -40,6 +78,7 @@ class HardwareMonitor:
     def get_cpu_temp(self):
         if not self.wmi_obj:
             self._init_wmi()
+            if not self.wmi_obj: return 0
         try:
             temps = self.wmi_obj.MSAcpi_ThermalZoneTemperature()
             for t in temps:
@@ -49,35 +88,111 @@ class HardwareMonitor:
             self.wmi_obj = None  # 隐藏状态下如果读取失败，重置 WMI
         return 0
 
-    def get_gpu_data(self):
+    def get_gpu_data(self, retry=True):
         """专门针对后台运行优化的 GPU 读取"""
-        if not self.nvml_inited:
+        if not self.nvml_inited or self.gpu_handle is None:
             self._init_nvml()
             if not self.nvml_inited: return 0, 0
 
+        pynvml = optional_import("pynvml")
         try:
-            # 每次读取都重新获取句柄，防止隐藏窗口导致的句柄失效
-            handle = pynvml.nvmlDeviceGetHandleByIndex(0)
-            temp = pynvml.nvmlDeviceGetTemperature(handle, 0)
-            util = pynvml.nvmlDeviceGetUtilizationRates(handle).gpu
+            temp = pynvml.nvmlDeviceGetTemperature(self.gpu_handle, 0)
+            util = pynvml.nvmlDeviceGetUtilizationRates(self.gpu_handle).gpu
 
             # 如果在后台读到了 0，通常是驱动进入了持久化模式丢失
-            if temp == 0:
+            if temp == 0 and retry:
                 self._init_nvml()
-                return self.get_gpu_data()  # 递归尝试一次新连接
+                return self.get_gpu_data(retry=False)  # 用新连接重试一次
 
             return int(temp), int(util)
         except Exception:
-            self.nvml_inited = False  # 标记失效
+            self.nvml_inited = False  # 标记失效，下次重建连接和句柄
             return 0, 0
 
+    # ---------- 各传感器的采样函数 ----------
+    def _sample_cpu_temp(self):
+        self._metrics["CT"] = self.get_cpu_temp()
+
+    def _sample_gpu(self):
+        self._metrics["GT"], self._metrics["G"] = self.get_gpu_data()
+
+    def _sample_memory(self):
+        psutil = optional_import("psutil", "内存/CPU 占用率")
+        self._metrics["M"] = int(psutil.virtual_memory().percent) if psutil else 0
+
+    def _sample_cpu(self):
+        psutil = optional_import("psutil", "内存/CPU 占用率")
+        self._metrics["C"] = int(psutil.cpu_percent(interval=None)) if psutil else 0
+
+    def refresh(self, now=None):
+        """刷新所有已到期的传感器，返回最近的下一次到期时间"""
+        now = time.monotonic() if now is None else now
+        with self._refresh_lock:
+            for name, sample in self._sources.items():
+                if now >= self._next_due[name]:
+                    sample()
+                    self._next_due[name] = now + self.intervals[name]
+            return min(self._next_due.values())
+
+    def start_sampler(self):
+        """启动后台采样线程，之后 get_all_metrics 只读缓存"""
+        if self._sampler and self._sampler.is_alive():
+            return
+        self._stop_event.clear()
+        self._sampler = threading.Thread(target=self._sampler_loop, daemon=True)
+        self._sampler.start()
+
+    def stop_sampler(self):
+        self._stop_event.set()
+        if self._sampler:
+            self._sampler.join(timeout=1.0)
+            self._sampler = None
+
+    def _sampler_loop(self):
+        # WMI 是 COM 对象，不能跨线程使用：在采样线程里初始化 COM 并重建连接
+        try:
+            import pythoncom
+            pythoncom.CoInitialize()
+        except Exception:
+            pythoncom = None
+        self.wmi_obj = None
+
+        try:
+            while not self._stop_event.is_set():
+                next_due = self.refresh()
+                self._stop_event.wait(max(0.0, next_due - time.monotonic()))
+        finally:
+            if pythoncom:
+                pythoncom.CoUninitialize()
+
+    def close(self):
+        """停止采样并释放 NVML / WMI"""
+        self.stop_sampler()
+        if self.nvml_inited:
+            try:
+                optional_import("pynvml").nvmlShutdown()
+            except:
+                pass
+        self.nvml_inited = False
+        self.gpu_handle = None
+        self.wmi_obj = None
+
     def get_all_metrics(self):
-        # 强制系统给当前线程提速
-        gpu_temp, gpu_load = self.get_gpu_data()
-        return {
-            "CT": self.get_cpu_temp(),
-            "GT": gpu_temp,
-            "M": int(psutil.virtual_memory().percent),
-            "G": gpu_load,
-            "C": int(psutil.cpu_percent(interval=None))
-        }
\ No newline at end of file
+        # 后台线程未启动时按需刷新到期的传感器；未到期的直接用缓存
+        if not (self._sampler and self._sampler.is_alive()):
+            self.refresh()
+        return dict(self._metrics)
+
+
+def create_monitor(intervals=None):
+    """
+    按平台选择后端：Linux 上读 procfs / sysfs (procfs_monitor.ProcfsHardwareMonitor)，
+    其它平台 (或 /proc 不可用时) 使用 WMI / psutil 的 HardwareMonitor
+    """
+    if sys.platform.startswith("linux") and os.path.exists("/proc/stat"):
+        from procfs_monitor import ProcfsHardwareMonitor
+        try:
+            return ProcfsHardwareMonitor(intervals)
+        except OSError as e:
+            print(f"[Hardware] procfs 后端不可用，改用 psutil: {e}")
+    return HardwareMonitor(intervals)
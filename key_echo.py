@@ -0,0 +1,327 @@
+"""
+按键回显流水线
+键盘钩子线程只把 (字符, 时间戳) 放进队列就返回；渲染线程一次取空队列，把一串连续按键合并成一帧，
+文本区直接以编码好的字形字节保存在一个环形帧缓冲里，新字符进来只是整体移动 3 字节，不再逐字重新编码。
+
+延迟上限 (按键 -> 屏幕)，只由配置决定：
+    on_burst 回调耗时 + 渲染 (几十微秒，按 1ms 计) + 写入线程的帧间隔 1/fps
+    + 最坏情况下一次显存传输 (文本区和光标 Grid 地址连续，每帧一次 USB 传输) + 线程调度/睡眠的余量 3ms
+渲染线程处理一批按键期间 (包括 on_burst 回调) 到达的新按键会在下一批里合并，不会排队；
+DisplayWriter 是单槽位邮箱，新帧覆盖旧帧，所以积压不会随打字速度增长。
+本文件末尾的模拟器测量分两种负载：正常打字 (按键间隔几毫秒，渲染总能跟上，每批 1 个) 和
+粘贴/连发 + 慢回调 (按键在回调期间堆积，按批合并)，两种情况都断言不超过上式按测试配置算出的常数。
+"""
+import queue
+import threading
+import time
+
+from vfd_driver import BLANK_GLYPH, glyph_bytes
+
+
+class GlyphRing:
+    """
+    以显存布局保存的文本环：grid_order[0] 是最新字符所在的 Grid，
+    push 时其余字符依次挪到 grid_order 的下一个位置，最旧的字符被挤出
+    """
+
+    def __init__(self, grid_order, grid_count=10, fill=None):
+        """
+        :param grid_order: 由新到旧的字符位对应的 Grid，如 [5, 4, 3, 2, 1, 0]
+        :param fill: {grid_id: 3 字节} 文本区以外的固定内容 (如光标)
+        """
+        self.grid_order = list(grid_order)
+        self.width = len(self.grid_order)
+        self.frame = bytearray(BLANK_GLYPH * grid_count)
+        for grid_id, data in (fill or {}).items():
+            self.set_grid(grid_id, data)
+
+        # Grid 连续 (升序或降序) 时，整体移动就是一次切片赋值
+        step = self.grid_order[1] - self.grid_order[0] if self.width > 1 else 1
+        contiguous = all(b - a == step for a, b in zip(self.grid_order, self.grid_order[1:]))
+        if contiguous and step in (1, -1):
+            lo = min(self.grid_order) * 3
+            hi = (max(self.grid_order) + 1) * 3
+            # 降序：新字符在高地址，旧内容往低地址移；升序相反
+            self._shift = (slice(lo, hi - 3), slice(lo + 3, hi)) if step == -1 else (slice(lo + 3, hi), slice(lo, hi - 3))
+        else:
+            self._shift = None
+
+    def set_grid(self, grid_id, data):
+        self.frame[grid_id * 3:grid_id * 3 + 3] = data
+
+    def push(self, char):
+        frame = self.frame
+        if self._shift:
+            dst, src = self._shift
+            frame[dst] = frame[src]
+        else:
+            order = self.grid_order
+            for i in range(self.width - 1, 0, -1):
+                a, b = order[i] * 3, order[i - 1] * 3
+                frame[a:a + 3] = frame[b:b + 3]
+        self.set_grid(self.grid_order[0], glyph_bytes(char))
+
+    def extend(self, chars):
+        """按顺序压入多个字符；超过宽度时只有最后 width 个会留下"""
+        for char in chars[-self.width:]:
+            self.push(char)
+
+    def text(self):
+        """由新到旧的字形 (调试用)"""
+        return [bytes(self.frame[g * 3:g * 3 + 3]) for g in self.grid_order]
+
+    def snapshot(self):
+        return bytes(self.frame)
+
+
+class KeyEchoPipeline:
+    def __init__(self, writer, grid_order, cursor_grid=None, cursor_on=b'\xff\xff\xff',
+                 cursor_off=b'\x00\x00\x00', on_burst=None):
+        """
+        :param writer: DisplayWriter，帧投递给它的邮箱
+        :param grid_order: 由新到旧的字符位对应的 Grid
+        :param cursor_grid: 光标 Grid，每批按键后熄灭，由调用方 set_cursor(True) 点亮
+        :param on_burst: 每批按键渲染后在渲染线程里回调 on_burst(chars)
+        """
+        self.writer = writer
+        self.cursor_grid = cursor_grid
+        self.cursor_on = bytes(cursor_on)
+        self.cursor_off = bytes(cursor_off)
+        self.on_burst = on_burst
+
+        fill = {cursor_grid: self.cursor_on} if cursor_grid is not None else None
+        self.ring = GlyphRing(grid_order, fill=fill)
+        self._ring_lock = threading.Lock()
+        self._queue = queue.SimpleQueue()
+        self.thread = None
+
+        # 统计
+        self.keys = 0
+        self.bursts = 0
+        self.max_burst = 0
+        self.max_queue_latency = 0.0  # 按键 -> 帧投递
+
+    def push(self, char):
+        """键盘钩子线程调用：只入队，立即返回"""
+        self._queue.put((char, time.perf_counter()))
+
+    @property
+    def running(self):
+        return self.thread is not None
+
+    def start(self):
+        if self.thread is not None:
+            return
+        # 丢弃上一轮残留的内容：没被消费的停止标记 (None) 会让新线程立即退出，停止期间的按键也不该回显
+        try:
+            while True:
+                self._queue.get_nowait()
+        except queue.Empty:
+            pass
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout=1.0):
+        """放入停止标记，回显线程处理完它之前的按键后退出"""
+        if self.thread is None:
+            return
+        self._queue.put(None)
+        self.thread.join(timeout=timeout)
+        self.thread = None
+
+    def set_cursor(self, on):
+        with self._ring_lock:
+            self.ring.set_grid(self.cursor_grid, self.cursor_on if on else self.cursor_off)
+            self.writer.submit(self.ring.snapshot())
+
+    def refresh(self):
+        """重新投递当前画面"""
+        with self._ring_lock:
+            self.writer.submit(self.ring.snapshot())
+
+    def render(self, chars):
+        """把一批字符压入文本环并投递一帧，返回投递的帧"""
+        with self._ring_lock:
+            self.ring.extend(chars)
+            if self.cursor_grid is not None:
+                # 闪烁反馈：先熄灭光标
+                self.ring.set_grid(self.cursor_grid, self.cursor_off)
+            frame = self.ring.snapshot()
+            self.writer.submit(frame)
+        return frame
+
+    def get_stats(self):
+        return {
+            "keys": self.keys,
+            "bursts": self.bursts,
+            "max_burst": self.max_burst,
+            "max_queue_latency_ms": self.max_queue_latency * 1000,
+        }
+
+    def _run(self):
+        # 只以队列里的 None 作为退出条件，停止标记一定由本线程消费掉
+        get, get_nowait = self._queue.get, self._queue.get_nowait
+        stopping = False
+        while not stopping:
+            item = get()
+            if item is None:
+                break
+            # 取空队列：渲染期间到达的按键合并成同一帧
+            burst = [item]
+            try:
+                while True:
+                    item = get_nowait()
+                    if item is None:
+                        stopping = True
+                        break
+                    burst.append(item)
+            except queue.Empty:
+                pass
+
+            chars = [c for c, _ in burst]
+            try:
+                self.render(chars)
+            except Exception as e:
+                print(f"[KeyEcho] 渲染失败: {e}")
+                continue
+
+            self.keys += len(burst)
+            self.bursts += 1
+            self.max_burst = max(self.max_burst, len(burst))
+            self.max_queue_latency = max(self.max_queue_latency, time.perf_counter() - burst[0][1])
+
+            if self.on_burst:
+                try:
+                    self.on_burst(chars)
+                except Exception as e:
+                    print(f"[KeyEcho] 回调失败: {e}")
+
+
+# ==========================================
+# 👇 测试代码 (模拟器，无需设备)：合成连击，测量按键到屏幕的延迟 👇
+# ==========================================
+if __name__ == "__main__":
+    import random
+
+    from display_writer import DisplayWriter
+    from spi_comm import SPIAdapter
+    from transport import PT6315Emulator
+    from vfd_driver import FrameEncoder, VFDScreen
+
+    FPS = 60
+    LATENCY = 0.003  # 模拟每次 USB 往返 3ms
+    ORDER = [5, 4, 3, 2, 1, 0]
+
+    # 编码结果与逐字编码的 FrameEncoder 一致
+    ring = GlyphRing(ORDER, fill={6: b'\xff\xff\xff'})
+    ref = FrameEncoder(ORDER + [6])
+    text = [' '] * 6
+    for c in "HELLO world 123":
+        ring.push(c)
+        text = [c] + text[:-1]
+        assert ring.snapshot() == ref.encode(tuple(text) + (b'\xff\xff\xff',)), c
+    print("文本环编码校验通过")
+
+    # 停止时若回显线程正在渲染，停止标记也不会残留；再次 start 后照常回显
+    class NullWriter:
+        def submit(self, frame):
+            time.sleep(0.01)
+
+    pipe = KeyEchoPipeline(NullWriter(), ORDER)
+    for _ in range(3):
+        pipe.start()
+        pipe.push('A')
+        time.sleep(0.002)  # 回显线程正在 submit 时停止
+        pipe.stop()
+    pipe.start()
+    pipe.push('B')
+    time.sleep(0.05)
+    assert pipe.running and pipe.thread.is_alive() and pipe.ring.text()[0] == glyph_bytes('B')
+    pipe.stop()
+    print("停止/重启校验通过")
+
+    def measure(name, bursts, on_burst_cost=0.0):
+        """
+        bursts: [(本阵按键数, 按键间隔上限, 阵后停顿上限)]；on_burst_cost: 模拟回调 (唤醒亮度、定时器) 的耗时
+        返回按键 -> 屏幕的延迟统计，并断言不超过上限
+        """
+        glass = {}  # id(帧) -> 真正写到屏幕的时刻
+        sends = []  # 每次 write_frame 的耗时
+
+        class TimedScreen(VFDScreen):
+            def write_frame(self, frame, start=0, force=False, spi=None):
+                t0 = time.perf_counter()
+                sent = super().write_frame(frame, start, force, spi)
+                t1 = time.perf_counter()
+                sends.append(t1 - t0)
+                glass.setdefault(id(frame), t1)
+                return sent
+
+        spi = SPIAdapter(transport=PT6315Emulator(latency=LATENCY))
+        spi.open()
+        vfd = TimedScreen(spi)
+        vfd.init_device()
+        writer = DisplayWriter(vfd, fps=FPS)
+        writer.start()
+
+        presses = []  # 每个按键按下的时刻
+        rendered = []  # (frame, 本帧包含的最后一个按键序号)，保留引用使 id 不被复用
+        presses_seen = []
+
+        def slow_callback(chars):
+            if on_burst_cost:
+                time.sleep(on_burst_cost)
+
+        pipe = KeyEchoPipeline(writer, ORDER, cursor_grid=6, on_burst=slow_callback)
+        original_render = pipe.render
+
+        def tracked_render(chars):
+            frame = original_render(chars)
+            rendered.append((frame, len(presses_seen) + len(chars) - 1))
+            presses_seen.extend(chars)
+            return frame
+
+        pipe.render = tracked_render
+        pipe.start()
+        for count, gap, pause in bursts:
+            for _ in range(count):
+                presses.append(time.perf_counter())
+                pipe.push(chr(ord('A') + len(presses) % 26))
+                if gap:
+                    time.sleep(rnd.random() * gap)
+            time.sleep(rnd.random() * pause)
+        writer.flush()
+        pipe.stop()
+        writer.stop()
+        spi.close()
+
+        # 每个按键的上屏时刻 = 包含它且真正写出的最早一帧的时刻
+        latencies = []
+        shown = sorted((glass[id(f)], last) for f, last in rendered if id(f) in glass)
+        j = 0
+        for i, t_press in enumerate(presses):
+            while shown[j][1] < i:
+                j += 1
+            latencies.append(shown[j][0] - t_press)
+        latencies.sort()
+        stats = pipe.get_stats()
+        bound = on_burst_cost + RENDER_BUDGET + 1.0 / FPS + WORST_TRANSFER + SCHED_SLACK
+        print(f"[{name}] 按键 {len(presses)}  渲染批次 {pipe.bursts}  写屏 {writer.frames_sent}  "
+              f"最大批 {stats['max_burst']}  平均批 {stats['keys'] / stats['bursts']:.1f}")
+        print(f"[{name}] 按键->屏幕 p50 {latencies[len(latencies) // 2] * 1000:.1f}ms  "
+              f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:.1f}ms  最大 {latencies[-1] * 1000:.1f}ms  "
+              f"(上限 = 回调 {on_burst_cost * 1000:.0f} + 渲染 {RENDER_BUDGET * 1000:.0f} + 1/fps {1000 / FPS:.1f} "
+              f"+ 传输 {WORST_TRANSFER * 1000:.0f} + 调度 {SCHED_SLACK * 1000:.0f} = {bound * 1000:.1f}ms；"
+              f"实测入队->投递最大 {stats['max_queue_latency_ms']:.1f}、传输最大 {max(sends) * 1000:.1f}ms)")
+        assert latencies[-1] <= bound, (latencies[-1], bound)
+        return stats
+
+    RENDER_BUDGET = 0.001  # 一批按键的渲染
+    WORST_TRANSFER = LATENCY + 0.001  # 一次 USB 往返 + 模拟器解析
+    SCHED_SLACK = 0.003  # 线程唤醒 / sleep 超时的余量
+    rnd = random.Random(0)
+    # 正常打字：一阵 10-30 个按键，间隔 0-5ms，阵与阵之间停顿
+    measure("打字", [(rnd.randint(10, 30), 0.005, 0.05) for _ in range(40)])
+    # 粘贴 / 按键连发：一次 5-20 个按键几乎同时到达，回调每批耗时 4ms，期间到达的按键必须合并
+    stats = measure("粘贴+慢回调", [(rnd.randint(5, 20), 0.0005, 0.02) for _ in range(40)], on_burst_cost=0.004)
+    assert stats["max_burst"] > 1, stats
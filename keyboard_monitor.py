@@ -1,7 +1,8 @@
-import keyboard
 import threading
 import time
 
+from lazy_import import optional_import
+
 
 class KeyboardListener:
     def __init__(self, callback_func):
@@ -39,15 +40,21 @@ class KeyboardListener:
                 self.callback(' ')
 
     def start(self):
+        # keyboard 库加载时会初始化系统钩子相关的东西，只在真正开始监听时导入
+        keyboard = optional_import("keyboard", "全局键盘监听")
+        if keyboard is None:
+            return False
         self.running = True
         # 建立钩子，监听所有按键
         self.hook = keyboard.hook(self._on_key_event)
         print("[Keyboard] 监听已启动 (全局模式，窗口后台也能用)")
+        return True
 
     def stop(self):
         self.running = False
         if self.hook:
-            keyboard.unhook_all()
+            optional_import("keyboard").unhook_all()
+            self.hook = None
         print("[Keyboard] 监听已停止")
 
 
@@ -0,0 +1,194 @@
+"""
+分阶段延迟统计
+从音频数据到达到 VFD 刷新，每个阶段把耗时记进一个固定大小的对数分桶直方图：
+    capture_wait  等待音频数据 (stream.read / 环形缓冲区取窗口)
+    spectrum      FFT + 频带归并 (get_audio_frame)
+    encode        频谱帧编码 (encode_spectrum / display_spectrum)
+    transport     传输后端调用 (send_data / send_batch)
+
+默认关闭，埋点处只多一次模块属性判断：
+    timing = latency.enabled
+    if timing: t0 = time.perf_counter()
+    ...
+    if timing: latency.record(latency.SPECTRUM, time.perf_counter() - t0)
+设置环境变量 VFD_LATENCY=1 或调用 enable() 打开；VFD_LATENCY_DUMP=文件名 (.csv / .json) 时定期导出。
+直方图的计数在 GIL 下直接累加，多线程同时记录时极少数样本可能丢失，作为统计可以接受。
+"""
+import math
+import os
+import threading
+import time
+
+CAPTURE_WAIT = "capture_wait"
+SPECTRUM = "spectrum"
+ENCODE = "encode"
+TRANSPORT = "transport"
+STAGES = (CAPTURE_WAIT, SPECTRUM, ENCODE, TRANSPORT)
+
+# 对数分桶：每个 2 倍区间再细分 SUB_BUCKETS 份，覆盖 1us - 约 17 分钟
+SUB_BUCKETS = 4
+MIN_SECONDS = 1e-6
+BUCKET_COUNT = 30 * SUB_BUCKETS
+
+enabled = False
+
+
+class LatencyHistogram:
+    def __init__(self, name):
+        self.name = name
+        self.counts = [0] * BUCKET_COUNT
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds):
+        if seconds > MIN_SECONDS:
+            # frexp: seconds / MIN_SECONDS = m * 2**e, 0.5 <= m < 1
+            m, e = math.frexp(seconds / MIN_SECONDS)
+            i = (e - 1) * SUB_BUCKETS + int((m - 0.5) * 2 * SUB_BUCKETS)
+            if i >= BUCKET_COUNT:
+                i = BUCKET_COUNT - 1
+        else:
+            i = 0
+        self.counts[i] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    @staticmethod
+    def bucket_upper(i):
+        """第 i 个桶的上界 (秒)"""
+        e, k = divmod(i, SUB_BUCKETS)
+        return MIN_SECONDS * 2 ** e * (1 + (k + 1) / SUB_BUCKETS)
+
+    def percentile(self, p):
+        """p: 0-100，返回所在桶的上界 (不超过实测最大值)"""
+        if not self.count:
+            return 0.0
+        target = self.count * p / 100.0
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if n and seen >= target:
+                return min(self.bucket_upper(i), self.max)
+        return self.max
+
+    def reset(self):
+        self.counts = [0] * BUCKET_COUNT
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def get_stats(self):
+        """毫秒为单位的汇总"""
+        return {
+            "count": self.count,
+            "mean_ms": self.total / self.count * 1000 if self.count else 0.0,
+            "p50_ms": self.percentile(50) * 1000,
+            "p90_ms": self.percentile(90) * 1000,
+            "p99_ms": self.percentile(99) * 1000,
+            "max_ms": self.max * 1000,
+        }
+
+
+histograms = {name: LatencyHistogram(name) for name in STAGES}
+
+
+def enable(on=True):
+    global enabled
+    enabled = on
+
+
+def disable():
+    enable(False)
+
+
+def record(stage, seconds):
+    hist = histograms.get(stage)
+    if hist is None:
+        hist = histograms.setdefault(stage, LatencyHistogram(stage))
+    hist.record(seconds)
+
+
+def get_histogram(stage):
+    return histograms.get(stage)
+
+
+def snapshot():
+    """{阶段: 汇总}，只包含有样本的阶段"""
+    return {name: h.get_stats() for name, h in list(histograms.items()) if h.count}
+
+
+def reset():
+    for h in list(histograms.values()):
+        h.reset()
+
+
+def dump(path):
+    """按扩展名导出：.csv 每阶段一行汇总，其它为 JSON (含原始分桶)"""
+    import json
+
+    if path.lower().endswith(".csv"):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("stage,count,mean_ms,p50_ms,p90_ms,p99_ms,max_ms\n")
+            for name, s in snapshot().items():
+                f.write(f"{name},{s['count']},{s['mean_ms']:.4f},{s['p50_ms']:.4f},"
+                        f"{s['p90_ms']:.4f},{s['p99_ms']:.4f},{s['max_ms']:.4f}\n")
+    else:
+        data = {
+            "time": time.time(),
+            "stages": snapshot(),
+            "buckets_ms": [LatencyHistogram.bucket_upper(i) * 1000 for i in range(BUCKET_COUNT)],
+            "counts": {name: h.counts[:] for name, h in list(histograms.items()) if h.count},
+        }
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+
+
+class _Dumper:
+    def __init__(self):
+        self.thread = None
+        self.stop_event = threading.Event()
+
+
+_dumper = _Dumper()
+
+
+def start_dump(path, interval=10.0):
+    """后台线程每 interval 秒覆盖写出一次 (同时打开统计)"""
+    enable()
+    stop_dump()
+    stop_event = _dumper.stop_event = threading.Event()
+
+    def loop():
+        while not stop_event.wait(interval):
+            try:
+                dump(path)
+            except Exception as e:
+                print(f"[Latency] 导出失败: {e}")
+
+    _dumper.thread = threading.Thread(target=loop, daemon=True)
+    _dumper.thread.start()
+
+
+def stop_dump():
+    _dumper.stop_event.set()
+    if _dumper.thread:
+        _dumper.thread.join(timeout=1.0)
+        _dumper.thread = None
+
+
+def report():
+    """打印一张汇总表"""
+    print(f"{'stage':<14}{'count':>8}{'mean':>10}{'p50':>10}{'p90':>10}{'p99':>10}{'max':>10}  (ms)")
+    for name, s in snapshot().items():
+        print(f"{name:<14}{s['count']:>8}{s['mean_ms']:>10.3f}{s['p50_ms']:>10.3f}"
+              f"{s['p90_ms']:>10.3f}{s['p99_ms']:>10.3f}{s['max_ms']:>10.3f}")
+
+
+# VFD_LATENCY=1 开启；未设置、空值或 0 / false / no / off 都视为关闭
+if os.environ.get("VFD_LATENCY", "").strip().lower() not in ("", "0", "false", "no", "off"):
+    enable()
+if os.environ.get("VFD_LATENCY_DUMP"):
+    start_dump(os.environ["VFD_LATENCY_DUMP"], float(os.environ.get("VFD_LATENCY_INTERVAL", 10.0)))
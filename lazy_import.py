@@ -0,0 +1,37 @@
+"""
+按需导入可选依赖
+重量级或只在 Windows 上存在的库 (pyaudiowpatch / wmi / pynvml / keyboard ...) 不在模块加载时导入，
+第一次真正用到时才导入；缺失时返回 None 并只提示一次，调用方走降级路径。
+结果会缓存，之后每次调用只是一次字典查询。
+"""
+import importlib
+
+_modules = {}
+
+
+def optional_import(name, purpose=None):
+    """
+    导入 name 并缓存；导入失败返回 None
+    :param purpose: 缺失时提示里说明受影响的功能
+    """
+    try:
+        return _modules[name]
+    except KeyError:
+        pass
+    try:
+        module = importlib.import_module(name)
+    except Exception as e:
+        module = None
+        hint = f" ({purpose}不可用)" if purpose else ""
+        print(f"[Import] 无法导入 {name}{hint}: {e}")
+    _modules[name] = module
+    return module
+
+
+def inject(name, module):
+    """预先放入替身模块 (基准测试/离线调试用)，之后 optional_import(name) 直接返回它"""
+    _modules[name] = module
+
+
+def is_available(name):
+    return optional_import(name) is not None
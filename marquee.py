@@ -0,0 +1,154 @@
+"""
+滚动字幕 (跑马灯)
+整段文字只渲染一次，得到连续的字形字节条；每一步滚动只是对字节条做一次零拷贝切片 (memoryview)，
+逐帧不再查字库，高速滚动也几乎不占 CPU。
+"""
+import bisect
+import time
+
+from vfd_driver import BLANK_GLYPH, get_font
+
+# 滚动模式
+MODE_LOOP = "loop"  # 首尾相接循环滚动
+MODE_ONCE = "once"  # 滚到末尾后停住
+MODE_BOUNCE = "bounce"  # 来回滚动
+
+
+class Marquee:
+    def __init__(self, text, width=7, speed=6.0, pause=1.0, mode=MODE_LOOP, gap=2):
+        """
+        :param text: 要滚动的文字
+        :param width: 可视窗口的字符数 (占用的连续 Grid 数)
+        :param speed: 滚动速度 (字符/秒)
+        :param pause: 两端停顿时间 (秒)
+        :param mode: loop / once / bounce
+        :param gap: loop 模式下首尾之间的空格数
+        """
+        if mode not in (MODE_LOOP, MODE_ONCE, MODE_BOUNCE):
+            raise ValueError(f"未知的滚动模式: {mode}")
+        self.text = text
+        self.width = width
+        self.speed = speed
+        self.pause = pause
+        self.mode = mode
+
+        glyphs = get_font().encode(text)
+        if len(text) <= width:
+            # 放得下就不滚动
+            strip = glyphs + BLANK_GLYPH * (width - len(text))
+            self.positions = 1
+        elif mode == MODE_LOOP:
+            # 末尾再接上开头的一个窗口，绕回时仍然是一段连续切片
+            body = glyphs + BLANK_GLYPH * gap
+            strip = body + body[:width * 3]
+            self.positions = len(text) + gap
+        else:
+            strip = glyphs
+            self.positions = len(text) - width + 1
+
+        self._strip = bytes(strip)
+        self._view = memoryview(self._strip)
+        self._build_timeline()
+
+    def _build_timeline(self):
+        """预计算一个周期内每个滚动位置的起始时间"""
+        step = 1.0 / self.speed
+        last = self.positions - 1
+        times, positions = [0.0], [0]
+        if self.positions == 1:
+            self.cycle = None
+        elif self.mode == MODE_LOOP:
+            for i in range(1, self.positions):
+                times.append(self.pause + i * step)
+                positions.append(i)
+            self.cycle = self.pause + self.positions * step
+        else:
+            for i in range(1, self.positions):
+                times.append(self.pause + i * step)
+                positions.append(i)
+            end = self.pause + last * step + self.pause
+            if self.mode == MODE_BOUNCE:
+                # 回到位置 0 正好是下一个周期的开始
+                for k, i in enumerate(range(last - 1, 0, -1), 1):
+                    times.append(end + k * step)
+                    positions.append(i)
+                self.cycle = end + last * step
+            else:
+                self.cycle = None  # once：停在末尾
+        self._times = times
+        self._positions = positions
+
+    def window(self, pos):
+        """第 pos 个滚动位置的可视窗口 (width * 3 字节的 memoryview，零拷贝)"""
+        return self._view[pos * 3:(pos + self.width) * 3]
+
+    def position_at(self, elapsed):
+        """开始滚动 elapsed 秒后应显示的位置"""
+        if self.cycle:
+            elapsed %= self.cycle
+        return self._positions[bisect.bisect_right(self._times, elapsed) - 1]
+
+    def frame_at(self, elapsed):
+        return self.window(self.position_at(elapsed))
+
+    def keyframes(self):
+        """一个周期内的 [(相对时间, 窗口)]，供动画调度器使用；cycle 为 None 时不重复"""
+        return [(t, self.window(p)) for t, p in zip(self._times, self._positions)]
+
+    def play(self, vfd, start_grid=0, duration=None, stop_event=None):
+        """
+        在 vfd 的 [start_grid, start_grid + width) 上播放，直到 duration 秒或 stop_event 被置位
+        只在位置变化时写屏，其余时间睡到下一个关键帧
+        """
+        t0 = time.perf_counter()
+        last = None
+        while stop_event is None or not stop_event.is_set():
+            elapsed = time.perf_counter() - t0
+            if duration is not None and elapsed >= duration:
+                break
+            pos = self.position_at(elapsed)
+            if pos != last:
+                vfd.write_frame(self.window(pos), start=start_grid * 3)
+                last = pos
+            if not self.cycle and pos == self._positions[-1]:
+                if duration is None:
+                    break  # 不重复且已到末尾
+                time.sleep(max(0.0, duration - elapsed))
+                continue
+            time.sleep(self._next_change(elapsed) - elapsed)
+
+    def _next_change(self, elapsed):
+        """下一次位置变化的时间点"""
+        if self.cycle:
+            base = elapsed - elapsed % self.cycle
+            local = elapsed - base
+            i = bisect.bisect_right(self._times, local)
+            return base + (self._times[i] if i < len(self._times) else self.cycle)
+        i = bisect.bisect_right(self._times, elapsed)
+        return self._times[i] if i < len(self._times) else elapsed
+
+
+# ==========================================
+# 👇 测试代码 (模拟器，无需设备) 👇
+# ==========================================
+if __name__ == "__main__":
+    from spi_comm import SPIAdapter
+    from transport import PT6315Emulator
+    from vfd_driver import VFDScreen
+
+    emu = PT6315Emulator()
+    spi = SPIAdapter(transport=emu)
+    spi.open()
+    vfd = VFDScreen(spi)
+    vfd.init_device()
+
+    m = Marquee("HOSTNAME DESKTOP-VFD01 CPU 45C", width=7, speed=20.0, pause=0.2)
+    t0 = time.perf_counter()
+    m.play(vfd, duration=2.0)
+    print(f"loop 模式播放 {time.perf_counter() - t0:.2f}s, 统计: {vfd.get_stats()}")
+
+    n = 200000
+    t0 = time.perf_counter()
+    for i in range(n):
+        m.frame_at(i * 0.001)
+    print(f"frame_at: {(time.perf_counter() - t0) / n * 1e6:.2f} us/帧")
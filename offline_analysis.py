@@ -0,0 +1,174 @@
+"""
+离线频谱分析
+把整个 WAV 文件 (或 numpy 数组) 一次算成逐窗口的频段等级序列，窗口长度、重叠和量化规则与实时的
+AudioProcessor 相同 (SpectrumEngine.band_energy / levels_from_energy)，没有逐帧的 Python 循环。
+用途：
+    预渲染可视化      python offline_analysis.py track.wav --render track.vfdl   (用 frame_log.py replay 播放)
+    调 gain/threshold python offline_analysis.py track.wav --sweep
+    确定性的基准输入  python offline_analysis.py track.wav                      (打印速度相对实时的倍数)
+numpy 数组输入 (.npy) 需要用 --rate 指定采样率，形状为 (采样帧数, 声道数) 或一维单声道。
+"""
+import wave
+
+import numpy as np
+
+from spectrum import DEFAULT_BANDS, SpectrumEngine
+
+CHUNK = 1024  # 与 AudioProcessor.CHUNK 相同
+
+
+def load_wav(path):
+    """返回 (int16 数组 (采样帧数, 声道数), 采样率)"""
+    with wave.open(path, "rb") as wf:
+        if wf.getsampwidth() != 2:
+            raise ValueError("只支持 16 位 PCM WAV")
+        channels = wf.getnchannels()
+        rate = wf.getframerate()
+        raw = wf.readframes(wf.getnframes())
+    return np.frombuffer(raw, dtype=np.int16).reshape(-1, channels), rate
+
+
+def _as_frames(samples):
+    samples = np.asarray(samples)
+    return samples.reshape(-1, 1) if samples.ndim == 1 else samples
+
+
+class OfflineAnalysis:
+    def __init__(self, samples, rate, chunk=CHUNK, hop=None, bands=DEFAULT_BANDS, band_gains=None):
+        """
+        频段能量在构造时一次算好，之后换 gain / threshold 只需重新量化
+        :param hop: 相邻窗口间隔，默认 chunk // 2 (与实时采集的 50% 重叠相同)
+        """
+        self.samples = _as_frames(samples)
+        self.rate = rate
+        self.chunk = chunk
+        self.hop = hop or chunk // 2
+        self.engine = SpectrumEngine(chunk, self.samples.shape[1], rate, bands, band_gains)
+        self.energy = self.engine.band_energy(self.samples, self.hop)
+
+    @classmethod
+    def from_wav(cls, path, **kwargs):
+        samples, rate = load_wav(path)
+        return cls(samples, rate, **kwargs)
+
+    @property
+    def frame_rate(self):
+        """每秒的分析窗口数"""
+        return self.rate / self.hop
+
+    @property
+    def duration(self):
+        return len(self.samples) / self.rate
+
+    def levels(self, gain=3.0, threshold=4.0, quantize=True):
+        """(窗口数, 频段数) 的等级序列"""
+        return self.engine.levels_from_energy(self.energy, threshold, gain, quantize)
+
+    def level_stats(self, gain=3.0, threshold=4.0):
+        """一组参数下的等级分布：平均等级、顶满 / 全灭的比例、各频段平均等级"""
+        levels = self.levels(gain, threshold)
+        top = self.engine.max_level
+        return {
+            "gain": gain,
+            "threshold": threshold,
+            "mean": float(levels.mean()) if levels.size else 0.0,
+            "clipped": float((levels >= top).mean()) if levels.size else 0.0,
+            "silent": float((levels == 0).mean()) if levels.size else 0.0,
+            "band_mean": levels.mean(axis=0).tolist() if levels.size else [],
+        }
+
+    def sweep(self, gains, thresholds):
+        return [self.level_stats(g, t) for t in thresholds for g in gains]
+
+    def render(self, path, gain=3.0, threshold=4.0, fps=60):
+        """
+        按显示帧率渲染成帧录制文件 (与实时显示相同：平滑器 + 峰值点 + 差量写入)
+        时间戳使用虚拟时钟，回放时按音频的原始时间播放
+        """
+        from frame_log import FrameRecorder
+        from smoothing import BandSmoother
+        from spi_comm import SPIAdapter
+        from transport import PT6315Emulator
+        from vfd_driver import VFDScreen
+
+        levels = self.levels(gain, threshold, quantize=False)
+        clock = [0.0]
+        recorder = FrameRecorder(path, clock=lambda: clock[0])
+        spi = SPIAdapter(transport=PT6315Emulator(), recorder=recorder)
+        spi.open()
+        try:
+            vfd = VFDScreen(spi)
+            vfd.init_device()
+            smoother = BandSmoother(bands=levels.shape[1], max_level=self.engine.max_level)
+            # 第 k 个显示帧看到的是它之前最后一个已经算完的窗口
+            n_frames = int(self.duration * fps)
+            ready = (np.arange(n_frames) / fps * self.rate - self.chunk) // self.hop
+            last = -1
+            for k, i in enumerate(ready.astype(np.int64)):
+                now = clock[0] = k / fps
+                if i > last and i < len(levels):
+                    smoother.update(levels[i], now)
+                    last = i
+                bars, peaks = smoother.sample(now)
+                vfd.write_frame(vfd.encode_spectrum(bars, peaks))
+        finally:
+            spi.close()
+        return n_frames
+
+
+# ==========================================
+# 👇 命令行 👇
+# ==========================================
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="离线频谱分析")
+    parser.add_argument("input", nargs="?", help="16 位 PCM WAV 或 .npy，省略时使用 30 秒合成信号")
+    parser.add_argument("--rate", type=int, default=48000, help=".npy 输入的采样率")
+    parser.add_argument("--hop", type=int, default=None, help="窗口间隔，默认 CHUNK/2")
+    parser.add_argument("--gain", type=float, default=6.0)
+    parser.add_argument("--threshold", type=float, default=4.0)
+    parser.add_argument("--sweep", action="store_true", help="列出不同 gain / threshold 下的等级分布")
+    parser.add_argument("--render", metavar="VFDL", help="渲染成帧录制文件")
+    parser.add_argument("--fps", type=int, default=60, help="渲染的显示帧率")
+    parser.add_argument("--save", metavar="NPY", help="等级序列另存为 .npy")
+    args = parser.parse_args()
+
+    if args.input is None:
+        # 确定性的合成输入：扫频正弦 + 节拍 + 噪声
+        rate = args.rate
+        t = np.arange(rate * 30) / rate
+        sweep = np.sin(2 * np.pi * (50 * t + (8000 - 50) / 60 * t ** 2))
+        beat = np.sin(2 * np.pi * 60 * t) * (np.fmod(t, 0.5) < 0.1)
+        noise = np.random.default_rng(0).normal(0, 0.05, len(t))
+        mono = np.clip((0.3 * sweep + 0.5 * beat + noise) * 16000, -32768, 32767).astype(np.int16)
+        samples = np.stack([mono, mono], axis=1)
+        name = "合成信号"
+    elif args.input.endswith(".npy"):
+        samples, rate, name = np.load(args.input), args.rate, args.input
+    else:
+        (samples, rate), name = load_wav(args.input), args.input
+
+    t0 = time.perf_counter()
+    analysis = OfflineAnalysis(samples, rate, hop=args.hop)
+    levels = analysis.levels(args.gain, args.threshold)
+    elapsed = time.perf_counter() - t0
+    print(f"{name}: {analysis.duration:.1f} 秒, {len(levels)} 个窗口 ({analysis.frame_rate:.1f}/秒), "
+          f"分析耗时 {elapsed * 1000:.1f} ms, 实时的 {analysis.duration / elapsed:.0f} 倍")
+
+    if args.save:
+        np.save(args.save, levels)
+        print(f"等级序列已保存到 {args.save}")
+
+    if args.sweep:
+        print(f"{'gain':>6}{'threshold':>11}{'平均':>8}{'顶满':>8}{'全灭':>8}  各频段平均")
+        for s in analysis.sweep([2.0, 3.0, 4.0, 6.0, 8.0], [3.0, 3.5, 4.0, 4.5, 5.0]):
+            bands = " ".join(f"{v:4.1f}" for v in s["band_mean"])
+            print(f"{s['gain']:6.1f}{s['threshold']:11.1f}{s['mean']:8.2f}{s['clipped']:8.1%}{s['silent']:8.1%}  {bands}")
+
+    if args.render:
+        t0 = time.perf_counter()
+        n = analysis.render(args.render, args.gain, args.threshold, args.fps)
+        print(f"已渲染 {n} 帧到 {args.render} ({time.perf_counter() - t0:.2f} 秒)，"
+              f"用 python frame_log.py replay {args.render} 播放")
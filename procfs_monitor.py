@@ -0,0 +1,227 @@
+"""
+Linux 硬件信息后端 (procfs / sysfs)
+/proc/stat、/proc/meminfo、/sys/class/thermal/thermal_zone*/temp 在构造时各打开一次，
+之后每次采样只是对同一个 fd 做 pread (偏移 0，内核会重新生成内容) 读进复用的缓冲区，
+CPU 占用率由两次采样的 jiffies 差值自己计算，不经过 psutil。
+root 参数指定 procfs / sysfs 的根目录，传入一个按同样结构摆放文件的目录即可离线测试：
+    <root>/proc/stat
+    <root>/proc/meminfo
+    <root>/sys/class/thermal/thermal_zone0/{type,temp}
+(测试时应原地改写文件内容，不要替换文件，否则已打开的 fd 仍指向旧文件)
+"""
+import os
+
+from hardware_monitor import HardwareMonitor
+
+# 优先使用的温度传感器类型，都没有时取第一个读数合理的 thermal_zone
+CPU_THERMAL_TYPES = ("x86_pkg_temp", "coretemp", "k10temp", "cpu-thermal", "cpu_thermal", "soc_thermal", "acpitz")
+
+# pread 复制 /proc 文件比 psutil 重新打开并解析便宜得多，温度也可以和其它传感器一样频繁采样
+PROCFS_INTERVALS = {
+    "cpu_temp": 1.0,
+}
+
+
+class ProcFile:
+    """一个持久打开的只读文件，read() 每次从偏移 0 重新读取到复用的缓冲区 self.buf"""
+
+    def __init__(self, path, size=4096):
+        self.path = path
+        self.fd = os.open(path, os.O_RDONLY)
+        self.buf = bytearray(size)
+
+    def read(self):
+        """重新读取到 self.buf，返回有效长度"""
+        while True:
+            n = os.preadv(self.fd, [self.buf], 0)
+            if n < len(self.buf):
+                return n
+            # 缓冲区被填满，内容可能不完整 (如 CPU 很多时的 /proc/stat)：扩大后重读
+            self.buf = bytearray(len(self.buf) * 2)
+
+    def read_int(self):
+        n = self.read()
+        return int(self.buf[:n])
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+
+def _field(buf, n, key):
+    """在 buf[:n] ("Key:   12345 kB" 格式) 里取 key 对应的整数，不存在返回 None"""
+    i = buf.find(key, 0, n)
+    if i < 0:
+        return None
+    end = buf.find(b"\n", i, n)
+    return int(buf[i + len(key):end if end >= 0 else n].split()[0])
+
+
+class ProcfsSensors:
+    def __init__(self, root="/", thermal_zone=None):
+        """
+        :param root: procfs / sysfs 所在的根目录
+        :param thermal_zone: 指定温度传感器 (如 "thermal_zone2")，默认按 CPU_THERMAL_TYPES 自动选择
+        """
+        self.root = root
+        self.stat = ProcFile(os.path.join(root, "proc/stat"))
+        self.meminfo = ProcFile(os.path.join(root, "proc/meminfo"))
+        self.temp = self._open_thermal(thermal_zone)
+        self._prev_busy = None
+        self._prev_total = None
+
+    def _open_thermal(self, zone):
+        base = os.path.join(self.root, "sys/class/thermal")
+        if zone:
+            candidates = [zone]
+        else:
+            try:
+                zones = sorted(d for d in os.listdir(base) if d.startswith("thermal_zone"))
+            except OSError:
+                return None
+            types = {}
+            for d in zones:
+                try:
+                    with open(os.path.join(base, d, "type")) as f:
+                        types[d] = f.read().strip()
+                except OSError:
+                    types[d] = ""
+            rank = {t: i for i, t in enumerate(CPU_THERMAL_TYPES)}
+            candidates = sorted(zones, key=lambda d: rank.get(types[d], len(rank)))
+        for d in candidates:
+            try:
+                f = ProcFile(os.path.join(base, d, "temp"), size=32)
+            except OSError:
+                continue
+            try:
+                if 0 < f.read_int() // 1000 < 120:
+                    return f
+            except (OSError, ValueError):
+                pass
+            f.close()
+        return None
+
+    def cpu_percent(self):
+        """距上次调用的 CPU 总占用率 (%)；第一次调用返回 0.0 (与 psutil.cpu_percent 相同)"""
+        f = self.stat
+        n = f.read()
+        end = f.buf.find(b"\n", 0, n)
+        # 第一行 "cpu  user nice system idle iowait irq softirq steal guest guest_nice"
+        # guest 已计入 user，只取前 8 项
+        values = [int(v) for v in f.buf[:end if end >= 0 else n].split()[1:9]]
+        total = sum(values)
+        idle = values[3] + (values[4] if len(values) > 4 else 0)
+        busy = total - idle
+        prev_busy, prev_total = self._prev_busy, self._prev_total
+        self._prev_busy, self._prev_total = busy, total
+        if prev_total is None or total <= prev_total:
+            return 0.0
+        return max(0.0, min(100.0, (busy - prev_busy) * 100.0 / (total - prev_total)))
+
+    def memory_percent(self):
+        """(MemTotal - MemAvailable) / MemTotal，与 psutil.virtual_memory().percent 一致"""
+        n = self.meminfo.read()
+        buf = self.meminfo.buf  # read 可能换了更大的缓冲区，要在之后取
+        total = _field(buf, n, b"MemTotal:")
+        available = _field(buf, n, b"MemAvailable:")
+        if available is None:
+            # 3.14 之前的内核没有 MemAvailable
+            available = sum(_field(buf, n, k) or 0 for k in (b"MemFree:", b"Buffers:", b"Cached:"))
+        if not total:
+            return 0.0
+        return (total - available) * 100.0 / total
+
+    def cpu_temp(self):
+        """摄氏度 (整数)，没有可用的温度传感器时返回 0"""
+        if self.temp is None:
+            return 0
+        try:
+            c = self.temp.read_int() // 1000
+        except (OSError, ValueError):
+            return 0
+        return c if 0 < c < 120 else 0
+
+    def close(self):
+        for f in (self.stat, self.meminfo, self.temp):
+            if f is not None:
+                f.close()
+
+
+class ProcfsHardwareMonitor(HardwareMonitor):
+    """CPU 温度 / 内存 / CPU 占用率改从 procfs / sysfs 读取，GPU 仍走 NVML，对外接口与 HardwareMonitor 相同"""
+
+    def __init__(self, intervals=None, root="/", thermal_zone=None):
+        self.sensors = ProcfsSensors(root, thermal_zone)
+        self.sensors.cpu_percent()  # 建立 CPU 占用率的基准点
+        super().__init__(dict(PROCFS_INTERVALS, **(intervals or {})))
+
+    def _init_wmi(self):
+        self.wmi_obj = None
+
+    def get_cpu_temp(self):
+        return self.sensors.cpu_temp()
+
+    def _sample_memory(self):
+        self._metrics["M"] = int(self.sensors.memory_percent())
+
+    def _sample_cpu(self):
+        self._metrics["C"] = int(self.sensors.cpu_percent())
+
+    def close(self):
+        super().close()
+        self.sensors.close()
+
+
+# ==========================================
+# 👇 测试代码：假 procfs/sysfs 目录 + 本机对比 psutil 👇
+# ==========================================
+if __name__ == "__main__":
+    import tempfile
+    import time
+
+    def write(root, rel, text):
+        path = os.path.join(root, rel)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(text)
+
+    with tempfile.TemporaryDirectory() as root:
+        write(root, "proc/stat", "cpu  100 0 100 800 0 0 0 0 0 0\ncpu0 100 0 100 800 0 0 0 0 0 0\n")
+        write(root, "proc/meminfo", "MemTotal:       16000000 kB\nMemFree:         2000000 kB\n"
+                                    "MemAvailable:    4000000 kB\n")
+        write(root, "sys/class/thermal/thermal_zone0/type", "acpitz\n")
+        write(root, "sys/class/thermal/thermal_zone0/temp", "27800\n")
+        write(root, "sys/class/thermal/thermal_zone1/type", "x86_pkg_temp\n")
+        write(root, "sys/class/thermal/thermal_zone1/temp", "45000\n")
+
+        monitor = ProcfsHardwareMonitor(root=root)
+        # 原地改写：user +300，idle +100 -> 75%
+        write(root, "proc/stat", "cpu  400 0 100 900 0 0 0 0 0 0\ncpu0 400 0 100 900 0 0 0 0 0 0\n")
+        metrics = monitor.get_all_metrics()
+        print(f"假目录: {metrics}")
+        assert (metrics["CT"], metrics["M"], metrics["C"]) == (45, 75, 75), metrics
+        monitor.close()
+
+    if os.path.exists("/proc/stat"):
+        sensors = ProcfsSensors()
+        n = 20000
+        t0 = time.perf_counter()
+        for _ in range(n):
+            sensors.cpu_percent()
+            sensors.memory_percent()
+            sensors.cpu_temp()
+        t_procfs = (time.perf_counter() - t0) / n
+
+        psutil = __import__("lazy_import").optional_import("psutil")
+        if psutil:
+            t0 = time.perf_counter()
+            for _ in range(n // 10):
+                psutil.cpu_percent(interval=None)
+                psutil.virtual_memory()
+            t_psutil = (time.perf_counter() - t0) / (n // 10)
+            print(f"每次采样: procfs {t_procfs * 1e6:.1f} us, psutil {t_psutil * 1e6:.1f} us")
+            print(f"内存: procfs {sensors.memory_percent():.1f}%, psutil {psutil.virtual_memory().percent:.1f}%")
+        else:
+            print(f"每次采样: procfs {t_procfs * 1e6:.1f} us")
+        sensors.close()
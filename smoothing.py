@@ -0,0 +1,109 @@
+"""
+频谱平滑与峰值保持
+分析线程每出一帧 FFT 结果就 update() 一次目标值；显示线程按自己的帧率 sample()，
+条形按时间常数指数逼近目标 (上升快、下落慢)，峰值点在保持时间后匀速下落。
+所有频段一次向量化更新，状态完全由时间驱动，所以显示帧率和 FFT 帧率互不相关：
+显示 60/120fps 时两次 FFT 之间的帧也是平滑过渡，降低 FFT 帧率也不会一卡一卡。
+"""
+import math
+import threading
+import time
+
+import numpy as np
+
+
+class BandSmoother:
+    def __init__(self, bands=6, attack=0.015, release=0.2, peak_hold=0.6, peak_fall=15.0, max_level=10):
+        """
+        :param bands: 频段数
+        :param attack: 上升时间常数 (秒)，越小跟得越紧
+        :param release: 下落时间常数 (秒)
+        :param peak_hold: 峰值点停留时间 (秒)
+        :param peak_fall: 峰值点下落速度 (级/秒)
+        :param max_level: 等级上限
+        """
+        self.attack = attack
+        self.release = release
+        self.peak_hold = peak_hold
+        self.peak_fall = peak_fall
+        self.max_level = max_level
+        self.lock = threading.Lock()
+        self.reset(bands)
+
+    def reset(self, bands=None):
+        n = len(self.target) if bands is None else bands
+        self.target = np.zeros(n, dtype=np.float64)
+        self.value = np.zeros(n, dtype=np.float64)
+        self.peak = np.zeros(n, dtype=np.float64)
+        self.hold_until = np.zeros(n, dtype=np.float64)
+        self._alpha = np.empty(n, dtype=np.float64)
+        self.last_time = None
+
+    def update(self, levels, now=None):
+        """分析线程：新的一帧目标等级 (整数或连续值)"""
+        now = time.perf_counter() if now is None else now
+        with self.lock:
+            if len(levels) != len(self.target):
+                self.reset(len(levels))
+            self._advance(now)
+            self.target[:] = levels
+
+    def sample(self, now=None):
+        """
+        显示线程：推进到 now 并返回 (条形等级, 峰值点等级) 两个 int 列表
+        峰值点不高于条形时为 0 (不单独显示)
+        """
+        now = time.perf_counter() if now is None else now
+        with self.lock:
+            self._advance(now)
+            bars = np.clip(np.rint(self.value), 0, self.max_level).astype(np.int64)
+            peaks = np.clip(np.rint(self.peak), 0, self.max_level).astype(np.int64)
+            peaks[peaks <= bars] = 0
+        return bars.tolist(), peaks.tolist()
+
+    def _advance(self, now):
+        if self.last_time is None:
+            self.last_time = now
+            return
+        dt = now - self.last_time
+        if dt <= 0:
+            return
+        self.last_time = now
+
+        # 指数逼近：上升用 attack，下落用 release
+        rise = 1.0 - math.exp(-dt / self.attack) if self.attack > 0 else 1.0
+        fall = 1.0 - math.exp(-dt / self.release) if self.release > 0 else 1.0
+        alpha = self._alpha
+        np.copyto(alpha, fall)
+        alpha[self.target > self.value] = rise
+        self.value += (self.target - self.value) * alpha
+
+        # 峰值：被条形顶起时重新计时，保持期过后匀速下落，但不低于条形
+        pushed = self.value >= self.peak
+        self.peak[pushed] = self.value[pushed]
+        self.hold_until[pushed] = now + self.peak_hold
+        falling = ~pushed & (now > self.hold_until)
+        self.peak[falling] -= self.peak_fall * dt
+        np.maximum(self.peak, self.value, out=self.peak)
+
+
+# ==========================================
+# 👇 测试代码：FFT 20fps，显示 60fps 👇
+# ==========================================
+if __name__ == "__main__":
+    smoother = BandSmoother(bands=6)
+    rnd = np.random.default_rng(0)
+    t = 0.0
+    for frame in range(12):
+        if frame % 3 == 0:
+            target = rnd.integers(0, 11, 6)
+            smoother.update(target, now=t)
+            print(f"t={t:.3f} FFT -> {target.tolist()}")
+        print(f"t={t:.3f} 显示 {smoother.sample(now=t)}")
+        t += 1 / 60
+
+    n = 100000
+    t0 = time.perf_counter()
+    for i in range(n):
+        smoother.sample(now=i / 60)
+    print(f"sample: {(time.perf_counter() - t0) / n * 1e6:.1f} us/帧")
@@ -0,0 +1,158 @@
+"""
+频谱计算引擎
+窗函数、频段边界、增益向量在配置时算好，输出缓冲区复用，
+频段取最大值和等级量化用一次向量化运算完成 (np.maximum.reduceat)，支持任意频段数。
+process_batch 对整段音频做 STFT：滑动窗口视图 + 沿一个轴的批量 rfft + 批量频段归并，
+结果与逐帧调用 process 相同 (离线分析见 offline_analysis.py)。
+"""
+# numpy 在第一次创建 SpectrumEngine 时才导入：audio_monitor 只取 DEFAULT_BANDS 时不必加载
+np = None
+
+
+def _load_numpy():
+    global np
+    if np is None:
+        import numpy
+        np = numpy
+
+
+# 默认 6 个频段的上限频率 (Hz) 和各自的增益
+DEFAULT_BANDS = (150, 400, 1000, 2500, 6000, 20000)
+DEFAULT_GAINS = (1.0, 1.2, 1.5, 2.0, 3.0, 4.0)
+
+# 加权能量低于该值直接视为 0 级
+ENERGY_FLOOR = 10.0
+
+
+class SpectrumEngine:
+    def __init__(self, chunk=1024, channels=2, rate=44100, bands=DEFAULT_BANDS, gains=None, max_level=10):
+        """
+        :param chunk: 每帧的采样帧数 (每个声道的采样数)
+        :param channels: 交错 int16 数据的声道数，计算前混为单声道
+        :param bands: 各频段的上限频率 (Hz)，从低到高
+        :param gains: 各频段的增益，默认 6 段时使用 DEFAULT_GAINS，其他数量全部为 1.0
+        :param max_level: 输出等级上限 (0-max_level)
+        """
+        _load_numpy()
+        self.max_level = max_level
+        if gains is None:
+            gains = DEFAULT_GAINS if len(bands) == len(DEFAULT_GAINS) else [1.0] * len(bands)
+        if len(gains) != len(bands):
+            raise ValueError("gains 与 bands 的数量必须一致")
+        self.bands = tuple(bands)
+        self.gains = np.asarray(gains, dtype=np.float64)
+        self.configure(chunk, channels, rate)
+
+    def configure(self, chunk, channels, rate):
+        """按采样参数预计算窗函数、频段边界并分配缓冲区"""
+        self.chunk = int(chunk)
+        self.channels = max(1, int(channels))
+        self.rate = rate
+        self.freq_resolution = rate / self.chunk
+
+        # 混音的 1/channels 并入窗函数，省掉一次除法
+        self.window = np.hanning(self.chunk) / self.channels
+        self._mono = np.empty(self.chunk, dtype=np.float64)
+        self._mag = np.empty(self.chunk // 2 + 1, dtype=np.float64)
+        self._energy = np.zeros(len(self.bands), dtype=np.float64)
+        self._levels = np.zeros(len(self.bands), dtype=np.float64)
+
+        # 频段边界：rfft 去掉直流分量后，第 i 段是 [end_{i-1}, end_i)
+        n_bins = self.chunk // 2
+        ends = np.minimum((np.asarray(self.bands, dtype=np.float64) / self.freq_resolution).astype(np.int64), n_bins)
+        ends = np.maximum.accumulate(ends)
+        starts = np.concatenate(([0], ends[:-1]))
+        self._valid = starts < ends
+
+        # reduceat 的分段下标：各非空频段的起点，若最后一段没到末尾再补一个终点
+        idx = starts[self._valid]
+        if len(idx) and ends[self._valid][-1] < n_bins:
+            idx = np.append(idx, ends[self._valid][-1])
+        self._reduce_idx = idx
+        self._n_valid = int(self._valid.sum())
+
+    def process(self, data, threshold, gain, quantize=True):
+        """
+        计算一帧频谱等级
+        data: 交错的 int16 原始数据 (bytes 或 ndarray)
+        threshold / gain: 对数噪声基值与显示增益
+        quantize: False 时不取整，返回 0-max_level 的连续值 (交给平滑器)
+        返回 list[int]，每个频段 0-max_level
+        """
+        samples = np.frombuffer(data, dtype=np.int16) if not isinstance(data, np.ndarray) else data
+        if samples.size != self.chunk * self.channels:
+            # 数据长度变化 (流刚打开/设备切换)，按新长度重新配置
+            self.configure(samples.size // self.channels, self.channels, self.rate)
+
+        # 混音 + 加窗
+        np.sum(samples.reshape(-1, self.channels), axis=1, dtype=np.float64, out=self._mono)
+        np.multiply(self._mono, self.window, out=self._mono)
+        np.abs(np.fft.rfft(self._mono), out=self._mag)
+        fft_data = self._mag[1:]
+
+        # 各频段取最大值
+        energy = self._energy
+        energy.fill(0.0)
+        if self._n_valid:
+            energy[self._valid] = np.maximum.reduceat(fft_data, self._reduce_idx)[:self._n_valid]
+        np.multiply(energy, self.gains, out=energy)
+
+        # 量化：log10(能量) 超过基值的部分乘以增益
+        levels = self._levels
+        np.maximum(energy, ENERGY_FLOOR, out=levels)
+        np.log10(levels, out=levels)
+        levels -= threshold
+        levels *= gain
+        if quantize:
+            np.floor(levels, out=levels)
+        levels[energy < ENERGY_FLOOR] = 0.0
+        np.clip(levels, 0, self.max_level, out=levels)
+        if not quantize:
+            return levels.tolist()
+        return levels.astype(np.int64).tolist()
+
+    def band_energy(self, samples, hop, block_frames=2048):
+        """
+        整段音频逐窗口的加权频段能量
+        samples: (帧数, 声道数) 或交错一维的 int16 / 浮点数组，声道数须与 configure 一致
+        hop: 相邻分析窗口的间隔 (采样帧)
+        block_frames: 每批做 rfft 的窗口数，限制中间数组的内存占用
+        返回 shape (窗口数, 频段数) 的 float64 数组
+        """
+        samples = np.asarray(samples)
+        if samples.ndim == 1:
+            samples = samples.reshape(-1, self.channels)
+        mono = samples.sum(axis=1, dtype=np.float64)
+        if len(mono) < self.chunk:
+            return np.zeros((0, len(self.bands)), dtype=np.float64)
+
+        # 不复制数据的滑动窗口视图：第 i 行是 mono[i*hop : i*hop+chunk]
+        frames = np.lib.stride_tricks.sliding_window_view(mono, self.chunk)[::hop]
+        energy = np.zeros((len(frames), len(self.bands)), dtype=np.float64)
+        for start in range(0, len(frames), block_frames):
+            block = frames[start:start + block_frames] * self.window
+            mag = np.abs(np.fft.rfft(block, axis=1))[:, 1:]
+            if self._n_valid:
+                out = energy[start:start + block_frames]
+                out[:, self._valid] = np.maximum.reduceat(mag, self._reduce_idx, axis=1)[:, :self._n_valid]
+        energy *= self.gains
+        return energy
+
+    def levels_from_energy(self, energy, threshold, gain, quantize=True):
+        """与 process 相同的量化规则，一次作用于 band_energy 的全部窗口"""
+        levels = np.maximum(energy, ENERGY_FLOOR)
+        np.log10(levels, out=levels)
+        levels -= threshold
+        levels *= gain
+        if quantize:
+            np.floor(levels, out=levels)
+        levels[energy < ENERGY_FLOOR] = 0.0
+        np.clip(levels, 0, self.max_level, out=levels)
+        return levels.astype(np.int64) if quantize else levels
+
+    def process_batch(self, samples, hop, threshold, gain, quantize=True):
+        """
+        整段音频的频谱等级序列，结果与逐窗口调用 process 相同
+        返回 shape (窗口数, 频段数) 的数组：quantize=True 时为 int64，否则为 float64
+        """
+        return self.levels_from_energy(self.band_energy(samples, hop), threshold, gain, quantize)
@@ -1,45 +1,157 @@
 import ctypes
+import itertools
 import os
 import threading
+import time
 from ctypes import c_ubyte
 
+import latency
+from frame_log import FrameRecorder
+from transport import DEFAULT_DLL_PATH, REVERSE_TABLE, CH341Transport, create_transport
+
+# 预分配的发送缓冲区大小 (0xC0 + 48 字节显存 = 49 字节，留出余量)
+TX_BUFFER_SIZE = 64
+
+# 本进程里按 VFD_RECORD 开始录制的 SPIAdapter 序号
+_record_index = itertools.count()
+
+
+def _record_path(path):
+    """
+    VFD_RECORD 对应的录制文件：进程内第一个 SPIAdapter 使用原文件名，之后的 (多设备) 依次加 .1 / .2 ... 后缀，
+    各自录成独立的文件，不会互相截断；文件名里的 {pid} 换成进程号，供多个进程同时录制
+    """
+    path = path.replace("{pid}", str(os.getpid()))
+    n = next(_record_index)
+    if n:
+        root, ext = os.path.splitext(path)
+        path = f"{root}.{n}{ext}"
+    return path
+
+
+def as_bytes(data):
+    """bytes / bytearray / memoryview / int 列表统一转成 bytes 或 bytearray"""
+    if isinstance(data, memoryview):
+        return data.tobytes()
+    if not isinstance(data, (bytes, bytearray)):
+        return bytes(data)
+    return data
+
+
+class Transaction:
+    """
+    收集多条 PT6315 指令，flush 时一次交给传输后端
+    每条指令仍有自己的片选周期，只是尽量合并到更少的 USB 传输里
+    与 SPIAdapter 一样提供 send_data，可以直接替换 VFDScreen.spi
+    """
+
+    def __init__(self, spi):
+        self.spi = spi
+        self.commands = []
+
+    def send_data(self, data):
+        self.commands.append(bytes(as_bytes(data)))
+
+    def flush(self):
+        if self.commands:
+            self.spi.send_batch(self.commands)
+            self.commands = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.flush()
+
 
 class SPIAdapter:
-    def __init__(self, dll_name=r'C:\Users\xz\Desktop\资料\CH341PAR\CH341PAR\CH341DLLA64.DLL'):
-        try:
-            # 尝试加载指定路径
-            self.lib = ctypes.windll.LoadLibrary(os.path.abspath(dll_name))
-        except Exception as e:
-            try:
-                # 尝试加载当前目录
-                self.lib = ctypes.windll.LoadLibrary("CH341DLLA64.DLL")
-            except:
-                raise RuntimeError(f"无法加载 DLL，请检查路径: {e}")
-
-        self.dev_index = 0
+    def __init__(self, dll_name=DEFAULT_DLL_PATH, lib=None, transport=None, recorder=None):
+        """
+        :param transport: 传输后端 (CH341Transport / PT6315Emulator)，
+                          不传时按环境变量 VFD_TRANSPORT 选择，默认 CH341
+        :param lib: 直接注入已加载的 CH341 库对象 (基准测试/调试用)
+        :param recorder: frame_log.FrameRecorder，记录发出的每条指令；
+                         不传时若设置了环境变量 VFD_RECORD 则录制到该文件 (多个适配器见 _record_path)
+        """
+        if transport is None:
+            if lib is not None:
+                transport = CH341Transport(dll_name, lib=lib)
+            else:
+                transport = create_transport(dll_name=dll_name)
+        self.transport = transport
         self.lock = threading.Lock()
 
+        if recorder is None and os.environ.get("VFD_RECORD"):
+            recorder = FrameRecorder(_record_path(os.environ["VFD_RECORD"]))
+        self.recorder = recorder
+
+        # 复用的 ctypes 发送缓冲区，稳态帧不再新建 ctypes 数组
+        # (bytes.translate 仍会产生一个临时 bytes，见 send_data)
+        self._tx_buf = (c_ubyte * TX_BUFFER_SIZE)()
+
     def open(self):
         """打开设备并配置为 SPI 模式"""
-        if self.lib.CH341OpenDevice(self.dev_index) <= 0:
-            return False
-        # 0x80 = SPI Mode, MSB First (虽然我们要发LSB，但通过软件翻转实现)
-        self.lib.CH341SetStream(self.dev_index, 0x80)
-        return True
+        return self.transport.open()
 
     def close(self):
-        if self.lib:
-            self.lib.CH341CloseDevice(self.dev_index)
+        self.transport.close()
+        if self.recorder:
+            with self.lock:
+                self.recorder.close()
+                self.recorder = None
 
     def _reverse_byte(self, b):
         """PT6315 需要 LSB First，CH341A 发送 MSB，需软件翻转"""
-        return int('{:08b}'.format(b)[::-1], 2)
+        return REVERSE_TABLE[b]
+
+    def send_data(self, data):
+        """
+        发送数据
+        data: bytes / bytearray / memoryview，或 int 列表 (兼容旧调用)
+        """
+        data = as_bytes(data)
+        # 位翻转每帧产生一个 49 字节的临时 bytes，没有做到零分配：
+        # 逐字节写进 _tx_buf 或 np.take(out=...) 虽然不分配 (numpy 仍要建视图对象)，实测都慢 3 倍多
+        # (0.7 us -> 2.2-2.5 us)，而且 numpy 会拖慢不需要它的入口的启动
+        reversed_data = data.translate(REVERSE_TABLE)
+        length = len(reversed_data)
 
-    def send_data(self, data_list):
-        """发送数据列表 (int list)"""
-        reversed_data = [self._reverse_byte(b) for b in data_list]
-        c_buf = (c_ubyte * len(reversed_data))(*reversed_data)
+        with self.lock:
+            if self.recorder:
+                self.recorder.record((data,))
+            if length > len(self._tx_buf):
+                # 超长数据包：扩容一次后继续复用
+                self._tx_buf = (c_ubyte * length)()
+            # CH341StreamSPI4 会把收到的数据写回缓冲区，所以每帧都要重新填充
+            ctypes.memmove(self._tx_buf, reversed_data, length)
+            if latency.enabled:
+                t0 = time.perf_counter()
+                self.transport.stream(self._tx_buf, length)
+                latency.record(latency.TRANSPORT, time.perf_counter() - t0)
+            else:
+                self.transport.stream(self._tx_buf, length)
 
+    def send_batch(self, commands):
+        """发送多条指令 (每条一个片选周期)，由传输后端合并成尽量少的 USB 传输"""
+        commands = [bytes(as_bytes(c)) for c in commands if len(c)]
+        if not commands:
+            return
         with self.lock:
-            # 0x80 = SPI模式, 自动片选
-            self.lib.CH341StreamSPI4(self.dev_index, 0x80, len(c_buf), c_buf)
\ No newline at end of file
+            if self.recorder:
+                self.recorder.record(commands)
+            if latency.enabled:
+                t0 = time.perf_counter()
+                self.transport.stream_batch(commands)
+                latency.record(latency.TRANSPORT, time.perf_counter() - t0)
+            else:
+                self.transport.stream_batch(commands)
+
+    def transaction(self):
+        """
+        批量发送上下文：
+            with spi.transaction() as tx:
+                tx.send_data([0x8F])
+                tx.send_data(frame)
+        """
+        return Transaction(self)
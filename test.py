@@ -121,49 +121,18 @@
 #     run_deep_scan()
 
 import time
-import os
-import ctypes
-import threading
-from ctypes import c_ubyte
 
-
-# ==========================================
-# 1. 驱动适配层
-# ==========================================
-class SPIAdapter:
-    def __init__(self, dll_name=r'CH341DLLA64.DLL'):
-        try:
-            self.lib = ctypes.windll.LoadLibrary(os.path.abspath(dll_name))
-        except Exception as e:
-            raise RuntimeError(f"无法加载 DLL: {e}")
-        self.dev_index = 0
-        self.lock = threading.Lock()
-
-    def open(self):
-        if self.lib.CH341OpenDevice(self.dev_index) <= 0: return False
-        self.lib.CH341SetStream(self.dev_index, 0x80)
-        return True
-
-    def close(self):
-        self.lib.CH341CloseDevice(self.dev_index)
-
-    def _reverse_byte(self, b):
-        return int('{:08b}'.format(b)[::-1], 2)
-
-    def send_data(self, data_list):
-        reversed_data = [self._reverse_byte(b) for b in data_list]
-        c_buf = (c_ubyte * len(reversed_data))(*reversed_data)
-        with self.lock:
-            self.lib.CH341StreamSPI4(self.dev_index, 0x80, len(c_buf), c_buf)
+from spi_comm import SPIAdapter
 
 
 # ==========================================
-# 2. 组合测试逻辑
+# 1. 组合测试逻辑
 # ==========================================
 def run_combination_test():
     target_addr = 0xD2  # 你指定的地址
 
-    spi = SPIAdapter()
+    # 传输后端由环境变量 VFD_TRANSPORT 选择 (ch341 / emulator)
+    spi = SPIAdapter(r'CH341DLLA64.DLL')
     if not spi.open():
         print("无法打开设备")
         return
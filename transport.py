@@ -0,0 +1,356 @@
+"""
+SPI 传输后端
+CH341Transport:  真实的 CH341A USB 转 SPI (仅 64 位 Windows)
+PT6315Emulator:  软件模拟的 PT6315，解析真实指令字节到 48 字节显存，Linux 下可跑通整条显示链路
+
+两个后端接口一致：open() / close() / stream(buf, length) / stream_batch(commands)
+stream 的 buf 是已经按线上顺序 (MSB First 发送、LSB First 翻转后) 准备好的 ctypes 缓冲区，
+一次 stream 调用对应一次片选 (STB) 拉低到拉高。
+stream_batch 接收多条未翻转的原始指令 (bytes)，每条指令各自拉低/拉高一次片选，
+但尽量合并到同一次 USB 传输里。
+"""
+import ctypes
+import functools
+import os
+import threading
+import time
+
+# PT6315 需要 LSB First，CH341A 发送 MSB，预先算好 256 项的位翻转表
+REVERSE_TABLE = bytes(int('{:08b}'.format(i)[::-1], 2) for i in range(256))
+
+# PT6315 显存：0x00-0x2F 共 48 字节，每个 Grid 3 字节
+DISPLAY_RAM_SIZE = 48
+
+DEFAULT_DLL_PATH = r'C:\Users\xz\Desktop\资料\CH341PAR\CH341PAR\CH341DLLA64.DLL'
+
+# ================= CH341 批量命令流 (参考 CH341DLL.H) =================
+CH341_PACKET_LENGTH = 32  # 设备按 32 字节一个 USB 包解析命令
+CMD_SPI_STREAM = 0xA8  # SPI 数据流，后面跟最多 31 个数据字节 (硬件原生 LSB First)
+CMD_UIO_STREAM = 0xAB  # UIO 引脚流，后面跟若干子命令，以 END 结束
+UIO_STM_OUT = 0x80  # 设置 D0-D5 输出电平
+UIO_STM_DIR = 0x40  # 设置 D0-D5 方向
+UIO_STM_END = 0x20  # 结束本包的 UIO 命令
+
+# UIO 引脚：D0 = CS0 (接 PT6315 STB)，D3 = DCK (CLK)，D5 = DOUT (DIN)
+PIN_CLK = 0x08
+PIN_DOUT = 0x20
+PINS_DESELECT = 0x37  # CS 高，CLK 低
+PINS_SELECT = 0x36  # CS 低，CLK 低
+PINS_DIR_OUT = 0x3F  # D0-D5 全部为输出
+
+# 单字节指令 (模式/数据设置/亮度) 直接用 UIO 引脚模拟时序，
+# 这样它们能和其他指令共用一个 USB 传输 (SPI 数据流的短包会结束当前传输)
+BITBANG_MAX_BYTES = 1
+
+
+def _pad_packet(packet):
+    return bytes(packet) + bytes(CH341_PACKET_LENGTH - len(packet))
+
+
+def _bitbang_packet(command):
+    """把短指令编码为一个 UIO 包：片选拉低，逐位 (LSB First) 在 CLK 上升沿前给出数据，再拉高片选"""
+    packet = [CMD_UIO_STREAM, UIO_STM_OUT | PINS_DESELECT, UIO_STM_DIR | PINS_DIR_OUT, UIO_STM_OUT | PINS_SELECT]
+    for value in command:
+        for bit in range(8):
+            pins = PINS_SELECT | PIN_DOUT if (value >> bit) & 1 else PINS_SELECT & ~PIN_DOUT
+            packet.append(UIO_STM_OUT | pins)
+            packet.append(UIO_STM_OUT | pins | PIN_CLK)
+    packet += [UIO_STM_OUT | PINS_DESELECT, UIO_STM_END]
+    return _pad_packet(packet)
+
+
+def build_ch341_batch(commands):
+    """
+    把多条指令编码成 CH341 原始命令流，返回 [(传输数据, 需要读回的字节数), ...]
+
+    规则：
+    - UIO 包补齐到 32 字节，可以连续放在同一次传输里
+    - SPI 数据流的最后一包通常不满 32 字节，短包会结束 USB 传输，下一条指令只能另起一次传输
+    - 片选在下一条指令开头 (或整批最后) 才拉高，每条指令仍有自己独立的片选周期
+    """
+    transfers = []
+    current = bytearray()
+    readback = 0
+    selected = False  # SPI 数据流结束后片选仍为低
+
+    for command in commands:
+        if len(command) <= BITBANG_MAX_BYTES:
+            current += _bitbang_packet(command)
+            selected = False
+            continue
+
+        current += _pad_packet([CMD_UIO_STREAM, UIO_STM_OUT | PINS_DESELECT, UIO_STM_DIR | PINS_DIR_OUT,
+                                UIO_STM_OUT | PINS_SELECT, UIO_STM_END])
+        selected = True
+        step = CH341_PACKET_LENGTH - 1
+        for i in range(0, len(command), step):
+            chunk = command[i:i + step]
+            current.append(CMD_SPI_STREAM)
+            current += chunk
+            readback += len(chunk)
+            if len(chunk) < step:
+                # 短包：本次传输到此结束
+                transfers.append((bytes(current), readback))
+                current = bytearray()
+                readback = 0
+
+    if selected:
+        current += bytes([CMD_UIO_STREAM, UIO_STM_OUT | PINS_DESELECT, UIO_STM_END])
+    if current:
+        transfers.append((bytes(current), readback))
+    return transfers
+
+
+@functools.lru_cache(maxsize=None)
+def ch341_payload_size(length):
+    """
+    一条 length 字节的指令单独发送时 CH341 命令流的总字节数 (片选 UIO 包 + SPI 数据包)，
+    与 build_ch341_batch 同样的编码；CH341StreamSPI4 在 DLL 内部的打包方式没有文档，按此估算
+    """
+    return sum(len(data) for data, _ in build_ch341_batch([bytes(length)]))
+
+
+class CH341StreamDecoder:
+    """
+    按 CH341 固件的方式解析原始命令流，还原出每个片选周期内送给 PT6315 的字节
+    (模拟器用它校验 build_ch341_batch 的编码)；引脚状态跨传输保留
+    """
+
+    def __init__(self):
+        self.pins = PINS_DESELECT
+        self.frame = None  # 当前片选周期内已收到的字节，None 表示片选为高
+        self.value = 0
+        self.bits = 0
+
+    def feed(self, transfer):
+        """解析一次传输，返回其中已结束 (片选拉高) 的指令列表"""
+        frames = []
+        for start in range(0, len(transfer), CH341_PACKET_LENGTH):
+            packet = transfer[start:start + CH341_PACKET_LENGTH]
+            if packet[0] == CMD_SPI_STREAM:
+                if self.frame is not None:
+                    self.frame += packet[1:]
+            elif packet[0] == CMD_UIO_STREAM:
+                for sub in packet[1:]:
+                    if sub == UIO_STM_END:
+                        break
+                    if sub & 0xC0 == UIO_STM_OUT:
+                        self._set_pins(sub & 0x3F, frames)
+        return frames
+
+    def _set_pins(self, pins, frames):
+        if self.pins & 0x01 and not pins & 0x01:
+            # 片选下降沿：新的指令开始
+            self.frame = bytearray()
+            self.value = self.bits = 0
+        elif not self.pins & 0x01 and pins & 0x01:
+            # 片选上升沿：指令结束
+            if self.frame is not None:
+                frames.append(bytes(self.frame))
+            self.frame = None
+        elif self.frame is not None and not self.pins & PIN_CLK and pins & PIN_CLK:
+            # CLK 上升沿采样 DIN，LSB First
+            self.value |= (1 if pins & PIN_DOUT else 0) << self.bits
+            self.bits += 1
+            if self.bits == 8:
+                self.frame.append(self.value)
+                self.value = self.bits = 0
+        self.pins = pins
+
+
+class CH341Transport:
+    def __init__(self, dll_name=DEFAULT_DLL_PATH, dev_index=0, lib=None, raw_batch=False):
+        """
+        :param raw_batch: True 时 stream_batch 自行编码 CH341 命令流，把多条指令合并进尽量少的 USB 传输；
+                          False 时逐条调用 CH341StreamSPI4 (与硬件验证过的路径一致)
+        """
+        self.raw_batch = raw_batch
+        if lib is not None:
+            # 直接注入已加载的库对象 (基准测试/调试用)
+            self.lib = lib
+        else:
+            try:
+                # 尝试加载指定路径
+                self.lib = ctypes.windll.LoadLibrary(os.path.abspath(dll_name))
+            except Exception as e:
+                try:
+                    # 尝试加载当前目录
+                    self.lib = ctypes.windll.LoadLibrary("CH341DLLA64.DLL")
+                except:
+                    raise RuntimeError(f"无法加载 DLL，请检查路径: {e}")
+        self.dev_index = dev_index
+
+    def open(self):
+        """打开设备并配置为 SPI 模式"""
+        if self.lib.CH341OpenDevice(self.dev_index) <= 0:
+            return False
+        # 0x80 = SPI Mode, MSB First (虽然我们要发LSB，但通过软件翻转实现)
+        self.lib.CH341SetStream(self.dev_index, 0x80)
+        return True
+
+    def close(self):
+        if self.lib:
+            self.lib.CH341CloseDevice(self.dev_index)
+
+    def stream(self, buf, length):
+        """一次片选传输，收到的数据会覆盖 buf"""
+        # 0x80 = SPI模式, 自动片选
+        return self.lib.CH341StreamSPI4(self.dev_index, 0x80, length, buf)
+
+    def stream_batch(self, commands):
+        """发送多条指令，每条指令独立片选"""
+        if not self.raw_batch:
+            for command in commands:
+                buf = ctypes.create_string_buffer(command.translate(REVERSE_TABLE), len(command))
+                self.stream(buf, len(command))
+            return True
+
+        ok = True
+        for data, readback in build_ch341_batch(commands):
+            wbuf = ctypes.create_string_buffer(data, len(data))
+            if readback:
+                # SPI 数据流每发一个字节都会读回一个字节，必须一并取走
+                rbuf = ctypes.create_string_buffer(readback)
+                rlen = ctypes.c_ulong(readback)
+                step = CH341_PACKET_LENGTH - 1
+                times = (readback + step - 1) // step
+                ok &= bool(self.lib.CH341WriteRead(self.dev_index, len(data), wbuf, step, times,
+                                                   ctypes.byref(rlen), rbuf))
+            else:
+                wlen = ctypes.c_ulong(len(data))
+                ok &= bool(self.lib.CH341WriteData(self.dev_index, wbuf, ctypes.byref(wlen)))
+        return ok
+
+
+class PT6315Emulator:
+    def __init__(self, latency=0.0, raw_batch=False):
+        """
+        :param latency: 每次传输模拟的 USB 往返耗时 (秒)，0 表示不等待
+        :param raw_batch: 与 CH341Transport 的同名参数对应，决定 stream_batch 的传输方式
+        """
+        self.latency = latency
+        self.raw_batch = raw_batch
+        self.lock = threading.Lock()
+        self.is_open = False
+        self.reset()
+
+    def reset(self):
+        """恢复上电状态"""
+        self.display_ram = bytearray(DISPLAY_RAM_SIZE)
+        self.display_mode = 0x00
+        self.fixed_address = False
+        self.address = 0
+        self.display_on = False
+        self.brightness = 0  # 0-7，对应 0x88-0x8F
+        # 统计
+        self.transactions = 0  # 片选周期数 (指令条数)
+        self.usb_transfers = 0
+        self.bytes_on_wire = 0  # USB 上的 CH341 命令流字节数 (两种发送方式口径相同)
+        self.ram_writes = 0
+        self._decoder = CH341StreamDecoder()  # stream_batch 的原始命令流解析器
+
+    def open(self):
+        self.is_open = True
+        return True
+
+    def close(self):
+        self.is_open = False
+
+    def stream(self, buf, length):
+        """接收一次片选内的线上字节，翻转回 LSB First 后按 PT6315 指令解析"""
+        data = bytes(buf[:length]).translate(REVERSE_TABLE)
+        if self.latency:
+            time.sleep(self.latency)
+        with self.lock:
+            self.transactions += 1
+            self.usb_transfers += 1
+            self.bytes_on_wire += ch341_payload_size(length)
+            if data:
+                self._execute(data)
+        return True
+
+    def stream_batch(self, commands):
+        """
+        传输次数跟随 raw_batch，与同样配置的 CH341Transport 一致：
+        False (默认) 时每条指令一次 stream，和硬件上逐条 CH341StreamSPI4 相同，批量不减少传输；
+        True 时先用 build_ch341_batch 编码，再逐个传输解码执行，同时校验了编码本身
+        """
+        if not self.raw_batch:
+            for command in commands:
+                self.stream(command.translate(REVERSE_TABLE), len(command))
+            return True
+
+        transfers = build_ch341_batch(commands)
+        for data, _ in transfers:
+            if self.latency:
+                time.sleep(self.latency)
+            with self.lock:
+                self.usb_transfers += 1
+                self.bytes_on_wire += len(data)
+                for frame in self._decoder.feed(data):
+                    self.transactions += 1
+                    if frame:
+                        self._execute(frame)
+        return True
+
+    def _execute(self, data):
+        cmd = data[0]
+        kind = cmd & 0xC0
+
+        if kind == 0x00:
+            # 显示模式设置 (如 0x06 = 10 Grids)
+            self.display_mode = cmd & 0x0F
+        elif kind == 0x40:
+            # 数据设置：bit2 = 1 固定地址，0 地址自增；bit0-1 = 00 写显存
+            self.fixed_address = bool(cmd & 0x04)
+        elif kind == 0x80:
+            # 显示控制：bit3 开关，bit0-2 亮度
+            self.display_on = bool(cmd & 0x08)
+            self.brightness = cmd & 0x07
+        else:
+            # 地址设置 0xC0 + addr，后续字节为显存数据
+            self.address = cmd & 0x3F
+            for value in data[1:]:
+                if self.address < DISPLAY_RAM_SIZE:
+                    self.display_ram[self.address] = value
+                    self.ram_writes += 1
+                if not self.fixed_address:
+                    self.address += 1
+
+    def grid_bytes(self, grid_id):
+        """读取某个 Grid 的 3 字节显存"""
+        with self.lock:
+            start = grid_id * 3
+            return bytes(self.display_ram[start:start + 3])
+
+    def snapshot(self):
+        """返回当前显示状态的快照，便于比较"""
+        with self.lock:
+            return {
+                "ram": bytes(self.display_ram),
+                "mode": self.display_mode,
+                "display_on": self.display_on,
+                "brightness": self.brightness,
+            }
+
+    def get_stats(self):
+        with self.lock:
+            return {
+                "transactions": self.transactions,
+                "usb_transfers": self.usb_transfers,
+                "bytes_on_wire": self.bytes_on_wire,
+                "ram_writes": self.ram_writes,
+            }
+
+
+def create_transport(name=None, dll_name=DEFAULT_DLL_PATH, dev_index=0, latency=0.0, raw_batch=False):
+    """
+    按名字创建传输后端，未指定时读取环境变量 VFD_TRANSPORT
+    ch341 (默认) / emulator
+    """
+    name = (name or os.environ.get("VFD_TRANSPORT", "ch341")).lower()
+    if name in ("emu", "emulator"):
+        return PT6315Emulator(latency=latency, raw_batch=raw_batch)
+    if name == "ch341":
+        return CH341Transport(dll_name, dev_index=dev_index, raw_batch=raw_batch)
+    raise ValueError(f"未知的传输后端: {name}")
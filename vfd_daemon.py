@@ -0,0 +1,401 @@
+"""
+VFD 常驻进程
+一个进程独占一个 SPIAdapter / VFDScreen / DisplayWriter，频谱、硬件轮播、键盘回显作为显示模式插件，
+运行时切换，或按规则自动调度 (有声音时显示频谱，否则轮播硬件信息)。
+只有当前模式持有自己的资源：音频流、NVML/WMI、键盘钩子都在模式启动时打开、停止时释放，
+对应的依赖库也在第一次启动该模式时才导入。
+
+    python vfd_daemon.py                 自动调度
+    python vfd_daemon.py --mode carousel 固定某个模式
+运行中在控制台输入 spectrum / carousel / keyboard / auto / status / quit 切换。
+"""
+import threading
+import time
+
+from animation import AnimationScheduler, carousel
+from display_writer import DisplayWriter
+from frame_pacer import FramePacer
+from spi_comm import SPIAdapter
+from vfd_driver import DISPLAY_RAM_SIZE, FrameEncoder, VFDScreen
+
+# 自动调度的检查间隔 (秒)
+# 检查 (含音频探测) 和模式切换在单独的调度线程里进行，不占用 AnimationScheduler 线程，
+# 否则探测和停止模式时的 join 会卡住轮播和键盘的闪烁/渐暗定时器
+CHECK_INTERVAL = 2.0
+
+
+class DisplayMode:
+    """显示模式插件：start 时申请资源并开始投递帧，stop 时全部释放"""
+    name = ""
+
+    def start(self, daemon):
+        raise NotImplementedError
+
+    def stop(self):
+        raise NotImplementedError
+
+    def wants_display(self, active):
+        """
+        自动调度用：此刻是否应该显示本模式
+        active 表示本模式是否正在运行 (未运行时不应长期占用资源来判断)
+        """
+        return False
+
+    def get_stats(self):
+        return {}
+
+
+class SpectrumMode(DisplayMode):
+    name = "spectrum"
+
+    def __init__(self, device_index=None, fps=60, min_fps=20, silence_timeout=5.0, probe_interval=10.0,
+                 probe_time=0.3):
+        """
+        :param device_index: 音频设备，默认第一个 WASAPI 内录设备
+        :param silence_timeout: 运行中持续静音多久后让出屏幕
+        :param probe_interval / probe_time: 未运行时多久探测一次是否有声音，每次听多久
+        """
+        self.device_index = device_index
+        self.fps = fps
+        self.min_fps = min_fps
+        self.pacer = None
+        self.silence_timeout = silence_timeout
+        self.probe_interval = probe_interval
+        self.probe_time = probe_time
+        self.audio = None
+        self.stop_signal = threading.Event()
+        self.threads = []
+        self.last_sound = 0.0
+        self.last_probe = float("-inf")
+        self.probe_result = False
+
+    def _open_audio(self):
+        from audio_monitor import AudioProcessor
+
+        audio = AudioProcessor()
+        index = self.device_index
+        if index is None:
+            loopback = [d for d in audio.get_device_list() if d['is_loopback']]
+            if not loopback:
+                audio.terminate()
+                return None, None
+            index = loopback[0]['index']
+        if not audio.open_stream(index, callback=True):
+            audio.terminate()
+            return None, None
+        return audio, index
+
+    def start(self, daemon):
+        from smoothing import BandSmoother
+
+        try:
+            self.audio, _ = self._open_audio()
+            if self.audio is None:
+                raise RuntimeError("没有可用的音频设备")
+            self.smoother = BandSmoother(bands=len(self.audio.bands))
+        except Exception:
+            self._probe_failed()
+            raise
+        self.pacer = FramePacer(fps=self.fps, min_fps=self.min_fps, writer=daemon.writer)
+        self.stop_signal.clear()
+        self.last_sound = time.monotonic()
+        self.threads = [threading.Thread(target=self._analysis, daemon=True),
+                        threading.Thread(target=self._render, args=(daemon,), daemon=True)]
+        for t in self.threads:
+            t.start()
+
+    def stop(self):
+        self.stop_signal.set()
+        for t in self.threads:
+            t.join(timeout=1.0)
+        self.threads = []
+        if self.audio:
+            self.audio.terminate()
+            self.audio = None
+
+    def _analysis(self):
+        while not self.stop_signal.is_set():
+            t0 = time.perf_counter()
+            levels = self.audio.get_audio_frame(quantize=False)
+            self.pacer.record("capture", time.perf_counter() - t0)
+            if any(levels):
+                self.last_sound = time.monotonic()
+            self.smoother.update(levels)
+
+    def _render(self, daemon):
+        pacer = self.pacer
+        while True:
+            pacer.begin()
+            levels, peaks = self.smoother.sample()
+            pacer.mark("sample")
+            daemon.writer.submit(daemon.vfd.encode_spectrum(levels, peaks))
+            pacer.mark("encode")
+            if pacer.wait(self.stop_signal):
+                break
+
+    def get_stats(self):
+        """实际帧率、抖动和各阶段耗时 (见 frame_pacer)"""
+        return self.pacer.get_stats() if self.pacer else {}
+
+    def wants_display(self, active):
+        now = time.monotonic()
+        if active:
+            return now - self.last_sound < self.silence_timeout
+        if now - self.last_probe >= self.probe_interval:
+            self.last_probe = now
+            self.probe_result = self.probe()
+        return self.probe_result
+
+    def _probe_failed(self):
+        """启动失败时作废缓存的探测结果，等下一个探测周期再试，期间自动调度选择其他模式"""
+        self.probe_result = False
+        self.last_probe = time.monotonic()
+
+    def probe(self):
+        """短暂打开音频流听一下是否有声音，随后立即释放"""
+        try:
+            audio, _ = self._open_audio()
+        except Exception as e:
+            print(f"[Daemon] 音频探测失败: {e}")
+            return False
+        if audio is None:
+            return False
+        try:
+            deadline = time.monotonic() + self.probe_time
+            while time.monotonic() < deadline:
+                if any(audio.get_audio_frame(timeout=self.probe_time)):
+                    return True
+            return False
+        finally:
+            audio.terminate()
+
+
+class CarouselMode(DisplayMode):
+    name = "carousel"
+
+    # 轮播序列配置：(显示标签, 数据Key, 单位)
+    SEQUENCE = [
+        ("CT", "CT", "C"),  # CPU Temp
+        ("GT", "GT", "C"),  # GPU Temp
+        ("MU", "M", "%"),  # Memory Usage
+        ("GU", "G", "%"),  # GPU Usage
+        ("CU", "C", "%"),  # CPU Usage
+    ]
+
+    def __init__(self, interval=3.0):
+        self.interval = interval
+        self.monitor = None
+        self.playback = None
+        # Grid 0-6 全部用于文字 (与 硬件信息监测.py 的 CarouselVFDScreen 相同布局)
+        self.encoder = FrameEncoder([0, 1, 2, 3, 4, 5, 6])
+
+    def start(self, daemon):
+        from hardware_monitor import create_monitor
+
+        self.monitor = create_monitor()
+        self.monitor.start_sampler()
+        shows = [(lambda item=item: self._show(daemon, *item)) for item in self.SEQUENCE]
+        self.playback = daemon.scheduler.play(carousel(shows, self.interval))
+
+    def stop(self):
+        if self.playback:
+            self.playback.cancel()
+            self.playback = None
+        if self.monitor:
+            self.monitor.close()
+            self.monitor = None
+
+    def _show(self, daemon, label, key, unit):
+        monitor = self.monitor
+        if monitor is None:
+            return
+        value = monitor.get_all_metrics().get(key, 0)
+        # 标签 2 位 + 数字左对齐 3 位 + 单位 + 留空
+        val_str = str(value).ljust(3)
+        values = (label[0], label[1] if len(label) > 1 else " ", val_str[0], val_str[1], val_str[2], unit, " ")
+        daemon.writer.submit(self.encoder.encode(values))
+
+    def wants_display(self, active):
+        return True  # 兜底模式
+
+
+class KeyboardMode(DisplayMode):
+    """键盘回显：只能手动切换进入，按 ESC 回到自动调度"""
+    name = "keyboard"
+
+    def __init__(self):
+        self.controller = None
+
+    def start(self, daemon):
+        from 键盘监测 import QuarterDimController
+
+        self.controller = QuarterDimController(
+            writer=daemon.writer, scheduler=daemon.scheduler,
+            on_exit=daemon.set_auto)  # 只唤醒调度线程，不在键盘钩子线程里停止本模式
+        self.controller.start()
+
+    def stop(self):
+        if self.controller:
+            self.controller.stop()
+            self.controller = None
+
+
+class VFDDaemon:
+    def __init__(self, spi=None, modes=None, auto_order=("spectrum", "carousel")):
+        """
+        :param spi: 已打开的 SPIAdapter，不传时自己创建并打开
+        :param modes: DisplayMode 列表，默认频谱 / 轮播 / 键盘
+        :param auto_order: 自动调度时按顺序询问 wants_display，第一个愿意显示的模式胜出
+        """
+        if spi is None:
+            spi = SPIAdapter()
+            if not spi.open():
+                raise RuntimeError("无法打开 CH341 设备")
+        self.spi = spi
+        self.vfd = VFDScreen(spi)
+        self.vfd.init_device()
+        self.writer = DisplayWriter(self.vfd, fps=60)
+        self.scheduler = AnimationScheduler()
+
+        self.modes = {}
+        for mode in modes if modes is not None else (SpectrumMode(), CarouselMode(), KeyboardMode()):
+            self.register(mode)
+        self.auto_order = [name for name in auto_order if name in self.modes]
+        self.auto = True
+        self.active = None
+        self._lock = threading.RLock()
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._supervisor = None
+
+    def register(self, mode):
+        self.modes[mode.name] = mode
+
+    def start(self):
+        self.writer.start()
+        self.scheduler.start()
+        self._stopping.clear()
+        self._supervisor = threading.Thread(target=self._supervise, name="vfd-auto", daemon=True)
+        self._supervisor.start()
+
+    def stop(self):
+        self._stopping.set()
+        self._wake.set()
+        if self._supervisor:
+            # 可能正在探测音频或停止旧模式
+            self._supervisor.join(timeout=5.0)
+            self._supervisor = None
+        with self._lock:
+            self._stop_active()
+        self.scheduler.stop()
+        self.writer.submit(bytes(DISPLAY_RAM_SIZE))
+        self.writer.flush()
+        self.writer.stop()
+        self.spi.close()
+
+    def switch(self, name, manual=True):
+        """切换到指定模式；manual=True 时关闭自动调度"""
+        if name not in self.modes:
+            raise ValueError(f"未知的显示模式: {name}")
+        with self._lock:
+            if manual:
+                self.auto = False
+            if self.active is self.modes[name]:
+                return True
+            self._stop_active()
+            # 新模式从干净的屏幕和最高亮度开始
+            self.writer.submit_control([0x8F])
+            self.writer.submit(bytes(DISPLAY_RAM_SIZE))
+            mode = self.modes[name]
+            try:
+                mode.start(self)
+            except Exception as e:
+                print(f"[Daemon] 启动 {name} 失败: {e}")
+                try:
+                    mode.stop()
+                except Exception:
+                    pass
+                return False
+            self.active = mode
+            print(f"[Daemon] 当前模式: {name}")
+            return True
+
+    def set_auto(self):
+        """恢复自动调度，立即唤醒调度线程检查一次 (可以在任何线程调用，不阻塞)"""
+        with self._lock:
+            self.auto = True
+        self._wake.set()
+
+    def _stop_active(self):
+        if self.active:
+            try:
+                self.active.stop()
+            except Exception as e:
+                print(f"[Daemon] 停止 {self.active.name} 失败: {e}")
+            self.active = None
+            self.writer.flush()
+
+    def _supervise(self):
+        """调度线程：每 CHECK_INTERVAL 或被 set_auto 唤醒时检查一次"""
+        while not self._stopping.is_set():
+            self._wake.clear()
+            try:
+                self._auto_check()
+            except Exception as e:
+                print(f"[Daemon] 自动调度失败: {e}")
+            self._wake.wait(CHECK_INTERVAL)
+
+    def _auto_check(self):
+        if not self.auto:
+            return
+        # 探测可能要打开音频流、耗时数百毫秒，不持有锁，控制台的手动切换不必等它
+        active = self.active
+        for name in self.auto_order:
+            mode = self.modes[name]
+            if mode.wants_display(mode is active):
+                break
+        else:
+            return
+        with self._lock:
+            # 探测期间被手动切换或关闭了自动调度，本次结论作废
+            if self.auto and self.active is active and mode is not active and not self._stopping.is_set():
+                self.switch(name, manual=False)
+
+    def status(self):
+        return {
+            "mode": self.active.name if self.active else None,
+            "auto": self.auto,
+            "writer": self.writer.get_stats(),
+            "mode_stats": self.active.get_stats() if self.active else {},
+            "screen": self.vfd.get_stats(),
+        }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="VFD 常驻进程")
+    parser.add_argument("--mode", default=None, help="固定模式 (spectrum / carousel / keyboard)，默认自动调度")
+    args = parser.parse_args()
+
+    daemon = VFDDaemon()
+    daemon.start()
+    if args.mode:
+        daemon.switch(args.mode)
+
+    try:
+        while True:
+            cmd = input().strip().lower()
+            if cmd in ("quit", "exit"):
+                break
+            elif cmd == "auto":
+                daemon.set_auto()
+            elif cmd == "status":
+                print(daemon.status())
+            elif cmd in daemon.modes:
+                daemon.switch(cmd)
+            elif cmd:
+                print(f"可用命令: {', '.join(daemon.modes)}, auto, status, quit")
+    except (KeyboardInterrupt, EOFError):
+        pass
+    daemon.stop()
@@ -1,3 +1,12 @@
+import os
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import latency
+from font_compiler import DEFAULT_STYLE, CompiledFont, bar_levels, load_glyph_pack
+from spi_comm import Transaction
+
 
 # ================= 字库定义 =================
 FONTS = {
@@ -25,15 +34,173 @@ SEGMENTS_ORDER = [
     0x080000, 0x100000, 0x200000, 0x400000, 0x800000  # 6-10 格
 ]
 
-SPECTRUM_FONTS = {0: 0x000000}
-current_code = 0x000000
-for i, code in enumerate(SEGMENTS_ORDER):
-    current_code |= code
-    SPECTRUM_FONTS[i + 1] = current_code
+SPECTRUM_FONTS = dict(enumerate(bar_levels(SEGMENTS_ORDER)))
+# 峰值点：第 i 级只点亮第 i 格
+PEAK_STYLE = "peak"
+PEAK_FONTS = [0x000000] + SEGMENTS_ORDER
+
+# 字形定义：字符 -> 24 位字形，频谱样式 -> 每一级的字形 (install_glyph_pack 会往里合并)
+_CHAR_GLYPHS = {k: v for k, v in FONTS.items() if isinstance(k, str)}
+_STYLE_GLYPHS = {DEFAULT_STYLE: list(SPECTRUM_FONTS.values()), PEAK_STYLE: PEAK_FONTS}
 
 # 将频谱字库合并入主字库 (Key为int类型，不会与Char冲突)
 FONTS.update(SPECTRUM_FONTS)
 
+# 单个查询用的 3 字节字形表：小写字母直接映射到大写字形，查表时不再调用 upper()
+GLYPH_BYTES = {}
+
+# 条形 + 峰值点的组合字形：SPECTRUM_PEAK_BYTES[条形等级][峰值等级]
+SPECTRUM_PEAK_BYTES = []
+# 频谱等级表至少覆盖 0-10 (BandSmoother / SpectrumEngine 默认的 max_level)
+SPECTRUM_LEVELS = len(SEGMENTS_ORDER) + 1
+
+
+def _pad_levels(codes):
+    """
+    字形包可能把 "bars" / "peak" 换成更少的级数：高出的等级重复最高一级 (与 CompiledFont.encode_levels 的截断相同)，
+    在建表时补齐，encode_spectrum 的热路径仍然是直接查表
+    """
+    codes = list(codes) or [0]
+    return codes + [codes[-1]] * (SPECTRUM_LEVELS - len(codes))
+
+
+def _rebuild_glyph_bytes():
+    """纯 Python 构建 (不依赖 numpy)，与 CompiledFont 的大小写折叠规则一致"""
+    GLYPH_BYTES.clear()
+    for char, code in _CHAR_GLYPHS.items():
+        GLYPH_BYTES[char] = code.to_bytes(3, 'big')
+    for char in list(_CHAR_GLYPHS):
+        lower = char.lower()
+        if lower != char and len(lower) == 1:
+            GLYPH_BYTES.setdefault(lower, GLYPH_BYTES[char])
+    bars, peaks = _pad_levels(_STYLE_GLYPHS[DEFAULT_STYLE]), _pad_levels(_STYLE_GLYPHS[PEAK_STYLE])
+    GLYPH_BYTES.update((level, code.to_bytes(3, 'big')) for level, code in enumerate(bars))
+    SPECTRUM_PEAK_BYTES[:] = [[(bar | peak).to_bytes(3, 'big') for peak in peaks] for bar in bars]
+
+
+_rebuild_glyph_bytes()
+
+# 稠密字形表 (numpy) 在第一次整串编码时才编译，见 get_font
+_font = None
+
+
+def get_font():
+    """编译好的 CompiledFont，用于整串文字的向量化编码"""
+    global _font
+    if _font is None:
+        _font = CompiledFont(_CHAR_GLYPHS, _STYLE_GLYPHS)
+    return _font
+
+
+def __getattr__(name):
+    # vfd_driver.FONT 保持可用，但只在被访问时才编译
+    if name == "FONT":
+        return get_font()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+BLANK_GLYPH = bytes(3)
+
+
+def glyph_bytes(char_or_level):
+    """获取单个字符或频谱等级的 3 字节字形 (bytes)"""
+    glyph = GLYPH_BYTES.get(char_or_level)
+    if glyph is not None:
+        return glyph
+    if isinstance(char_or_level, (bytes, bytearray)) and len(char_or_level) == 3:
+        # 直接给出的原始像素数据 (如光标 Grid)
+        return bytes(char_or_level)
+    if isinstance(char_or_level, str):
+        return GLYPH_BYTES.get(char_or_level.upper(), BLANK_GLYPH)
+    return BLANK_GLYPH
+
+
+def install_glyph_pack(pack):
+    """
+    把字形包 (文件路径或 load_glyph_pack 的结果) 合并进全局字库
+    已有 FrameEncoder 的 LRU 缓存里的旧帧不会更新，应在创建屏幕之前加载
+    """
+    if isinstance(pack, str):
+        pack = load_glyph_pack(pack)
+    _CHAR_GLYPHS.update(pack["glyphs"])
+    _STYLE_GLYPHS.update(pack["styles"])
+    if _font is not None:
+        _font.add_pack(pack)
+    _rebuild_glyph_bytes()
+    return pack
+
+
+# 环境变量 VFD_GLYPH_PACKS：启动时加载的字形包路径 (多个用路径分隔符隔开)
+for _path in filter(None, os.environ.get("VFD_GLYPH_PACKS", "").split(os.pathsep)):
+    try:
+        install_glyph_pack(_path)
+    except (OSError, ValueError) as e:
+        print(f"[Font] 字形包加载失败: {e}")
+
+
+class FrameEncoder:
+    """
+    预编译的帧编码器：把 Grid 布局和字形一次性编译好，
+    一帧显存数据只需一次 bytes join，并用有界 LRU 缓存已经编码过的帧
+    """
+
+    def __init__(self, grid_order, fill=None, grid_count=10, cache_size=4096):
+        """
+        :param grid_order: 第 i 个显示值写到哪个 Grid，如 [0, 1, 2, 3, 4, 5] 或 [5, 4, 3, 2, 1, 0]
+        :param fill: {grid_id: 3 字节} 常亮/固定内容的 Grid，其余 Grid 全黑
+        :param cache_size: LRU 缓存的帧数上限
+        """
+        self.grid_order = list(grid_order)
+        self.grid_count = grid_count
+        self.cache_size = cache_size
+        self._template = [BLANK_GLYPH] * grid_count
+        for grid_id, data in (fill or {}).items():
+            self._template[grid_id] = bytes(data)
+        self._cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def _build(self, values):
+        parts = self._template[:]
+        for grid_id, value in zip(self.grid_order, values):
+            parts[grid_id] = glyph_bytes(value)
+        return b''.join(parts)
+
+    def encode(self, values):
+        """
+        values: tuple，按 grid_order 顺序的字符/频谱等级/原始 3 字节
+        返回从显存地址 0x00 开始的 grid_count * 3 字节
+        """
+        cache = self._cache
+        frame = cache.get(values)
+        if frame is not None:
+            cache.move_to_end(values)
+            self.hits += 1
+            return frame
+
+        self.misses += 1
+        frame = self._build(values)
+        cache[values] = frame
+        if len(cache) > self.cache_size:
+            cache.popitem(last=False)
+        return frame
+
+    def encode_text(self, text):
+        """整串文字一次查表编码 (不经过 LRU)，第 i 个字符写到 grid_order[i]"""
+        return get_font().render(str(text), self.grid_order, b''.join(self._template))
+
+    def get_stats(self):
+        return {"hits": self.hits, "misses": self.misses, "cached": len(self._cache)}
+
+
+# PT6315 显存大小 (0x00-0x2F)
+DISPLAY_RAM_SIZE = 48
+
+# 差量刷新的代价模型：一次 USB 传输的固定开销折算成多少字节
+# CH341 每次 StreamSPI4 都是一次完整的 USB 往返，远比多发几个字节贵，
+# 所以两段改动之间的空隙小于这个值时，合并成一次地址自增写入
+TRANSACTION_COST = 16
+
 
 class VFDScreen:
     def __init__(self, spi_adapter):
@@ -43,28 +210,159 @@ class VFDScreen:
         self.grid_special = 6
         self.grids_text = [0, 1, 2, 3, 4, 5]
 
+        # 影子显存：记录 PT6315 当前的显存内容，只发送变化的部分
+        self.shadow = bytearray(DISPLAY_RAM_SIZE)
+        self.shadow_valid = False  # 上电/初始化后显存内容未知，第一帧必须整帧发送
+
+        # 帧编码器 (见 get_encoder)
+        self._encoder = None
+        self._encoder_layout = None
+
+        # 统计
+        self.frames_total = 0
+        self.frames_skipped = 0
+        self.bytes_sent = 0
+        self.bytes_saved = 0
+        self.transactions = 0
+
     def init_device(self):
         """初始化 PT6315"""
-        self.spi.send_data([0x06])  # Mode: 10 Grids
-        self.spi.send_data([0x40])  # Data: Write, Inc Addr
-        self.spi.send_data([0x8F])  # Display ON, Max Bright
+        with self.batch() as tx:
+            tx.send_data([0x06])  # Mode: 10 Grids
+            tx.send_data([0x40])  # Data: Write, Inc Addr
+            tx.send_data([0x8F])  # Display ON, Max Bright
+        self.shadow_valid = False
+
+    @contextmanager
+    def batch(self, spi=None):
+        """
+        批量发送上下文：返回一个局部的 Transaction，对它 send_data 的指令先收集起来，
+        退出时合并成尽量少的 USB 传输，每条指令仍然各自片选
+        不会改动 self.spi：别的线程此时直接调用 vfd.spi.send_data 照常单独发送，不会被卷进这一批
+        :param spi: 嵌套时传入外层的 Transaction，由最外层负责发送
+        """
+        spi = self.spi if spi is None else spi
+        if isinstance(spi, Transaction) or not hasattr(spi, "transaction"):
+            yield spi
+            return
+        tx = spi.transaction()
+        yield tx
+        tx.flush()
 
     def get_char_bytes(self, char_or_level):
         """获取单个字符或频谱等级的3字节数据"""
-        if isinstance(char_or_level, int):
-            # 处理频谱等级 (0-10)
-            val = FONTS.get(char_or_level, 0x00)
-        else:
-            # 处理文字
-            key = char_or_level.upper() if isinstance(char_or_level, str) else ' '
-            val = FONTS.get(key, 0x00)
+        return list(glyph_bytes(char_or_level))
 
-        return [(val >> 16) & 0xFF, (val >> 8) & 0xFF, val & 0xFF]
+    def get_encoder(self):
+        """
+        按当前的 grids_text / grid_special 编译帧编码器
+        子类可能在 __init__ 之后改写 Grid 布局，所以第一次使用时才编译
+        """
+        layout = (tuple(self.grids_text), self.grid_special)
+        if self._encoder is None or self._encoder_layout != layout:
+            fill = {}
+            if self.grid_special is not None and self.grid_special not in self.grids_text:
+                # 特殊符号屏常亮
+                fill[self.grid_special] = b'\xff\xff\xff'
+            self._encoder = FrameEncoder(self.grids_text, fill)
+            self._encoder_layout = layout
+        return self._encoder
 
     def write_grid_fixed(self, grid_id, char_bytes):
         """[调试用] 单独写一个 Grid"""
         addr = 0xC0 + (grid_id * 3)
         self.spi.send_data([addr] + char_bytes)
+        self.shadow[grid_id * 3:grid_id * 3 + len(char_bytes)] = bytes(char_bytes)
+
+    def invalidate(self):
+        """绕过 write_frame 直接改写了显存后调用，下一帧会整片重发"""
+        self.shadow_valid = False
+
+    def _diff_ranges(self, frame, start):
+        """
+        对比影子显存，返回需要发送的 [lo, hi) 地址区间列表
+        相邻改动之间的空隙不超过 TRANSACTION_COST 时合并，减少传输次数
+        """
+        shadow = self.shadow
+        ranges = []
+        lo = hi = -1
+        for i, value in enumerate(frame):
+            addr = start + i
+            if shadow[addr] == value:
+                continue
+            if lo < 0:
+                lo = addr
+            elif addr - hi > TRANSACTION_COST:
+                ranges.append((lo, hi))
+                lo = addr
+            hi = addr + 1
+        if lo >= 0:
+            ranges.append((lo, hi))
+        return ranges
+
+    def write_frame(self, frame, start=0, force=False, spi=None):
+        """
+        写入一帧显存数据 (不含 0xC0 地址命令)，只发送与影子显存不同的部分
+        frame: bytes，从显存地址 start 开始的内容
+        force: True 时忽略影子显存，整帧发送
+        spi: 发送目标，默认 self.spi；传入 batch() 得到的 Transaction 时并入该批次
+        返回发出的字节数，与当前显示相同而整帧跳过时为 0
+
+        PT6315 在地址自增模式下单字节写入 [addr, data] 与固定地址模式同样是 2 字节，
+        而切换到固定地址模式 (0x44) 再切回来还要多两次传输，所以这里始终使用地址自增写入。
+        """
+        frame = bytes(frame)
+        spi = self.spi if spi is None else spi
+        end = start + len(frame)
+        full_cost = 1 + len(frame)
+        self.frames_total += 1
+
+        if not self.shadow_valid:
+            # 显存内容未知：连同未使用的地址一起整片写一次，之后影子显存与芯片完全一致
+            self.shadow[start:end] = frame
+            spi.send_data(bytes((0xC0,)) + bytes(self.shadow))
+            self.transactions += 1
+            self.bytes_sent += 1 + DISPLAY_RAM_SIZE
+            self.shadow_valid = True
+            return 1 + DISPLAY_RAM_SIZE
+
+        if force:
+            ranges = [(start, end)]
+        elif self.shadow[start:end] == frame:
+            # 与当前显示完全相同，整帧跳过
+            self.frames_skipped += 1
+            self.bytes_saved += full_cost
+            return 0
+        else:
+            ranges = self._diff_ranges(frame, start)
+
+        sent = 0
+        if len(ranges) > 1:
+            # 多段改动合并成一批发送
+            with self.batch(spi) as tx:
+                for lo, hi in ranges:
+                    tx.send_data(bytes((0xC0 + lo,)) + frame[lo - start:hi - start])
+                    sent += 1 + hi - lo
+        else:
+            lo, hi = ranges[0]
+            spi.send_data(bytes((0xC0 + lo,)) + frame[lo - start:hi - start])
+            sent += 1 + hi - lo
+        self.transactions += len(ranges)
+        self.bytes_sent += sent
+        self.bytes_saved += max(0, full_cost - sent)
+
+        self.shadow[start:end] = frame
+        return sent
+
+    def get_stats(self):
+        """差量刷新统计"""
+        return {
+            "frames_total": self.frames_total,
+            "frames_skipped": self.frames_skipped,
+            "bytes_sent": self.bytes_sent,
+            "bytes_saved": self.bytes_saved,
+            "transactions": self.transactions,
+        }
 
     def display_spectrum(self, levels):
         """
@@ -72,27 +370,31 @@ class VFDScreen:
         一次性发送所有 Grid 的数据以保证帧率
         levels: list, 包含6个整数 (0-10)
         """
-        payload = [0xC0]  # 起始地址
-
-        # 遍历所有逻辑 Grid (0-9)
-        for grid_id in range(10):
-            if grid_id in self.grids_text:
-                # 找到当前 Grid 对应的是第几列频谱
-                idx = self.grids_text.index(grid_id)
-                if idx < len(levels):
-                    payload.extend(self.get_char_bytes(levels[idx]))
-                else:
-                    payload.extend([0, 0, 0])
-            elif grid_id == self.grid_special:
-                # 特殊符号屏常亮
-                payload.extend([0xFF, 0xFF, 0xFF])
-            else:
-                # 其他未使用 Grid 全黑
-                payload.extend([0, 0, 0])
+        self.write_frame(self.encode_spectrum(levels))
+
+    def encode_spectrum(self, levels, peaks=None):
+        """
+        只编码不发送，返回频谱帧的显存数据 (交给 DisplayWriter 等异步发送)
+        peaks: 可选的峰值点等级 (见 smoothing.BandSmoother)，0 表示不显示
+        """
+        # 只读一次开关：两次读取之间被打开的话，t0 还没有赋值
+        timing = latency.enabled
+        if timing:
+            t0 = time.perf_counter()
+        n = len(self.grids_text)
+        if peaks is None:
+            values = tuple(levels[:n])
+        else:
+            values = tuple(SPECTRUM_PEAK_BYTES[lv][pk] for lv, pk in zip(levels[:n], peaks))
+        frame = self.get_encoder().encode(values)
+        if timing:
+            latency.record(latency.ENCODE, time.perf_counter() - t0)
+        return frame
 
-        self.spi.send_data(payload)
+    def display_text(self, text):
+        """在文本 Grid 上显示一串文字 (超出的截断，不足的留空)"""
+        self.write_frame(self.get_encoder().encode_text(text))
 
     def clear(self):
         """清屏"""
-        payload = [0xC0] + [0x00] * 48
-        self.spi.send_data(payload)
\ No newline at end of file
+        self.write_frame(bytes(DISPLAY_RAM_SIZE))
\ No newline at end of file
@@ -0,0 +1,227 @@
+"""
+VFD 实时预览 (Tk Canvas)
+按 48 字节显存画出 10 个 Grid、每个 Grid 24 位的显示内容，数据来源二选一：
+    VFDScreen.shadow           影子显存，真实设备和模拟器都可用 (VFDPreview.for_screen)
+    PT6315Emulator.snapshot()  模拟器解析出的显存，同时反映亮度和显示开关 (VFDPreview.for_emulator)
+每个段在构造时建好一个 Canvas 图元，刷新时只比较两次显存的差异，对变化的位做 itemconfig；
+刷新由 Tk 的 after 定时驱动，频率上限 fps，显存没变化时不触碰 Canvas，窗口不可见时跳过，
+复制显存只是一次 bytes() (持有 GIL 的时间是微秒级)，不会和采集/发送线程抢时间。
+
+段的几何位置是根据 vfd_driver.FONTS 的字形反推的米字形布局 (与实物可能略有出入)：
+    16 ─17─ 18      16/18/0/3 四角、2 底部中点、9 中心是小方块，其余是笔画
+    │ \\ │ / │       19 左上竖  20 左上斜  21 上中竖  22 右上斜  23 右上竖
+    ─8─ 9 ─10─      8/10 中横左右半段
+    │ / │ \\ │       11 左下竖  12 左下斜  13 下中竖  14 右下斜  15 右下竖
+    0 ─1─ 2 ─1─ 3   1 是整条底横；位 3 单独点亮时就是 '.'
+位 4-7 字库没有用到，画成字符下方的四个小点，便于看出是否被误写。
+"""
+import math
+import time
+import tkinter as tk
+
+from vfd_driver import DISPLAY_RAM_SIZE
+
+# 从左到右的物理顺序：Grid 6 (特殊符号) 是第 1 屏，Grid 0-5 是第 2-7 屏
+PHYSICAL_ORDER = (6, 0, 1, 2, 3, 4, 5, 7, 8, 9)
+GRID_BYTES = 3
+
+# 笔画：位 -> 单位格 (x 0..1, y 0..2) 内的线段端点
+STROKES = {
+    17: (0, 0, 1, 0),
+    19: (0, 0, 0, 1), 20: (0, 0, 0.5, 1), 21: (0.5, 0, 0.5, 1), 22: (1, 0, 0.5, 1), 23: (1, 0, 1, 1),
+    8: (0, 1, 0.5, 1), 10: (0.5, 1, 1, 1),
+    11: (0, 1, 0, 2), 12: (0.5, 1, 0, 2), 13: (0.5, 1, 0.5, 2), 14: (0.5, 1, 1, 2), 15: (1, 1, 1, 2),
+    1: (0, 2, 1, 2),
+}
+# 节点：位 -> 中心点
+NODES = {16: (0, 0), 18: (1, 0), 9: (0.5, 1), 0: (0, 2), 2: (0.5, 2), 3: (1, 2)}
+# 未使用的位：字符下方的小点 (x, y)
+SPARE = {4: (0.125, 2.4), 5: (0.375, 2.4), 6: (0.625, 2.4), 7: (0.875, 2.4)}
+
+BACKGROUND = "#050a08"
+LIT = (0x6d, 0xff, 0xd2)
+DIM = "#13261f"
+
+
+def _scale(rgb, factor):
+    return "#%02x%02x%02x" % tuple(int(c * factor) for c in rgb)
+
+
+def _bit_items(grid):
+    """Grid 的 3 个字节 -> 每字节 8 位，字形码大端存放：字节 0 是位 16-23"""
+    return [(grid * GRID_BYTES + (2 - b // 8), b % 8, b) for b in range(24)]
+
+
+class VFDPreview(tk.Canvas):
+    def __init__(self, master, source, fps=20, order=PHYSICAL_ORDER, cell=(22, 20), gap=10, **kwargs):
+        """
+        :param source: 无参可调用对象，返回 48 字节显存 (bytes / bytearray)，
+                       或 PT6315Emulator.snapshot() 格式的 dict (带 display_on / brightness)
+        :param fps: 刷新频率上限
+        :param order: 从左到右依次画哪些 Grid
+        :param cell: 字符的 (宽, 半高) 像素
+        """
+        self.source = source
+        self.interval_ms = max(1, int(1000 / fps))
+        self.order = tuple(order)
+        w, h = cell
+        pad = 6
+        width = pad * 2 + len(self.order) * (w + gap)
+        height = pad * 2 + int(h * 2.6)
+        kwargs.setdefault("bg", BACKGROUND)
+        kwargs.setdefault("highlightthickness", 0)
+        super().__init__(master, width=width, height=height, **kwargs)
+
+        # (显存地址, 位) -> 图元 id
+        self._items = [[None] * 8 for _ in range(DISPLAY_RAM_SIZE)]
+        thick = max(2, w // 7)
+        for col, grid in enumerate(self.order):
+            x0 = pad + col * (w + gap)
+            y0 = pad
+            for addr, bit, code_bit in _bit_items(grid):
+                if code_bit in STROKES:
+                    ax, ay, bx, by = STROKES[code_bit]
+                    ax, ay, bx, by = x0 + ax * w, y0 + ay * h, x0 + bx * w, y0 + by * h
+                    # 两端各缩进约一个线宽，相邻笔画和节点之间留出缝隙
+                    length = math.hypot(bx - ax, by - ay)
+                    k = min(0.3, (thick + 1) / length)
+                    dx, dy = (bx - ax) * k, (by - ay) * k
+                    item = self.create_line(ax + dx, ay + dy, bx - dx, by - dy,
+                                            width=thick, capstyle=tk.ROUND, fill=DIM)
+                else:
+                    cx, cy = NODES.get(code_bit) or SPARE[code_bit]
+                    r = thick * (0.7 if code_bit in NODES else 0.4)
+                    cx, cy = x0 + cx * w, y0 + cy * h
+                    item = self.create_rectangle(cx - r, cy - r, cx + r, cy + r, width=0, fill=DIM)
+                self._items[addr][bit] = item
+
+        self._ram = bytes(DISPLAY_RAM_SIZE)
+        self._lit = _scale(LIT, 1.0)
+        self._state = (True, 7)
+        self._job = None
+
+        # 统计
+        self.polls = 0
+        self.redraws = 0
+        self.segments_changed = 0
+        self.draw_time = 0.0
+
+    @classmethod
+    def for_screen(cls, master, vfd, **kwargs):
+        """预览 VFDScreen 的影子显存 (写入线程改写 shadow，这里只在 Tk 线程里整体复制)"""
+        return cls(master, lambda: bytes(vfd.shadow), **kwargs)
+
+    @classmethod
+    def for_emulator(cls, master, emulator, **kwargs):
+        return cls(master, emulator.snapshot, **kwargs)
+
+    def start(self):
+        if self._job is None:
+            self._tick()
+
+    def stop(self):
+        if self._job is not None:
+            self.after_cancel(self._job)
+            self._job = None
+
+    def destroy(self):
+        self.stop()
+        super().destroy()
+
+    def _tick(self):
+        self._job = self.after(self.interval_ms, self._tick)
+        if self.winfo_viewable():
+            self.refresh()
+
+    def refresh(self):
+        """取一次显存，只重画变化的段；返回改动的段数"""
+        self.polls += 1
+        data = self.source()
+        if isinstance(data, dict):
+            state = (data["display_on"], data["brightness"])
+            ram = data["ram"]
+        else:
+            state, ram = self._state, bytes(data)
+
+        old = self._ram
+        if state != self._state:
+            # 亮度/开关变化影响所有点亮的段，整屏重画
+            self._state = state
+            on, brightness = state
+            self._lit = _scale(LIT, 0.45 + 0.55 * brightness / 7) if on else DIM
+            old = bytes(b ^ 0xFF for b in ram)
+        if ram == old:
+            return 0
+
+        t0 = time.perf_counter()
+        changed = 0
+        items, lit = self._items, self._lit
+        for addr in range(DISPLAY_RAM_SIZE):
+            diff = ram[addr] ^ old[addr]
+            while diff:
+                bit = (diff & -diff).bit_length() - 1
+                diff &= diff - 1
+                item = items[addr][bit]
+                if item is not None:
+                    self.itemconfigure(item, fill=lit if ram[addr] >> bit & 1 else DIM)
+                    changed += 1
+        self._ram = ram
+        self.redraws += 1
+        self.segments_changed += changed
+        self.draw_time += time.perf_counter() - t0
+        return changed
+
+    def get_stats(self):
+        return {
+            "polls": self.polls,
+            "redraws": self.redraws,
+            "segments_changed": self.segments_changed,
+            "avg_draw_ms": self.draw_time * 1000 / self.redraws if self.redraws else 0.0,
+        }
+
+
+# ==========================================
+# 👇 测试代码：模拟器 + 60fps 频谱动画，预览 20fps 👇
+# ==========================================
+if __name__ == "__main__":
+    import threading
+
+    from spi_comm import SPIAdapter
+    from transport import PT6315Emulator
+    from vfd_driver import VFDScreen
+
+    emulator = PT6315Emulator()
+    spi = SPIAdapter(transport=emulator)
+    spi.open()
+    vfd = VFDScreen(spi)
+    vfd.init_device()
+    stop_event = threading.Event()
+
+    def animate():
+        vfd.display_text("VFD OK")
+        stop_event.wait(1.0)
+        t0 = time.perf_counter()
+        while not stop_event.wait(1 / 60):
+            t = time.perf_counter() - t0
+            levels = [int(5 + 5 * math.sin(t * 3 + i)) for i in range(6)]
+            vfd.write_frame(vfd.encode_spectrum(levels, [min(10, lv + 1) for lv in levels]))
+
+    root = tk.Tk()
+    root.title("VFD 预览")
+    preview = VFDPreview.for_emulator(root, emulator, fps=20)
+    preview.pack(padx=10, pady=10)
+    label = tk.Label(root, text="")
+    label.pack()
+
+    def show_stats():
+        s = preview.get_stats()
+        label.config(text=f"刷新 {s['redraws']}/{s['polls']}  平均 {s['avg_draw_ms']:.2f} ms  "
+                          f"改动 {s['segments_changed']} 段")
+        root.after(1000, show_stats)
+
+    preview.start()
+    show_stats()
+    threading.Thread(target=animate, daemon=True).start()
+    root.mainloop()
+    stop_event.set()
+    spi.close()
@@ -3,19 +3,31 @@ from tkinter import ttk
 import threading
 import time
 from spi_comm import SPIAdapter
-from vfd_driver import VFDScreen
+from vfd_driver import DISPLAY_RAM_SIZE, VFDScreen
+from display_writer import DisplayWriter
 from audio_monitor import AudioProcessor
+from smoothing import BandSmoother
+from frame_pacer import FramePacer
+from vfd_preview import VFDPreview
+
+# 显示帧率：与 FFT 帧率无关，两次 FFT 之间由平滑器插值
+DISPLAY_FPS = 60
+# 传输跟不上时最多降到的帧率
+MIN_FPS = 20
+# 界面预览的刷新上限：只给人看，远低于显示帧率，不和采集/发送线程抢 GIL
+PREVIEW_FPS = 15
 
 
 class VFDControllerApp:
     def __init__(self, root):
         self.root = root
         self.root.title("VFD 频谱控制器")
-        self.root.geometry("400x380")
+        self.root.geometry("400x530")
 
         # 运行控制
         self.is_running = False
         self.stop_signal = threading.Event()
+        self.worker_failed = threading.Event()  # 工作线程启动采集失败，由 update_stats 在界面线程里处理
         self.worker_thread = None
 
         # 初始化模块
@@ -23,11 +35,25 @@ class VFDControllerApp:
         self.spi.open()
         self.vfd = VFDScreen(self.spi)
         self.vfd.init_device()
+        # 写入线程独占 SPI，采集线程只投递帧，不等待 USB
+        self.writer = DisplayWriter(self.vfd, fps=DISPLAY_FPS)
+        self.writer.start()
         self.audio = AudioProcessor()
+        # 条形上升快、下落慢，顶部带下落的峰值点
+        self.smoother = BandSmoother(bands=len(self.audio.bands))
+        self.pacer = FramePacer(fps=DISPLAY_FPS, min_fps=MIN_FPS, writer=self.writer)
+        self.render_thread = None
+        # 独立进程分析时的 AnalysisProcess (见 process_worker)
+        self.analysis = None
 
         self.create_widgets()
 
     def create_widgets(self):
+        # --- 屏幕预览：画出影子显存，远程/无屏 (VFD_TRANSPORT=emulator) 时也能对着它调参 ---
+        self.preview = VFDPreview.for_screen(self.root, self.vfd, fps=PREVIEW_FPS)
+        self.preview.pack(padx=10, pady=(10, 0))
+        self.preview.start()
+
         # --- 声音源选择部分保持不变 ---
         dev_frame = ttk.LabelFrame(self.root, text="声音源选择 (监听停止时可修改)")
         dev_frame.pack(padx=10, pady=10, fill="x")
@@ -39,6 +65,11 @@ class VFDControllerApp:
         if self.dev_map: self.combo.current(0)
         self.combo.pack(padx=10, pady=10, fill="x")
 
+        # 采集和 FFT 放到子进程，界面操作不再拖慢频谱
+        self.use_process = tk.BooleanVar(value=False)
+        self.process_check = ttk.Checkbutton(dev_frame, text="独立进程分析", variable=self.use_process)
+        self.process_check.pack(anchor="w", padx=10, pady=(0, 10))
+
         # --- 参数调节部分：加入了 Label 文字标明 ---
         param_frame = ttk.LabelFrame(self.root, text="实时参数设置")
         param_frame.pack(padx=10, pady=5, fill="x")
@@ -57,22 +88,101 @@ class VFDControllerApp:
         self.btn = ttk.Button(self.root, text="启动监听", command=self.toggle)
         self.btn.pack(pady=20)
 
+        # 实际帧率 / 抖动，用于按机器调整 DISPLAY_FPS
+        self.stats_label = ttk.Label(self.root, text="")
+        self.stats_label.pack()
+        self.update_stats()
+
+    def update_stats(self):
+        if self.worker_failed.is_set():
+            self.worker_failed.clear()
+            self.on_worker_failed()
+        if self.is_running:
+            self.stats_label.config(text=self.pacer.summary())
+        self.root.after(1000, self.update_stats)
+
     def sync_params(self):
         self.audio.global_gain = self.gain_scale.get()
         self.audio.base_threshold = self.th_scale.get()
+        # 工作线程随时可能把 self.analysis 置空并关闭它，先取到局部变量；关闭后的 set_params 会被忽略
+        analysis = self.analysis
+        if analysis:
+            analysis.set_params(self.audio.global_gain, self.audio.base_threshold)
 
     def spectrum_worker(self, device_idx):
-        """后台线程：只管读和写，不再涉及复杂的切换逻辑"""
-        if self.audio.open_stream(device_idx):
+        """后台线程：只管读数据和算频谱，显示由 render_worker 按固定帧率完成"""
+        if self.use_process.get():
+            self.process_worker(device_idx)
+            return
+        # 回调式采集 + 50% 重叠窗口：频谱更新率翻倍，读数据不再阻塞工作线程
+        if self.audio.open_stream(device_idx, callback=True):
             self.sync_params()
+            self.smoother.reset()
+            self.render_thread = threading.Thread(target=self.render_worker, daemon=True)
+            self.render_thread.start()
             while not self.stop_signal.is_set():
-                levels = self.audio.get_audio_frame()
-                self.vfd.display_spectrum(levels)
-                time.sleep(0.005)
+                t0 = time.perf_counter()
+                levels = self.audio.get_audio_frame(quantize=False)
+                self.pacer.record("capture", time.perf_counter() - t0)
+                self.smoother.update(levels)
 
             # 停止后清理
+            self.render_thread.join(timeout=1.0)
             self.audio.close_stream()
-            self.vfd.clear()
+            self.writer.submit(bytes(DISPLAY_RAM_SIZE))
+            self.writer.flush()
+        else:
+            print("[Audio] 音频流打开失败")
+            self.worker_failed.set()
+
+    def process_worker(self, device_idx):
+        """采集和分析都在子进程里，结果经共享内存交给 render_worker，本线程只等待停止"""
+        from analysis_process import AnalysisProcess
+
+        analysis = AnalysisProcess.for_device(self.audio, device_idx)
+        analysis.start()
+        if not analysis.wait_ready():
+            print("[Audio] 分析进程启动失败")
+            analysis.close()
+            self.worker_failed.set()
+            return
+        self.analysis = analysis
+        self.sync_params()
+        self.smoother.reset()
+        self.render_thread = threading.Thread(target=self.render_worker, daemon=True)
+        self.render_thread.start()
+        self.stop_signal.wait()
+
+        # 显示线程还在读共享内存，必须等它真正退出再 close (pacer.wait 收到停止信号就会返回)
+        self.render_thread.join()
+        self.analysis = None
+        analysis.close()
+        self.writer.submit(bytes(DISPLAY_RAM_SIZE))
+        self.writer.flush()
+
+    def render_worker(self):
+        """
+        按 DISPLAY_FPS 从平滑器取样并投递，FFT 帧率高低都不影响动画的流畅度
+        USB 发送跟不上时由 FramePacer 自动降帧
+        """
+        pacer = self.pacer
+        pacer.reset()
+        analysis = self.analysis
+        last_seq = 0
+        while True:
+            pacer.begin()
+            if analysis is not None:
+                # 独立进程模式：只取共享内存里最新的一帧结果
+                seq, levels, _ = analysis.latest()
+                if seq != last_seq:
+                    last_seq = seq
+                    self.smoother.update(levels)
+            levels, peaks = self.smoother.sample()
+            pacer.mark("sample")
+            self.writer.submit(self.vfd.encode_spectrum(levels, peaks))
+            pacer.mark("encode")
+            if pacer.wait(self.stop_signal):
+                break
 
     def toggle(self):
         if not self.is_running:
@@ -84,10 +194,12 @@ class VFDControllerApp:
 
             # 1. 锁定 UI
             self.combo.config(state="disabled")
+            self.process_check.config(state="disabled")
             self.btn.config(text="停止监听")
 
             # 2. 启动线程
             self.stop_signal.clear()
+            self.worker_failed.clear()
             self.worker_thread = threading.Thread(target=self.spectrum_worker, args=(idx,), daemon=True)
             self.worker_thread.start()
             self.is_running = True
@@ -102,20 +214,38 @@ class VFDControllerApp:
                 self.worker_thread.join(timeout=1.0)
 
             # 2. 解锁 UI
-            self.combo.config(state="readonly")
-            self.btn.config(text="启动监听")
-            self.btn.config(state="normal")
-            self.is_running = False
+            self.stats_label.config(text=self.pacer.summary())
+            self.unlock_ui()
+
+    def unlock_ui(self):
+        self.combo.config(state="readonly")
+        self.process_check.config(state="normal")
+        self.btn.config(text="启动监听")
+        self.btn.config(state="normal")
+        self.is_running = False
+
+    def on_worker_failed(self):
+        """工作线程没能启动采集就退出了 (工作线程只置 worker_failed，这里在界面线程里处理)：恢复到未监听状态"""
+        if self.is_running and not self.stop_signal.is_set():
+            self.stop_signal.set()
+            self.stats_label.config(text="启动失败")
+            self.unlock_ui()
 
     def on_close(self):
+        self.preview.stop()
         self.stop_signal.set()
-        if self.worker_thread: self.worker_thread.join(timeout=0.5)
+        # 独立进程模式下还要等子进程退出、共享内存释放
+        if self.worker_thread: self.worker_thread.join(timeout=2.0 if self.analysis else 0.5)
+        self.writer.stop()
         self.spi.close()
         self.audio.terminate()
         self.root.destroy()
 
 
 if __name__ == "__main__":
+    import multiprocessing
+    # PyInstaller 打包后，独立进程分析的子进程也从这个入口启动
+    multiprocessing.freeze_support()
     root = tk.Tk()
     app = VFDControllerApp(root)
     root.protocol("WM_DELETE_WINDOW", app.on_close)
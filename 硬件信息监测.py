@@ -1,11 +1,11 @@
 import time
 import os
 import sys
-import psutil
 import ctypes
 from vfd_driver import VFDScreen
 from spi_comm import SPIAdapter
-from hardware_monitor import HardwareMonitor
+from hardware_monitor import create_monitor
+from animation import AnimationScheduler, carousel
 
 # ==========================================
 # 1. 环境与权限保活设置
@@ -22,6 +22,8 @@ os.chdir(base_path)
 def optimize_process():
     """提升进程权限级别，防止后台运行时被系统挂起"""
     try:
+        import psutil
+
         # 1. 设置进程为高优先级
         p = psutil.Process(os.getpid())
         p.nice(psutil.HIGH_PRIORITY_CLASS)
@@ -66,18 +68,8 @@ class CarouselVFDScreen(VFDScreen):
             " "  # Grid 6 (原先单位的位置，现在空出来)
         ]
 
-        payload = [0xC0]  # PT6315 起始显存地址
-
-        for grid_id in range(10):
-            if grid_id in self.grids_text:
-                idx = self.grids_text.index(grid_id)
-                char = display_list[idx]
-                payload.extend(self.get_char_bytes(char))
-            else:
-                # 关闭其余所有 Grid（包括特殊符号位）
-                payload.extend([0x00, 0x00, 0x00])
-
-        self.spi.send_data(payload)
+        # 编码结果按显示内容缓存，轮播中重复出现的画面只需一次查表；只发送与上一帧不同的 Grid
+        self.write_frame(self.get_encoder().encode(tuple(display_list)))
 
 
 # ==========================================
@@ -104,7 +96,9 @@ def main():
         # 3. 延迟启动监测模块，给驱动留出唤醒时间
         print("正在初始化硬件监测模块...")
         time.sleep(1)
-        monitor = HardwareMonitor()
+        monitor = create_monitor()
+        # 后台按各传感器自己的间隔采样，轮播时只读缓存
+        monitor.start_sampler()
 
         # 轮播序列配置：(显示标签, 数据Key, 单位)
         sequence = [
@@ -117,17 +111,15 @@ def main():
 
         print("VFD 监控已就绪，开始后台运行...")
 
-        while True:
-            for label, key, unit in sequence:
-                # 每次切换前抓取最新数据
-                data = monitor.get_all_metrics()
-                val = data.get(key, 0)
-
-                # 更新屏幕显示
-                vfd.display_metrics(label, val, unit)
+        def show(label, key, unit):
+            # 每次切换时读取最新缓存数据
+            data = monitor.get_all_metrics()
+            vfd.display_metrics(label, data.get(key, 0), unit)
 
-                # 轮播停顿时间 (秒)
-                time.sleep(3)
+        # 轮播停顿 3 秒：调度器在主线程运行，只在切换时刻醒来
+        scheduler = AnimationScheduler()
+        scheduler.play(carousel([(lambda item=item: show(*item)) for item in sequence], 3))
+        scheduler.run()
 
     except KeyboardInterrupt:
         print("\n用户中断，正在清理退出...")
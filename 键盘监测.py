@@ -1,8 +1,10 @@
 import time
 import threading
-from collections import deque
 from spi_comm import SPIAdapter
 from vfd_driver import VFDScreen
+from display_writer import DisplayWriter
+from key_echo import KeyEchoPipeline
+from animation import AnimationScheduler, fade
 from keyboard_monitor import KeyboardListener
 
 # ================= 配置 =================
@@ -24,17 +26,36 @@ BLINK_SPEED = 0.1
 
 
 class QuarterDimController:
-    def __init__(self):
-        # 初始化硬件连接
-        self.spi = SPIAdapter()
-        if not self.spi.open():
-            raise Exception("CH341 Device Open Failed")
-
-        self.vfd = VFDScreen(self.spi)
-        self.vfd.init_device()
+    def __init__(self, writer=None, scheduler=None, on_exit=None):
+        """
+        :param writer / scheduler: 由 vfd_daemon 传入共享的写入线程和调度器；不传时自己打开设备
+        :param on_exit: 按 ESC 时的回调
+        """
+        if writer is None:
+            # 初始化硬件连接
+            self.spi = SPIAdapter()
+            if not self.spi.open():
+                raise Exception("CH341 Device Open Failed")
+
+            self.vfd = VFDScreen(self.spi)
+            self.vfd.init_device()
+
+            # 写入线程独占 SPI：按键回调只投递帧，不再等待 USB
+            writer = DisplayWriter(self.vfd, fps=60)
+            writer.start()
+        self.writer = writer
+
+        # 闪烁和渐暗都交给调度线程按时间点执行，不再轮询
+        if scheduler is None:
+            scheduler = AnimationScheduler()
+            scheduler.start()
+        self.scheduler = scheduler
+        self.on_exit = on_exit
+        self.kb = None
+        self.blink_timer = None
+        self.dim_playback = None
+        self.dim_generation = 0
 
-        # 文本缓冲区，maxlen=6 对应 6 个字符位
-        self.text_buffer = deque([' '] * 6, maxlen=6)
         self.running = True
         self.lock = threading.Lock()
 
@@ -43,11 +64,16 @@ class QuarterDimController:
         self.set_hw_brightness(BRIGHT_MAX)
 
         self.last_input_time = time.time()
-        self.is_animating = False
 
         # Grid 6 (光标/小图标) 的像素数据
-        self.G6_ON = [0xFF, 0xFF, 0xFF]
-        self.G6_OFF = [0x00, 0x00, 0x00]
+        self.G6_ON = b'\xff\xff\xff'
+        self.G6_OFF = b'\x00\x00\x00'
+
+        # 按键回显流水线：6 个字符位以字形字节保存在环形帧缓冲里，连击合并成一帧
+        # 核心逻辑：按照[5,4,3,2,1,0]的顺序填充，最新的字符在 GRID_TEXT_ORDER[0] (即物理 Grid 5，最右侧)
+        self.echo = KeyEchoPipeline(self.writer, GRID_TEXT_ORDER, cursor_grid=GRID_CURSOR,
+                                    cursor_on=self.G6_ON, cursor_off=self.G6_OFF,
+                                    on_burst=self._on_burst)
 
     def set_hw_brightness(self, logic_level):
         """
@@ -62,93 +88,92 @@ class QuarterDimController:
             hw_val = logic_level - 1
             cmd = 0x88 + hw_val
 
-        self.spi.send_data([cmd])
+        self.writer.submit_control([cmd])
         self.current_brightness = logic_level
 
-    def update_screen(self, text_list, cursor_on=True):
-        """
-        刷新屏幕显示内容
-        """
-        payload = [0xC0]  # 设置起始地址命令
-        grid_data = {}
-
-        # 处理光标 Grid
-        grid_data[GRID_CURSOR] = self.G6_ON if cursor_on else self.G6_OFF
-
-        # 核心逻辑：按照[5,4,3,2,1,0]的顺序填充字符
-        # text_list[0] 是最新的字符，会被放在 GRID_TEXT_ORDER[0] (即物理 Grid 5，最右侧)
-        for i, grid_id in enumerate(GRID_TEXT_ORDER):
-            if i < len(text_list):
-                char = text_list[i]
-                grid_data[grid_id] = self.vfd.get_char_bytes(char)
-
-        # 构造完整的 10 个 Grid 数据包 (每个 Grid 3 字节)
-        for grid_id in range(10):
-            payload.extend(grid_data.get(grid_id, [0, 0, 0]))
-
-        self.spi.send_data(payload)
-
     def on_key(self, char):
         """
-        按键回调函数
+        按键回调函数 (keyboard 钩子线程)：只入队，渲染和写屏都在回显线程里完成
         """
         if char is None:
             self.running = False
+            if self.on_exit:
+                self.on_exit()
             return
+        self.echo.push(char)
 
+    def _on_burst(self, chars):
+        """回显线程：一批按键已经投递 (光标已熄灭)，处理唤醒和闪烁"""
         with self.lock:
-            self.is_animating = True
             self.last_input_time = time.time()
+            self._cancel_dimming()
 
             # 唤醒：如果处于暗光状态，立刻拉满亮度
             if self.current_brightness < BRIGHT_MAX:
                 self.set_hw_brightness(BRIGHT_MAX)
 
-            # 将新字符推入左侧，旧字符向右移（但在反转的Grid顺序下，视觉上是向左移）
-            self.text_buffer.appendleft(char)
-            current_text = list(self.text_buffer)
-
-            # 闪烁反馈效果
-            self.update_screen(current_text, cursor_on=False)
-            time.sleep(BLINK_SPEED)
-            self.update_screen(current_text, cursor_on=True)
+            # 闪烁反馈效果：BLINK_SPEED 后由调度器点亮光标
+            if self.blink_timer:
+                self.blink_timer.cancel()
+            self.blink_timer = self.scheduler.call_later(BLINK_SPEED, self._end_blink)
 
-            self.is_animating = False
+    def _end_blink(self):
+        """闪烁结束：点亮光标，并从现在起重新计算空闲渐暗"""
+        with self.lock:
+            self.echo.set_cursor(True)
             self.last_input_time = time.time()
+            self._schedule_dimming()
 
-    def _dimming_loop(self):
+    def _schedule_dimming(self):
         """
-        后台线程：负责在无操作时逐级降低亮度
+        预先排好整段渐暗：IDLE_TIMEOUT 后开始，每 STEP_DELAY 降一级直到 BRIGHT_MIN
+        调用方需持有 self.lock
         """
-        while self.running:
-            now = time.time()
-            idle_duration = now - self.last_input_time
-
-            if not self.is_animating and idle_duration > IDLE_TIMEOUT:
-                if self.current_brightness > BRIGHT_MIN:
-                    with self.lock:
-                        new_level = self.current_brightness - 1
-                        self.set_hw_brightness(new_level)
-                    time.sleep(STEP_DELAY)
-                else:
-                    time.sleep(0.5)
-            else:
-                time.sleep(0.1)
+        self._cancel_dimming()
+        generation = self.dim_generation
+        self.dim_playback = self.scheduler.play(fade(
+            lambda level: self._dim_step(level, generation),
+            self.current_brightness, BRIGHT_MIN, STEP_DELAY, delay=IDLE_TIMEOUT))
+
+    def _cancel_dimming(self):
+        """取消尚未执行的渐暗步骤 (调用方需持有 self.lock)"""
+        self.dim_generation += 1
+        if self.dim_playback:
+            self.dim_playback.cancel()
+            self.dim_playback = None
+
+    def _dim_step(self, level, generation):
+        with self.lock:
+            # 调度线程可能正好在按键唤醒的同时执行到这一步，过期的渐暗直接丢弃
+            if generation == self.dim_generation:
+                self.set_hw_brightness(level)
 
-    def run(self):
+    def start(self):
         # 启动键盘监听
-        kb = KeyboardListener(self.on_key)
-        kb.start()
-
-        # 启动自动变暗线程
-        dim_thread = threading.Thread(target=self._dimming_loop, daemon=True)
-        dim_thread.start()
+        self.kb = KeyboardListener(self.on_key)
+        self.kb.start()
 
         # 初始显示
-        self.update_screen(list(self.text_buffer), cursor_on=True)
+        self.echo.start()
+        self.echo.set_cursor(True)
         # 初始设为最低亮度（测试唤醒）
         self.set_hw_brightness(BRIGHT_MIN)
 
+    def stop(self):
+        """解除键盘钩子、停止回显线程并取消未执行的闪烁/渐暗"""
+        if self.kb:
+            self.kb.stop()
+            self.kb = None
+        self.echo.stop()
+        with self.lock:
+            self._cancel_dimming()
+            if self.blink_timer:
+                self.blink_timer.cancel()
+                self.blink_timer = None
+
+    def run(self):
+        self.start()
+
         while True:
             try:
                 time.sleep(10)